@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+# Frozen copy of BusinessPartner.models.KYC_REQUIRED_FIELDS at the time of this migration.
+REQUIRED_FIELDS = (
+    'bis_no', 'bis_attachment', 'gst_no', 'gst_attachment', 'msme_no', 'msme_attachment',
+    'pan_no', 'pan_attachment', 'tan_no', 'tan_attachment', 'image', 'name', 'aadhar_no',
+    'aadhar_attach', 'bank_name', 'account_name', 'account_no', 'ifsc_code', 'branch',
+    'bank_city', 'bank_state', 'note',
+)
+
+
+def backfill_status(apps, schema_editor):
+    BusinessPartnerKYC = apps.get_model('BusinessPartner', 'BusinessPartnerKYC')
+    complete = models.Q(bp_code__isnull=False)
+    for field in REQUIRED_FIELDS:
+        complete &= ~models.Q(**{f'{field}__isnull': True}) & ~models.Q(**{field: ''})
+    BusinessPartnerKYC.objects.update(status=models.Case(
+        models.When(revoked=True, then=models.Value('revoked')),
+        models.When(freezed=True, then=models.Value('freezed')),
+        models.When(complete, then=models.Value('approved')),
+        default=models.Value('pending'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0029_remove_businesspartner_partner_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('freezed', 'Freezed'), ('revoked', 'Revoked')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
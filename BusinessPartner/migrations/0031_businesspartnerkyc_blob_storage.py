@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:08
+
+import taraerp.blobs
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0030_businesspartnerkyc_status_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='aadhar_attach',
+            field=models.FileField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='bis_attachment',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='gst_attachment',
+            field=models.ImageField(storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='kyc/business_partner/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='msme_attachment',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='pan_attachment',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='businesspartnerkyc',
+            name='tan_attachment',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='attachments/'),
+        ),
+    ]
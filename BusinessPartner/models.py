@@ -1,7 +1,7 @@
 from django.db import models
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.utils.timezone import now
 from django.conf import settings
@@ -9,6 +9,9 @@ import requests
 import logging
 import re
 from urllib.parse import quote
+from taraerp.pincodes import fill_location, lookup as lookup_pincode, schedule_refresh
+from taraerp import blobs, images, media
+from taraerp.sequences import reserve
 
 
 logger = logging.getLogger(__name__)
@@ -149,6 +152,60 @@ class BusinessPartner(models.Model):
         return f"{self.bp_code} - {self.business_name}"
 
 
+BP_CODE_PREFIXES = {'BUYER': 'B', 'CRAFTSMAN': 'A'}
+
+
+def _last_bp_number(key):
+    """Highest number already used after `key` (e.g. 'BA'); seeds the counter once."""
+    numbers = [
+        int(code[len(key):])
+        for code in BusinessPartner.objects.filter(bp_code__startswith=key).values_list('bp_code', flat=True)
+        if code[len(key):].isdigit()
+    ]
+    return max(numbers, default=0)
+
+
+def next_bp_code(role, business_name):
+    """
+    Allocate the next bp_code for a role and business name, e.g. 'BA001'.
+
+    Each (role prefix, first letter) pair has its own counter row, advanced
+    with a single atomic UPDATE, so allocation costs the same at any table
+    size and concurrent creates never get the same code.
+    """
+    key = f"{BP_CODE_PREFIXES[role.upper()]}{business_name.strip()[0].upper()}"
+    number, _ = reserve(f"bp_code:{key}", seed=lambda: _last_bp_number(key))
+    return f"{key}{number:03d}"
+
+
+# Every one of these must be filled in (files uploaded) for a KYC to count as approved.
+KYC_REQUIRED_FIELDS = (
+    'bis_no', 'bis_attachment', 'gst_no', 'gst_attachment', 'msme_no', 'msme_attachment',
+    'pan_no', 'pan_attachment', 'tan_no', 'tan_attachment', 'image', 'name', 'aadhar_no',
+    'aadhar_attach', 'bank_name', 'account_name', 'account_no', 'ifsc_code', 'branch',
+    'bank_city', 'bank_state', 'note',
+)
+
+
+def kyc_status_expression():
+    """SQL CASE computing the same status as BusinessPartnerKYC.compute_status()."""
+    complete = models.Q(bp_code__isnull=False)
+    for field in KYC_REQUIRED_FIELDS:
+        complete &= ~models.Q(**{f'{field}__isnull': True}) & ~models.Q(**{field: ''})
+    return models.Case(
+        models.When(revoked=True, then=models.Value('revoked')),
+        models.When(freezed=True, then=models.Value('freezed')),
+        models.When(complete, then=models.Value('approved')),
+        default=models.Value('pending'),
+    )
+
+
+class BusinessPartnerKYCQuerySet(models.QuerySet):
+    def refresh_status(self):
+        """Recompute the stored status in one UPDATE, e.g. after a bulk `update()`."""
+        return self.update(status=kyc_status_expression())
+
+
 class BusinessPartnerKYC(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -156,24 +213,25 @@ class BusinessPartnerKYC(models.Model):
         ('freezed', 'Freezed'),
         ('revoked', 'Revoked'),
     ]
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    # Derived from the fields below on every save; see compute_status().
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
     bp_code = models.ForeignKey(
         BusinessPartner, on_delete=models.CASCADE, related_name='kyc_details'
     )  
     bis_no = models.CharField(max_length=50, blank=True, null=True)
-    bis_attachment = models.ImageField(upload_to='attachments/', blank=True, null=True) 
+    bis_attachment = models.ImageField(upload_to='attachments/', storage=blobs.blob_storage, blank=True, null=True) 
     gst_no = models.CharField(max_length=50,validators=[validate_gst_number], blank=False, null=False)
-    gst_attachment = models.ImageField(upload_to='attachments/', blank=False, null=False) 
+    gst_attachment = models.ImageField(upload_to='attachments/', storage=blobs.blob_storage, blank=False, null=False) 
     msme_no = models.CharField(max_length=50, validators=[validate_msme_no], blank=True, null=True)
-    msme_attachment = models.ImageField(upload_to='attachments/', blank=True, null=True) 
+    msme_attachment = models.ImageField(upload_to='attachments/', storage=blobs.blob_storage, blank=True, null=True) 
     pan_no = models.CharField(max_length=10, blank=True, null=True, validators=[validate_pan_number])  
-    pan_attachment = models.ImageField(upload_to='attachments/', blank=True, null=True) 
+    pan_attachment = models.ImageField(upload_to='attachments/', storage=blobs.blob_storage, blank=True, null=True) 
     tan_no = models.CharField(max_length=10, validators=[validate_pan_number], blank=True, null=True)
-    tan_attachment = models.ImageField(upload_to='attachments/', blank=True, null=True)
-    image = models.ImageField(upload_to='kyc/business_partner/', blank=True, null=True)
+    tan_attachment = models.ImageField(upload_to='attachments/', storage=blobs.blob_storage, blank=True, null=True)
+    image = models.ImageField(upload_to='kyc/business_partner/', storage=blobs.blob_storage, blank=True, null=True)
     name = models.CharField(max_length=255, blank=True, null=True)
     aadhar_no = models.CharField(max_length=12, validators=[validate_aadhar_no], default=list, blank=True, null=True)
-    aadhar_attach = models.FileField(upload_to='attachments/', blank=True, null=True)   
+    aadhar_attach = models.FileField(upload_to='attachments/', storage=blobs.blob_storage, blank=True, null=True)   
     bank_name = models.CharField(max_length=255, blank=True, null=True)
     account_name = models.CharField(max_length=255, blank=True, null=True)
     account_no = models.CharField(max_length=50, blank=True, null=True)
@@ -184,6 +242,24 @@ class BusinessPartnerKYC(models.Model):
     note = models.TextField(blank=True, null=True)
     freezed = models.BooleanField(default=False)
     revoked = models.BooleanField(default=False)
+
+    objects = BusinessPartnerKYCQuerySet.as_manager()
+
+    def compute_status(self):
+        if self.revoked:
+            return 'revoked'
+        if self.freezed:
+            return 'freezed'
+        if self.bp_code_id and all(getattr(self, field) for field in KYC_REQUIRED_FIELDS):
+            return 'approved'
+        return 'pending'
+
+    def save(self, *args, **kwargs):
+        self.status = self.compute_status()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'status']
+        super().save(*args, **kwargs)
     
 
 def __str__(self):
@@ -217,30 +293,25 @@ def fetch_ifsc_code(bank_name, branch):
         return None 
 
 def fetch_location_from_pincode(pincode):
-    if not pincode or not pincode.isdigit() or len(pincode) != 6:
+    """Return (city, state) for `pincode` from the local pincode cache, without network calls."""
+    location = lookup_pincode(pincode)
+    if location is None:
         return None, None
-    url = f"https://api.postalpincode.in/pincode/{pincode}"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data and data[0]['Status'] == "Success" and data[0]['PostOffice']:
-            city = data[0]['PostOffice'][0].get('District', '')
-            state = data[0]['PostOffice'][0].get('State', '')
-            return city, state
-        else:
-            logger.warning(f"Invalid pincode response: {data[0].get('Message', 'Unknown error')}")
-            return None, None
-    except requests.RequestException as e:
-        logger.error(f"Request error: {str(e)}")
-    return None, None
+    return location.city, location.state
 
 @receiver(pre_save, sender=BusinessPartner)
 def fetch_location_pre_save(sender, instance, **kwargs):
-    if instance.pincode and (not instance.city or not instance.state):
-        city, state = fetch_location_from_pincode(instance.pincode)
-        instance.city = city
-        instance.state = state
+    fill_location(instance)
+
+post_save.connect(schedule_refresh, sender=BusinessPartner)
+
+KYC_FILE_FIELDS = (
+    'bis_attachment', 'gst_attachment', 'msme_attachment', 'pan_attachment',
+    'tan_attachment', 'image', 'aadhar_attach',
+)
+images.register(BusinessPartnerKYC, KYC_FILE_FIELDS)
+blobs.track(BusinessPartnerKYC, KYC_FILE_FIELDS)
+media.protect(BusinessPartnerKYC, KYC_FILE_FIELDS)
         
         
 def get_map_url(self):
@@ -0,0 +1,57 @@
+from .models import BusinessPartner
+
+
+def parse_partner_identifier(identifier):
+    """'AS001' -> ('AS001', None); 'AS001-Shree Works' -> ('AS001', 'Shree Works')."""
+    code, separator, name = identifier.strip().partition('-')
+    return code.strip(), name.strip() if separator else None
+
+
+class PartnerResolver:
+    """
+    Finds partners by a bare bp_code or the 'CODE-Business Name' form shown
+    in the craftsman lists.
+
+    Each identifier costs one query on the unique bp_code index; the
+    business name is compared in Python, case-insensitively, instead of
+    with a `business_name__iexact` filter. Results are memoized, and
+    `for_request()` shares one resolver across everything handling a
+    request, so validating the same identifier twice costs nothing.
+    """
+
+    def __init__(self):
+        self._partners = {}
+
+    @classmethod
+    def for_request(cls, request):
+        if request is None:
+            return cls()
+        resolver = getattr(request, '_partner_resolver', None)
+        if resolver is None:
+            resolver = request._partner_resolver = cls()
+        return resolver
+
+    def resolve(self, identifier, role=None):
+        """The partner `identifier` names (with `role`, if given), or None."""
+        identifier = identifier.strip()
+        if identifier not in self._partners:
+            self._partners[identifier] = self._lookup(identifier)
+        partner = self._partners[identifier]
+        if partner is not None and role is not None and partner.role != role:
+            return None
+        return partner
+
+    @staticmethod
+    def _lookup(identifier):
+        code, name = parse_partner_identifier(identifier)
+        # Older codes may contain '-' themselves, so fetch both readings at once.
+        partners = {
+            partner.bp_code: partner
+            for partner in BusinessPartner.objects.filter(bp_code__in={identifier, code})
+        }
+        if identifier in partners:
+            return partners[identifier]
+        partner = partners.get(code)
+        if partner is not None and name is not None and partner.business_name.strip().casefold() != name.casefold():
+            return None
+        return partner
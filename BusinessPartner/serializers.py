@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import BusinessPartner, BusinessPartnerKYC,fetch_ifsc_code
+from .models import BusinessPartner, BusinessPartnerKYC,fetch_ifsc_code, next_bp_code, KYC_FILE_FIELDS
+from taraerp.images import ImageVariantsField
 import re
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -137,12 +138,7 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
         if role not in ['BUYER', 'CRAFTSMAN']:
             raise serializers.ValidationError({"role": "Invalid role. Must be either 'BUYER' or 'CRAFTSMAN'."})
 
-        prefix = 'B' if role == 'BUYER' else 'A'
-        first_letter = business_name[0].upper()
-        last_bp = BusinessPartner.objects.filter(bp_code__regex=rf'^{prefix}{first_letter}\d+$').order_by('-bp_code').first()
-        
-        new_number = int(last_bp.bp_code[2:]) + 1 if last_bp else 1
-        validated_data['bp_code'] = f"{prefix}{first_letter}{new_number:03d}"
+        validated_data['bp_code'] = next_bp_code(role, business_name)
         validated_data['user_id'] = user
 
         return super().create(validated_data)
@@ -155,7 +151,8 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
             new_instance_data = {
                 **{field.name: getattr(instance, field.name) for field in instance._meta.fields if field.name not in ['id', 'bp_code']},
                 **validated_data,
-                "role": "CRAFTSMAN"
+                "role": "CRAFTSMAN",
+                "bp_code": next_bp_code("CRAFTSMAN", validated_data.get("business_name", instance.business_name)),
             }
             return BusinessPartner.objects.create(**new_instance_data)
         return super().update(instance, validated_data)
@@ -169,7 +166,8 @@ class BusinessPartnerKYCSerializer(serializers.ModelSerializer):
             required=False,
             allow_null=True
         )
-    status = serializers.SerializerMethodField()
+    status = serializers.CharField(source='get_status_display', read_only=True)
+    thumbnails = ImageVariantsField(KYC_FILE_FIELDS)
     class Meta:
         model = BusinessPartnerKYC
         fields = [
@@ -178,27 +176,9 @@ class BusinessPartnerKYCSerializer(serializers.ModelSerializer):
             'tan_no', 'tan_attachment', 'image', 'name', 'aadhar_no', 
             'aadhar_attach', 'bank_name', 'account_name', 'account_no',
             'ifsc_code', 'branch', 'bank_city', 'bank_state', 'note', 'status',
-            
+            'thumbnails',
         ]
 
-    def get_status(self, obj):
-        if obj.revoked:
-            return 'Revoked'
-        if obj.freezed:
-            return 'Freezed'
-        if all([
-    obj.bp_code, obj.bis_no, obj.bis_attachment, obj.gst_no, obj.gst_attachment,
-    obj.msme_no, obj.msme_attachment, obj.pan_no, obj.pan_attachment,
-    obj.tan_no, obj.tan_attachment, obj.image, obj.name, obj.aadhar_no,
-    obj.aadhar_attach, obj.bank_name, obj.account_name, obj.account_no,
-    obj.ifsc_code, obj.branch, obj.bank_city, obj.bank_state, obj.note
-]):
-
-           
-            return 'Approved'
-        return 'Pending'
-    
-    
     def to_representation(self, instance):
         """Modify the output representation to include business_name with bp_code."""
         data = super().to_representation(instance)
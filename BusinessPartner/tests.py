@@ -0,0 +1,300 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from order.models import Order
+from taraerp import blobs
+from .models import BusinessPartner, BusinessPartnerKYC, KYC_REQUIRED_FIELDS, next_bp_code
+
+
+class BpCodeAllocatorTests(TestCase):
+    def create_partner(self, bp_code, role='BUYER'):
+        return BusinessPartner.objects.create(
+            bp_code=bp_code, role=role, term='T1', business_name=f'Acme {bp_code}', full_name='Acme',
+            mobile='9876543210', email=f'{bp_code.lower()}@example.com', pincode='600001',
+            city='Chennai', state='Tamil Nadu',
+        )
+
+    def test_codes_keep_format_per_role_and_letter(self):
+        self.assertEqual(next_bp_code('BUYER', 'Acme Jewels'), 'BA001')
+        self.assertEqual(next_bp_code('BUYER', 'acme gold'), 'BA002')
+        self.assertEqual(next_bp_code('CRAFTSMAN', 'Acme Works'), 'AA001')
+        self.assertEqual(next_bp_code('BUYER', 'Zenith'), 'BZ001')
+
+    def test_counter_is_seeded_numerically_past_999(self):
+        self.create_partner('BA999')
+        self.create_partner('BA1000')
+        self.create_partner('BAB010')
+        self.assertEqual(next_bp_code('BUYER', 'Another'), 'BA1001')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(next_bp_code('BUYER', 'Another'), 'BA1002')
+        # Once the counter exists the partner table is not read at all.
+        self.assertFalse([q for q in ctx.captured_queries if 'businesspartner' in q['sql'].lower()])
+
+
+class KYCStatusTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from user.models import ResUser
+
+        self.partner = BusinessPartner.objects.create(
+            bp_code='BK001', role='BUYER', term='T1', business_name='Kyc', full_name='Kyc',
+            mobile='9876543210', email='kyc@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(ResUser.objects.create_user('kyc-admin', password='x', role_name='Admin'))
+
+    def complete_kyc(self, **overrides):
+        values = {field: f'{field[:6]}-1' for field in KYC_REQUIRED_FIELDS}
+        values.update(overrides)
+        return BusinessPartnerKYC.objects.create(bp_code=self.partner, **values)
+
+    def test_status_is_stored_on_save_and_on_freeze(self):
+        kyc = self.complete_kyc()
+        self.assertEqual(kyc.status, 'approved')
+        pending = self.complete_kyc(bis_no='pending-1', note='')
+        self.assertEqual(pending.status, 'pending')
+
+        self.client.post(f'/BusinessPartner/BusinessPartnerKYC/freeze/{kyc.bis_no}/')
+        kyc.refresh_from_db()
+        self.assertEqual(kyc.status, 'freezed')
+        self.client.post(f'/BusinessPartner/BusinessPartnerKYC/revoke/{kyc.bis_no}/')
+        kyc.refresh_from_db()
+        self.assertEqual(kyc.status, 'approved')
+
+        BusinessPartnerKYC.objects.filter(pk=pending.pk).update(note='filled')
+        BusinessPartnerKYC.objects.filter(pk=pending.pk).refresh_status()
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'approved')
+
+    def test_list_filters_by_status_in_sql(self):
+        self.complete_kyc()
+        self.complete_kyc(bis_no='pending-1', note='')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/BusinessPartner/BusinessPartnerKYC/list?status=Pending')
+        self.assertEqual([row['bis_no'] for row in response.data], ['pending-1'])
+        self.assertEqual(response.data[0]['status'], 'Pending')
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(self.client.get('/BusinessPartner/BusinessPartnerKYC/list?status=Bogus').status_code, 400)
+
+
+class BlobStorageTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, BACKGROUND_TASKS_EAGER=True)
+        self.settings_override.enable()
+        self.partner = BusinessPartner.objects.create(
+            bp_code='BB001', role='BUYER', term='T1', business_name='Blob', full_name='Blob',
+            mobile='9876543210', email='blob@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def upload(self, content, name='gst.pdf'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile(name, content, content_type='application/pdf')
+
+    def stored_files(self):
+        import os
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media.name)
+            for root, _, names in os.walk(self.media.name) for name in names
+        )
+
+    def test_identical_uploads_share_one_refcounted_blob(self):
+        from datetime import timedelta
+        from taraerp import blobs
+        from taraerp.models import Blob
+
+        first = BusinessPartnerKYC.objects.create(bp_code=self.partner, gst_no='G1', gst_attachment=self.upload(b'scan'))
+        second = BusinessPartnerKYC.objects.create(
+            bp_code=self.partner, gst_no='G2', gst_attachment=self.upload(b'scan', 'copy.PDF'),
+            pan_attachment=self.upload(b'scan'),
+        )
+        self.assertEqual(first.gst_attachment.name, second.gst_attachment.name)
+        self.assertTrue(first.gst_attachment.name.startswith('blobs/'))
+        self.assertEqual(self.stored_files(), [first.gst_attachment.name])
+        self.assertEqual(Blob.objects.values_list('refcount', 'private_refcount').get(), (3, 3))
+
+        second.pan_attachment = self.upload(b'other scan')
+        second.save()
+        self.assertEqual(
+            dict(Blob.objects.values_list('name', 'refcount')),
+            {first.gst_attachment.name: 2, second.pan_attachment.name: 1},
+        )
+
+        first.delete()
+        second.gst_attachment.delete(save=False)  # shared files are only removed by collect()
+        second.save(update_fields=['gst_attachment'])
+        self.assertEqual(Blob.objects.get(name=first.gst_attachment.name).refcount, 0)
+        self.assertEqual(blobs.collect(grace=timedelta(hours=1)), [])
+        self.assertEqual(blobs.collect(grace=timedelta(0)), [first.gst_attachment.name])
+        self.assertEqual(self.stored_files(), [second.pan_attachment.name])
+
+        Blob.objects.update(refcount=7, private_refcount=0)
+        self.assertEqual(blobs.recount(), 1)
+        self.assertEqual(Blob.objects.values_list('refcount', 'private_refcount').get(), (1, 1))
+
+    def test_upload_racing_another_extension_uses_the_row_name(self):
+        import hashlib
+        from unittest import mock
+        from django.core.files.base import ContentFile
+        from django.db.models import QuerySet
+        from taraerp import blobs
+        from taraerp.models import Blob
+
+        digest = hashlib.sha256(b'scan').hexdigest()
+        Blob.objects.create(digest=digest, name=f'blobs/{digest[:2]}/{digest}.png', size=4)
+        # As if the other upload created the row after this one found none.
+        with mock.patch.object(QuerySet, 'update', return_value=0):
+            name = blobs.blob_storage().save('attachments/gst.pdf', ContentFile(b'scan'))
+        self.assertEqual(name, f'blobs/{digest[:2]}/{digest}.png')
+        self.assertEqual(self.stored_files(), [name])
+
+    def test_existing_files_are_adopted(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from taraerp import blobs
+        from taraerp.models import Blob
+
+        for number in range(2):
+            name = default_storage.save('attachments/old.pdf', ContentFile(b'legacy'))
+            kyc = BusinessPartnerKYC.objects.create(bp_code=self.partner, gst_no=f'G{number}')
+            BusinessPartnerKYC.objects.filter(pk=kyc.pk).update(gst_attachment=name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(blobs.adopt_existing(delete_originals=True), (2, 2))
+        adopted = set(BusinessPartnerKYC.objects.values_list('gst_attachment', flat=True))
+        self.assertEqual(len(adopted), 1)
+        self.assertEqual(self.stored_files(), sorted(adopted))
+        self.assertEqual(Blob.objects.get().refcount, 2)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from user.models import ResUser
+
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, BACKGROUND_TASKS_EAGER=True)
+        self.settings_override.enable()
+        partner = BusinessPartner.objects.create(
+            bp_code='BM001', role='BUYER', term='T1', business_name='Media', full_name='Media',
+            mobile='9876543210', email='media@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+        self.kyc = BusinessPartnerKYC.objects.create(
+            bp_code=partner, gst_no='G1', gst_attachment=SimpleUploadedFile('gst.pdf', b'%PDF-kyc-document'),
+        )
+        self.public = BusinessPartnerKYC._meta.get_field('gst_attachment').storage.save(
+            'order_images/public.txt', SimpleUploadedFile('public.txt', b'0123456789'),
+        )
+        order = Order.objects.create(
+            order_no='MO001', reference_no='REF-MO001', branch_code='BR-MO001', due_date=date.today(),
+            product='Ring', design='D1', vendor_design='VD1', state='draft', name='Media',
+        )
+        Order.objects.filter(pk=order.pk).update(order_image=self.public)
+        blobs.recount()
+        self.client = APIClient()
+        self.user = ResUser.objects.create_user('media-user', password='x', role_name='Admin')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def test_ranges_and_etags(self):
+        url = f'/media/{self.public}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{self.public.rsplit("/", 1)[1].split(".")[0]}"')
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b''.join(partial.streaming_content), b'2345')
+        self.assertEqual(partial['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(self.client.get(url, HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=20-').status_code, 416)
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.client.get('/media/../secret').status_code, 404)
+
+    def test_kyc_documents_need_authentication_and_can_be_offloaded(self):
+        from django.test import override_settings
+
+        url = f'/media/{self.kyc.gst_attachment.name}'
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.kyc.gst_attachment.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_unreferenced_blobs_are_not_served(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        replaced = self.kyc.gst_attachment.name
+        self.kyc.gst_attachment = SimpleUploadedFile('gst.pdf', b'%PDF-new-scan')
+        self.kyc.save()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(f'/media/{replaced}').status_code, 404)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(f'/media/{self.kyc.gst_attachment.name}').status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(f'/media/{replaced}').status_code, 404)
+
+    def test_files_under_protected_directories_need_authentication(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        legacy = default_storage.save('attachments/old-gst.pdf', ContentFile(b'%PDF-legacy'))
+        self.assertIn(self.client.get(f'/media/{legacy}').status_code, (401, 403))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(f'/media/{legacy}').status_code, 200)
+
+
+class PartnerResolverTests(TestCase):
+    def setUp(self):
+        self.craftsman = BusinessPartner.objects.create(
+            bp_code='AS001', role='CRAFTSMAN', term='T1', business_name='Shree Works', full_name='Shree',
+            mobile='9876543210', email='shree@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+        self.legacy = BusinessPartner.objects.create(
+            bp_code='OLD-7', role='BUYER', term='T1', business_name='Legacy', full_name='Legacy',
+            mobile='9876543210', email='legacy@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+
+    def test_resolves_bare_and_composite_identifiers_once(self):
+        from .resolvers import PartnerResolver
+
+        resolver = PartnerResolver()
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver.resolve(' AS001-shree works '), self.craftsman)
+            self.assertEqual(resolver.resolve('AS001-shree works', role='CRAFTSMAN'), self.craftsman)
+        self.assertEqual(resolver.resolve('AS001-Shree Works'), self.craftsman)
+        self.assertEqual(resolver.resolve('AS001'), self.craftsman)
+        self.assertIsNone(resolver.resolve('AS001-Other Works'))
+        self.assertIsNone(resolver.resolve('AS001', role='BUYER'))
+        self.assertEqual(resolver.resolve('OLD-7'), self.legacy)
+        self.assertIsNone(resolver.resolve('ZZ999'))
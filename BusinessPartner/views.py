@@ -113,9 +113,17 @@ class BusinessPartnerKYCView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        """Retrieve Business Partner KYC details or filter by `bp_code`."""
+        """Retrieve Business Partner KYC details, filtered by `bp_code` and/or `status` (e.g. Pending)."""
         bp_code = request.query_params.get("bp_code")
-        queryset = self.get_queryset().filter(bp_code=bp_code) if bp_code else self.get_queryset()
+        queryset = self.get_queryset().select_related('bp_code')
+        if bp_code:
+            queryset = queryset.filter(bp_code=bp_code)
+        kyc_status = request.query_params.get("status")
+        if kyc_status:
+            kyc_status = kyc_status.lower()
+            if kyc_status not in dict(BusinessPartnerKYC.STATUS_CHOICES):
+                return Response({"status": f"Unknown status '{request.query_params['status']}'."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(status=kyc_status)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -181,7 +189,7 @@ class BusinessPartnerKycFreeze(APIView):
         """Freeze the Business Partner KYC entry."""
         partner = self.get_object(bis_no)
         partner.freezed = True
-        partner.save()
+        partner.save(update_fields=['freezed'])
         serializer = BusinessPartnerKYCSerializer(partner)
         return Response(
             # {'message': 'Business Partner freezed successfully', 'data': serializer.data},
@@ -206,7 +214,7 @@ class BusinessPartnerKycRevoke(APIView):
         """Revoke (Unfreeze) the Business Partner KYC entry."""
         partner = self.get_object(bis_no)
         partner.freezed = False
-        partner.save()
+        partner.save(update_fields=['freezed'])
         serializer = BusinessPartnerKYCSerializer(partner)
         return Response(
             # {'message': 'Business Partner revoked successfully', 'data': serializer.data},
@@ -0,0 +1,124 @@
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, OuterRef, Q, Subquery
+
+from .models import OrderTransition
+
+# Statuses an order is rejected into, by a key user, admin or craftsman.
+REJECTED_STATUSES = ('reject', 'admin-rejected', 'rejected', 'deleted')
+
+
+def _next_move(field, **filters):
+    """The `field` of the next move of the same order, found on the (order, created_at) index."""
+    return Subquery(
+        OrderTransition.objects.filter(
+            order_id=OuterRef('order_id'), created_at__gt=OuterRef('created_at'), **filters,
+        ).order_by('created_at').values(field)[:1]
+    )
+
+
+def _duration(end):
+    return ExpressionWrapper(F(end) - F('created_at'), output_field=DurationField())
+
+
+def stays(since=None, until=None):
+    """
+    Moves made in [since, until), each annotated with `left_at` and
+    `next_status` (NULL while the order is still in that state) and
+    `duration`, the time spent in `to_status`.
+    """
+    queryset = OrderTransition.objects.all()
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset.annotate(
+        left_at=_next_move('created_at'), next_status=_next_move('to_status'),
+    ).annotate(duration=_duration('left_at'))
+
+
+def time_in_state(since=None, until=None):
+    """
+    Per status: how often orders entered it, how many are still there, and
+    the average and longest time spent in it by orders that moved on.
+    """
+    rows = (
+        stays(since, until).order_by().values('to_status')
+        .annotate(
+            entered=Count('id'),
+            current=Count('id', filter=Q(left_at__isnull=True)),
+            avg_duration=Avg('duration', filter=Q(left_at__isnull=False)),
+            max_duration=Max('duration', filter=Q(left_at__isnull=False)),
+        )
+        .order_by('to_status')
+    )
+    return [
+        {
+            "status": row['to_status'],
+            "entered": row['entered'],
+            "current": row['current'],
+            "avg_seconds": row['avg_duration'].total_seconds() if row['avg_duration'] is not None else None,
+            "max_seconds": row['max_duration'].total_seconds() if row['max_duration'] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def craftsman_turnaround(since=None, until=None):
+    """
+    Per craftsman, over the assignments made in [since, until): how many
+    were accepted or rejected, the average time to respond, and the average
+    time from assignment until that craftsman sent the order for approval.
+    """
+    rows = (
+        stays(since, until).filter(to_status='assigned', craftsman__isnull=False)
+        .annotate(finished_at=_next_move(
+            'created_at', to_status='awaiting-approval', craftsman_id=OuterRef('craftsman_id'),
+        ))
+        .order_by().values('craftsman_id', 'craftsman__bp_code', 'craftsman__full_name')
+        .annotate(
+            assignments=Count('id'),
+            accepted=Count('id', filter=Q(next_status='in-process')),
+            rejected=Count('id', filter=Q(next_status='rejected')),
+            avg_response=Avg('duration'),
+            avg_turnaround=Avg(_duration('finished_at')),
+        )
+        .order_by('craftsman__bp_code')
+    )
+    return [
+        {
+            "bp_code": row['craftsman__bp_code'],
+            "full_name": row['craftsman__full_name'],
+            "assignments": row['assignments'],
+            "accepted": row['accepted'],
+            "rejected": row['rejected'],
+            "avg_response_seconds": row['avg_response'].total_seconds() if row['avg_response'] is not None else None,
+            "avg_turnaround_seconds": row['avg_turnaround'].total_seconds() if row['avg_turnaround'] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def rejection_funnel(since=None, until=None):
+    """
+    Per status, the number of distinct orders that reached it in
+    [since, until) and how many of those were then rejected from it.
+    """
+    rows = (
+        stays(since, until).order_by().values('to_status')
+        .annotate(
+            reached=Count('order_id', distinct=True),
+            rejected=Count('order_id', distinct=True, filter=Q(next_status__in=REJECTED_STATUSES)),
+        )
+        .order_by('-reached', 'to_status')
+    )
+    return [
+        {"status": row['to_status'], "reached": row['reached'], "rejected": row['rejected']}
+        for row in rows
+        if row['to_status'] not in REJECTED_STATUSES
+    ]
+
+
+REPORTS = {
+    'time-in-state': time_in_state,
+    'turnaround': craftsman_turnaround,
+    'funnel': rejection_funnel,
+}
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class OrderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'order'
+
+    def ready(self):
+        from order import counters, workflow  # noqa: F401  (connects the counter and history receivers)
@@ -0,0 +1,323 @@
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from BusinessPartner.models import BusinessPartner, BusinessPartnerKYC
+from user.models import ResUser
+from . import counters
+from .models import Order, OrderCounter, OrderTransition
+
+BENCH_PREFIX = 'BENCH-'
+BENCH_PASSWORD = 'bench-password'
+WORKFLOW_STATUSES = ['new', 'pending', 'in-process', 'assigned', 'awaiting-approval', 'complete', 'rejected']
+KYC_STATUSES = [status for status, _ in BusinessPartnerKYC.STATUS_CHOICES]
+
+
+def check_benchmark_database():
+    """
+    Refuse to seed or clear synthetic rows unless BENCHMARK_DATABASE marks
+    the configured database as a disposable benchmark copy.
+    """
+    if not getattr(settings, 'BENCHMARK_DATABASE', False):
+        raise ImproperlyConfigured(
+            "Benchmark data is only written to a database marked with BENCHMARK_DATABASE = True."
+        )
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, items, batch_size, label, stdout=None):
+    """bulk_create a generator of unsaved rows one transaction per batch."""
+    created = 0
+    for batch in _batches(items, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+        if stdout:
+            stdout.write(f'  seeded {created} {label}')
+    return created
+
+
+def seed_partners(buyers=200, craftsmen=50, batch_size=5000, stdout=None):
+    """Bulk insert BUYER and CRAFTSMAN partners and return their ids by role."""
+    partners = (
+        BusinessPartner(
+            bp_code=f'{BENCH_PREFIX}{role[0]}{i:07d}', role=role, term='T1',
+            business_name=f'Bench {role.title()} {i}', full_name=f'Bench {role.title()} {i}',
+            mobile='9000000000', email=f'bench-{role.lower()}-{i}@example.com',
+            pincode='600001', city='Chennai', state='Tamil Nadu',
+        )
+        for role, count in (('BUYER', buyers), ('CRAFTSMAN', craftsmen))
+        for i in range(count)
+    )
+    _insert(BusinessPartner, partners, batch_size, 'business partners', stdout)
+    partners = BusinessPartner.objects.filter(bp_code__startswith=BENCH_PREFIX)
+    return {
+        'BUYER': list(partners.filter(role='BUYER').values_list('id', flat=True)),
+        'CRAFTSMAN': list(partners.filter(role='CRAFTSMAN').values_list('id', flat=True)),
+    }
+
+
+def seed_kyc(partner_ids, rng, batch_size=5000, stdout=None):
+    """One KYC record per partner, spread over every KYC status."""
+    def rows():
+        for i, partner_id in enumerate(partner_ids):
+            status = rng.choice(KYC_STATUSES)
+            yield BusinessPartnerKYC(
+                bp_code_id=partner_id, status=status, name=f'Bench KYC {i}',
+                bis_no=f'{BENCH_PREFIX}{i}', gst_no=f'33AAAAA{i % 10000:04d}A1Z5',
+                gst_attachment='attachments/bench.png', pan_no='AAAAA0000A',
+                bank_name='Bench Bank', account_no=f'{i:012d}', ifsc_code='BENC0000001',
+                freezed=status == 'freezed', revoked=status == 'revoked',
+            )
+    return _insert(BusinessPartnerKYC, rows(), batch_size, 'KYC records', stdout)
+
+
+def seed_users(partner_ids, batch_size=5000, stdout=None):
+    """
+    One login per partner plus a bench admin, all sharing one password hash.
+
+    Hashing once keeps 100k users from costing 100k PBKDF2 rounds.
+    """
+    password = make_password(BENCH_PASSWORD)
+    role_names = {'BUYER': 'User', 'CRAFTSMAN': 'Craftsman'}
+
+    def rows():
+        yield ResUser(
+            username=f'{BENCH_PREFIX}admin', password=password, role_name='Admin',
+            user_code=f'{BENCH_PREFIX}ADMIN', email_id='bench-admin@example.com', is_staff=True,
+        )
+        for role, ids in partner_ids.items():
+            for i, partner_id in enumerate(ids):
+                yield ResUser(
+                    username=f'{BENCH_PREFIX}{role.lower()}-{i}', password=password,
+                    role_name=role_names[role], bp_code_id=partner_id,
+                    user_code=f'{BENCH_PREFIX}{role[0]}{i:07d}', full_name=f'Bench {role.title()} {i}',
+                    email_id=f'bench-{role.lower()}-{i}@example.com', mobile_no='9000000000',
+                    pincode='600001', city='Chennai', state='Tamil Nadu', country='India',
+                )
+    return _insert(ResUser, rows(), batch_size, 'users', stdout)
+
+
+def generate_dataset(orders, seed=0, batch_size=5000, stdout=None):
+    """
+    Generate a reproducible ERP dataset scaled from the order count.
+
+    For N orders: N // 100 partners (at least 50, four buyers per
+    craftsman), one KYC record and one user per partner, a bench admin,
+    and N orders across every workflow status. The same `seed` and
+    `orders` always produce the same rows.
+    """
+    partners = max(50, orders // 100)
+    craftsmen = max(10, partners // 5)
+    partner_ids = seed_partners(partners - craftsmen, craftsmen, batch_size=batch_size, stdout=stdout)
+    rng = random.Random(seed)
+    seed_kyc(partner_ids['BUYER'] + partner_ids['CRAFTSMAN'], rng, batch_size=batch_size, stdout=stdout)
+    seed_users(partner_ids, batch_size=batch_size, stdout=stdout)
+    seed_orders(orders, batch_size=batch_size, partner_ids=partner_ids, seed=seed, stdout=stdout)
+    return {
+        'orders': orders,
+        'business_partners': partners,
+        'kyc': partners,
+        'users': partners + 1,
+    }
+
+
+def seed_orders(rows, batch_size=5000, buyers=200, craftsmen=50, stdout=None, partner_ids=None, seed=None):
+    """
+    Bulk insert `rows` synthetic orders spread over every workflow status.
+
+    Rows are tagged with BENCH_PREFIX so `clear_orders()` can remove them.
+    `bulk_create` skips model signals, so no pincode lookups run and the
+    order counters are bumped once per batch instead. Pass `partner_ids`
+    from `seed_partners()` to reuse existing partners.
+    """
+    if partner_ids is None:
+        partner_ids = seed_partners(buyers, craftsmen, batch_size=batch_size, stdout=stdout)
+    buyer_ids = partner_ids['BUYER']
+    craftsman_ids = partner_ids['CRAFTSMAN']
+
+    rng = random.Random(rows if seed is None else seed)
+    due_date = timezone.now().date() + timedelta(days=30)
+    created = 0
+    while created < rows:
+        batch = []
+        for i in range(created, min(created + batch_size, rows)):
+            status = rng.choice(WORKFLOW_STATUSES)
+            has_craftsman = status in ('assigned', 'awaiting-approval', 'complete') or (
+                status == 'in-process' and rng.random() < 0.5
+            )
+            batch.append(Order(
+                # Outside the WR sequence so generated rows never collide with real numbers.
+                order_no=f'BN{i:08d}', status=status,
+                bp_code_id=rng.choice(buyer_ids),
+                craftsman_id=rng.choice(craftsman_ids) if has_craftsman else None,
+                rejected_by_id=rng.choice(craftsman_ids) if status == 'rejected' else None,
+                name=f'Bench order {i}', reference_no=f'{BENCH_PREFIX}{i}', branch_code=f'BX{i:08d}',
+                due_date=due_date, product='Ring', design='D1', vendor_design='VD1', state='draft',
+            ))
+        with transaction.atomic():
+            Order.objects.bulk_create(batch, batch_size=batch_size)
+            counters.apply(Counter(counters.order_key(order) for order in batch))
+        created += len(batch)
+        if stdout:
+            stdout.write(f'  seeded {created}/{rows} orders')
+    return created
+
+
+def clear_orders():
+    """
+    Remove the rows seeded by this module.
+
+    Orders are deleted without per-row signals, which would run one counter
+    UPDATE each; their counts come off the counters in one grouped query.
+    """
+    orders = Order.objects.filter(reference_no__startswith=BENCH_PREFIX)
+    with transaction.atomic():
+        counters.apply({key: -total for key, total in counters.tally(orders).items()})
+        OrderCounter.objects.filter(count=0).delete()
+        OrderTransition.objects.filter(order__reference_no__startswith=BENCH_PREFIX).delete()
+        orders._raw_delete(orders.db)
+    ResUser.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    # KYC records cascade with their partner.
+    BusinessPartner.objects.filter(bp_code__startswith=BENCH_PREFIX).delete()
+
+
+def hot_queries(page_size=10):
+    """The first page of every workflow list, filtered exactly as order/views.py does."""
+    craftsman = BusinessPartner.objects.filter(bp_code__startswith=f'{BENCH_PREFIX}C').first()
+    buyer = BusinessPartner.objects.filter(bp_code__startswith=f'{BENCH_PREFIX}B').first()
+    keyset = ('-created_at', '-id')
+    return {
+        'order-list': Order.objects.order_by(*keyset)[:page_size],
+        'order-list?bp_code': Order.objects.filter(bp_code=buyer).order_by(*keyset)[:page_size],
+        'new-orders': Order.objects.filter(status='in-process', craftsman__isnull=True).order_by(*keyset)[:page_size],
+        'assigned-orders': Order.objects.filter(craftsman__isnull=False).order_by(*keyset)[:page_size],
+        'order-in-process': Order.objects.filter(status='in-process', craftsman__isnull=False).order_by(*keyset)[:page_size],
+        'completed-orders': Order.objects.filter(status='complete').order_by(*keyset)[:page_size],
+        'rejected-orders': Order.objects.filter(status='rejected').select_related('rejected_by').values(
+            'order_no', 'rejected_by__full_name', 'rejected_by__bp_code', 'rejected_by__business_name',
+        )[:page_size],
+        'craftsman-load': Order.objects.filter(status='assigned', craftsman=craftsman).order_by(*keyset)[:page_size],
+    }
+
+
+def time_query(queryset, repeat=5):
+    """Median and worst wall time, in milliseconds, to fully evaluate `queryset`."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset._chain())
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def endpoint_targets():
+    """
+    (name, method, path, body) for the endpoints the benchmark drives.
+
+    Partner/KYC/user lists are filtered to one record because their views
+    are not paginated; the order lists use their first keyset page.
+    """
+    buyer = BusinessPartner.objects.filter(bp_code__startswith=f'{BENCH_PREFIX}B').order_by('id').first()
+    user = ResUser.objects.filter(username__startswith=f'{BENCH_PREFIX}buyer').order_by('id').first()
+    order = Order.objects.filter(reference_no__startswith=BENCH_PREFIX).order_by('id').first()
+    targets = [
+        ('order-list', 'get', reverse('order-list'), None),
+        ('order-list?status', 'get', reverse('order-list') + '?status=complete', None),
+        ('new-orders', 'get', reverse('new-orders'), None),
+        ('assigned-orders', 'get', reverse('assigned-orders'), None),
+        ('order-in-process', 'get', reverse('order-in-process'), None),
+        ('completed-orders', 'get', reverse('completed-orders'), None),
+        ('rejected-orders', 'get', reverse('rejected-orders'), None),
+    ]
+    if order:
+        targets.append(('order-detail', 'get', reverse('order-detail', args=[order.order_no]), None))
+    if buyer:
+        targets += [
+            ('order-list?bp_code', 'get', reverse('order-list') + f'?bp_code={buyer.bp_code}', None),
+            ('BusinessPartner-list?bp_code', 'get', reverse('BusinessPartner-list') + f'?bp_code={buyer.bp_code}', None),
+            ('BusinessPartnerKYC-list?bp_code', 'get', reverse('BusinessPartnerKYC-list') + f'?bp_code={buyer.pk}', None),
+        ]
+    if user:
+        targets += [
+            ('user_detail_api', 'get', reverse('user_detail_api', args=[user.email_id]), None),
+            ('login', 'post', reverse('login'), {'email_or_mobile': user.email_id, 'password': BENCH_PASSWORD}),
+        ]
+    return targets
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def benchmark_endpoints(iterations=50, warmup=3, only=None):
+    """
+    Drive each endpoint through the DRF test client as the bench admin.
+
+    Returns {name: {p50_ms, p95_ms, p99_ms, mean_ms, queries_per_request, status}}.
+    Latency covers the full Django stack (middleware, view, serializer,
+    renderer) but not the network or a WSGI server.
+    """
+    client = APIClient(raise_request_exception=False)
+    admin = ResUser.objects.filter(username=f'{BENCH_PREFIX}admin').first()
+    if admin:
+        client.force_authenticate(admin)
+
+    results = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name, method, path, body in endpoint_targets():
+            if only and name not in only:
+                continue
+            call = getattr(client, method)
+            for _ in range(warmup):
+                call(path, body, format='json')
+
+            timings, queries, status_code = [], [], None
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = call(path, body, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries.append(len(ctx))
+                status_code = response.status_code
+
+            timings.sort()
+            results[name] = {
+                'path': path,
+                'status': status_code,
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'mean_ms': round(statistics.fmean(timings), 3),
+                'queries_per_request': round(statistics.fmean(queries), 2),
+            }
+    return results
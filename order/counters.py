@@ -0,0 +1,168 @@
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Order, OrderCounter
+
+logger = logging.getLogger(__name__)
+
+# Order fields a counter row is keyed on.
+KEY_FIELDS = ('bp_code_id', 'status', 'category', 'segment')
+
+# Summary dimension -> OrderCounter field it groups by.
+DIMENSIONS = {
+    'by_status': 'status',
+    'by_category': 'category',
+    'by_segment': 'segment',
+}
+
+# Label for orders without a category, segment or partner in summaries.
+UNSPECIFIED = 'unspecified'
+
+
+def counter_key(bp_code_id, status, category, segment):
+    return bp_code_id, status, category or '', segment or ''
+
+
+def order_key(order):
+    """The counter key an Order instance is counted under."""
+    return counter_key(*(getattr(order, field) for field in KEY_FIELDS))
+
+
+def moves(pairs):
+    """`{key: change}` for `(key before, key after)` pairs, with unchanged keys dropped."""
+    changes = Counter()
+    for before, after in pairs:
+        if before != after:
+            changes[before] -= 1
+            changes[after] += 1
+    return changes
+
+
+def _row(key):
+    partner_id, status, category, segment = key
+    return {'partner_id': partner_id, 'status': status, 'category': category, 'segment': segment}
+
+
+def apply(changes):
+    """
+    Add `{key: change}` to the counter rows with one UPDATE per key,
+    creating rows that don't exist yet.
+
+    Keys are applied in a fixed order so concurrent batches lock the rows
+    in the same order. Call inside the transaction that changes the orders.
+    """
+    for key, change in sorted(changes.items(), key=lambda item: (item[0][0] or 0, item[0][1:])):
+        if not change:
+            continue
+        rows = OrderCounter.objects.filter(**_row(key))
+        if rows.update(count=F('count') + change):
+            continue
+        try:
+            with transaction.atomic():
+                OrderCounter.objects.create(count=change, **_row(key))
+        except IntegrityError:
+            # Another transaction created the row first.
+            rows.update(count=F('count') + change)
+
+
+@receiver(pre_save, sender=Order, dispatch_uid='order_counters:pre_save')
+def _remember_key(sender, instance, update_fields=None, raw=False, **kwargs):
+    previous = None
+    key_fields = {'bp_code', 'bp_code_id', 'status', 'category', 'segment'}
+    if (
+        not raw and not instance._state.adding and instance.pk is not None
+        and (update_fields is None or key_fields.intersection(update_fields))
+    ):
+        row = sender._base_manager.filter(pk=instance.pk).values_list(*KEY_FIELDS).first()
+        previous = counter_key(*row) if row else None
+    instance._counter_previous = previous
+
+
+@receiver(post_save, sender=Order, dispatch_uid='order_counters:post_save')
+def _count_saved(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_counter_previous', None)
+    if raw:
+        return
+    if created:
+        apply({order_key(instance): 1})
+    elif previous is not None:
+        apply(moves([(previous, order_key(instance))]))
+
+
+@receiver(post_delete, sender=Order, dispatch_uid='order_counters:post_delete')
+def _count_deleted(sender, instance, **kwargs):
+    apply({order_key(instance): -1})
+
+
+def tally(orders):
+    """`{key: number of orders}` for an Order queryset, in one grouped query."""
+    return {
+        counter_key(row['bp_code'], row['status'], row['key_category'], row['key_segment']): row['total']
+        for row in orders.order_by()
+        .values('bp_code', 'status', key_category=Coalesce('category', Value('')),
+                key_segment=Coalesce('segment', Value('')))
+        .annotate(total=Count('id'))
+    }
+
+
+def summary(bp_code=None):
+    """
+    Order counts from the counter rows, in total and per status, category
+    and segment; per partner too unless `bp_code` picks one partner.
+    One grouped query per dimension over that partner's few rows.
+    """
+    rows = OrderCounter.objects.order_by()
+    if bp_code:
+        rows = rows.filter(partner__bp_code=bp_code)
+    dimensions = dict(DIMENSIONS) if bp_code else {**DIMENSIONS, 'by_partner': 'partner__bp_code'}
+    result = {}
+    for name, field in dimensions.items():
+        result[name] = {
+            value or UNSPECIFIED: total
+            for value, total in rows.values(field).annotate(total=Sum('count'))
+            .filter(total__gt=0).order_by(field).values_list(field, 'total')
+        }
+    result['total'] = sum(result['by_status'].values())
+    return result
+
+
+def reconcile():
+    """
+    Rebuild the counter rows from the orders and return how many were wrong.
+
+    The counter rows are locked before the orders are counted, so moves
+    committing meanwhile wait and are added on top of the corrected
+    values instead of being overwritten. Rows that did not exist yet can't
+    be locked; if a concurrent apply() creates one first, it is set to
+    the recounted value instead of failing the unique constraint.
+    """
+    with transaction.atomic():
+        stored = {
+            (row.partner_id, row.status, row.category, row.segment): row
+            for row in OrderCounter.objects.select_for_update()
+        }
+        actual = tally(Order.objects.all())
+        changed = []
+        for key, row in stored.items():
+            if row.count != actual.get(key, 0):
+                row.count = actual.get(key, 0)
+                changed.append(row)
+        missing = {key: total for key, total in actual.items() if key not in stored}
+        OrderCounter.objects.bulk_update(changed, ['count'], batch_size=1000)
+        OrderCounter.objects.bulk_create(
+            [OrderCounter(count=total, **_row(key)) for key, total in missing.items()],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        for key, total in missing.items():
+            OrderCounter.objects.filter(**_row(key)).exclude(count=total).update(count=total)
+        OrderCounter.objects.filter(count=0).delete()
+    drift = len(changed) + len(missing)
+    if drift:
+        logger.warning(f"Reconciled {drift} order counters that had drifted")
+    return drift
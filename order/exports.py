@@ -0,0 +1,58 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .serializers import OrderSerializer
+
+# Columns follow OrderSerializer so exports match the list API, with related
+# partners flattened to their codes and a few workflow columns added.
+# Computed fields such as thumbnail URLs have no column and are left out.
+EXPORT_COLUMNS = [name for name in OrderSerializer.Meta.fields if name not in ('thumbnails', 'status')] + [
+    'status', 'created_at', 'craftsman', 'rejected_by', 'rejection_reason',
+]
+
+_COLUMN_LOOKUPS = {
+    'bp_code': 'bp_code__bp_code',
+    'craftsman': 'craftsman__bp_code',
+    'rejected_by': 'rejected_by__bp_code',
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset):
+    """
+    Yield export rows as tuples from a server-side cursor.
+
+    `values_list()` skips model instantiation and `iterator()` fetches
+    EXPORT_CHUNK_SIZE rows at a time, so memory use does not grow with the
+    number of rows exported.
+    """
+    lookups = [_COLUMN_LOOKUPS.get(column, column) for column in EXPORT_COLUMNS]
+    return queryset.order_by('id').values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in iter_rows(queryset):
+        yield writer.writerow(row)
+
+
+def stream_ndjson(queryset):
+    for row in iter_rows(queryset):
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv', 'orders.csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'orders.ndjson'),
+}
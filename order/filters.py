@@ -0,0 +1,109 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def _parse_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValidationError({name: "Invalid date. Expected format: YYYY-MM-DD."})
+    return parsed
+
+
+def _start_of_day(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def _list_param(params, name):
+    return [value for value in params.get(name, '').split(',') if value]
+
+
+def _filter_in(queryset, field, values):
+    if len(values) == 1:
+        return queryset.filter(**{field: values[0]})
+    if values:
+        return queryset.filter(**{f'{field}__in': values})
+    return queryset
+
+
+def partner_lookup(field, value):
+    """
+    Filter kwargs matching the partner in `field` by id when `value` is
+    numeric, as order lists first accepted, and by partner code otherwise.
+    """
+    if value.isdigit():
+        return {field: int(value)}
+    return {f'{field}__bp_code': value}
+
+
+# `ordering` values accepted by order lists. Each is backed by an index on
+# (column, id), the pair the cursor pagination orders and seeks by.
+ORDERINGS = ('-created_at', 'created_at', 'due_date', '-due_date')
+
+
+def date_bounds(params):
+    """
+    `(since, until)` datetimes for the inclusive `date_from` / `date_to`
+    query parameters (YYYY-MM-DD); either is None when not given.
+    """
+    date_from = _parse_date_param(params, 'date_from')
+    date_to = _parse_date_param(params, 'date_to')
+    return (
+        _start_of_day(date_from) if date_from else None,
+        _start_of_day(date_to + timedelta(days=1)) if date_to else None,
+    )
+
+
+def filter_orders(queryset, params):
+    """
+    Apply the order list query parameters to `queryset`.
+
+    - `bp_code`: partner code, e.g. `BA001`, or partner id
+    - `status`, `category`, `segment`: one value or a comma-separated list
+    - `craftsman`: assigned craftsman's code, or `none` for unassigned orders
+    - `date_from` / `date_to`: inclusive creation date range (YYYY-MM-DD)
+    - `due_from` / `due_to`: inclusive due date range (YYYY-MM-DD)
+
+    Date bounds are turned into datetime ranges so the `created_at` indexes
+    stay usable.
+    """
+    bp_code = params.get('bp_code')
+    if bp_code:
+        queryset = queryset.filter(**partner_lookup('bp_code', bp_code))
+
+    for field in ('status', 'category', 'segment'):
+        queryset = _filter_in(queryset, field, _list_param(params, field))
+
+    craftsman = params.get('craftsman')
+    if craftsman == 'none':
+        queryset = queryset.filter(craftsman__isnull=True)
+    elif craftsman:
+        queryset = queryset.filter(craftsman__bp_code=craftsman)
+
+    since, until = date_bounds(params)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+
+    due_from = _parse_date_param(params, 'due_from')
+    if due_from:
+        queryset = queryset.filter(due_date__gte=due_from)
+    due_to = _parse_date_param(params, 'due_to')
+    if due_to:
+        queryset = queryset.filter(due_date__lte=due_to)
+
+    return queryset
+
+
+def order_ordering(params):
+    """The validated `ordering` query parameter, newest first by default."""
+    ordering = params.get('ordering') or ORDERINGS[0]
+    if ordering not in ORDERINGS:
+        raise ValidationError({"ordering": f"Must be one of: {', '.join(ORDERINGS)}."})
+    return ordering
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from order.scheduler import auto_assign
+
+
+class Command(BaseCommand):
+    help = "Assign unassigned in-process orders to craftsmen by load, due date and rejection history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help="Assign at most this many orders, earliest due first.")
+        parser.add_argument('--dry-run', action='store_true', help="Print the plan without saving it.")
+
+    def handle(self, *args, **options):
+        assignments, unassigned = auto_assign(limit=options['limit'], dry_run=options['dry_run'])
+        for order, craftsman in assignments:
+            self.stdout.write(f"{order.order_no} (due {order.due_date}) -> {craftsman.bp_code}")
+        if unassigned:
+            self.stdout.write(f"No craftsman has capacity for {len(unassigned)} orders.")
+        verb = "Would assign" if options['dry_run'] else "Assigned"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(assignments)} orders."))
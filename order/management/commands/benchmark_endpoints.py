@@ -0,0 +1,62 @@
+import json
+import platform
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from BusinessPartner.models import BusinessPartner
+from order.benchmarks import BENCH_PREFIX, benchmark_endpoints
+from order.models import Order
+from user.models import ResUser
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the main API endpoints through the DRF test client against data from "
+        "generate_bench_data and report p50/p95/p99 latency and queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per endpoint.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help="Only run this endpoint (repeatable).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        if not ResUser.objects.filter(username=f'{BENCH_PREFIX}admin').exists():
+            raise CommandError("No benchmark data found; run `manage.py generate_bench_data` first.")
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'git_revision': _git_revision(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'rows': {
+                    'orders': Order.objects.count(),
+                    'business_partners': BusinessPartner.objects.count(),
+                    'users': ResUser.objects.count(),
+                },
+            },
+            'endpoints': benchmark_endpoints(
+                iterations=options['iterations'], warmup=options['warmup'], only=options['endpoints'],
+            ),
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
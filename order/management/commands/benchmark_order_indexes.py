@@ -0,0 +1,36 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from order.benchmarks import check_benchmark_database, clear_orders, hot_queries, seed_orders, time_query
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic orders and print the query plan and timing of each workflow list query."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, help="Number of orders to seed, e.g. 1000000.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query.")
+        parser.add_argument('--skip-seed', action='store_true', help="Reuse orders seeded by a previous run.")
+        parser.add_argument('--keep', action='store_true', help="Do not delete the seeded orders afterwards.")
+
+    def handle(self, *args, **options):
+        try:
+            check_benchmark_database()
+        except ImproperlyConfigured as exc:
+            raise CommandError(exc)
+        if not options['skip_seed'] and not options['rows']:
+            raise CommandError("Pass --rows, or --skip-seed to reuse orders seeded earlier.")
+        if not options['skip_seed']:
+            self.stdout.write(f"Seeding {options['rows']} orders...")
+            seed_orders(options['rows'], batch_size=options['batch_size'], stdout=self.stdout)
+
+        try:
+            for name, queryset in hot_queries().items():
+                median, worst = time_query(queryset, repeat=options['repeat'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}: median {median:.2f} ms, max {worst:.2f} ms"))
+                self.stdout.write(queryset.explain())
+        finally:
+            if not options['keep']:
+                self.stdout.write("\nRemoving seeded orders...")
+                clear_orders()
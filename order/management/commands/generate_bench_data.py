@@ -0,0 +1,32 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from order.benchmarks import check_benchmark_database, clear_orders, generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible synthetic dataset (users, partners, KYC, orders) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10_000, help="Number of orders; other tables scale from it.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same rows.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help="Delete previously generated rows first.")
+        parser.add_argument('--clear-only', action='store_true', help="Delete previously generated rows and exit.")
+
+    def handle(self, *args, **options):
+        try:
+            check_benchmark_database()
+        except ImproperlyConfigured as exc:
+            raise CommandError(exc)
+        if options['clear'] or options['clear_only']:
+            self.stdout.write("Removing generated rows...")
+            clear_orders()
+            if options['clear_only']:
+                return
+
+        counts = generate_dataset(
+            options['orders'], seed=options['seed'], batch_size=options['batch_size'], stdout=self.stdout,
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from order.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the order dashboard counters from the orders; run periodically (e.g. nightly from cron)."
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {drift} order counters."))
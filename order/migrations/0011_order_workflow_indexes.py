@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0029_remove_businesspartner_partner_type'),
+        ('order', '0010_alter_order_rejection_reason'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['bp_code', '-created_at', '-id'], name='order_bp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'craftsman', '-created_at', '-id'], name='order_status_craftsman_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('craftsman__isnull', False)), fields=['-created_at', '-id'], name='order_assigned_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'rejected')), fields=['rejected_by'], name='order_rejected_by_idx'),
+        ),
+    ]
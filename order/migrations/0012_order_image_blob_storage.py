@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:08
+
+import taraerp.blobs
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0011_order_workflow_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_image',
+            field=models.ImageField(blank=True, null=True, storage=taraerp.blobs.blob_storage, upload_to='order_images/', verbose_name='Add Images'),
+        ),
+    ]
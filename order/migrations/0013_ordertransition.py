@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    # Earlier moves were overwritten in place; start each order's history
+    # from the state it is in now.
+    Order = apps.get_model('order', 'Order')
+    OrderTransition = apps.get_model('order', 'OrderTransition')
+    batch = []
+    for pk, order_no, status, craftsman_id, user_id, created_at in Order.objects.values_list(
+        'pk', 'order_no', 'status', 'craftsman_id', 'user_id', 'created_at',
+    ).iterator(chunk_size=1000):
+        batch.append(OrderTransition(
+            order_id=pk, order_no=order_no, to_status=status, craftsman_id=craftsman_id,
+            actor_id=user_id, created_at=created_at,
+        ))
+        if len(batch) == 1000:
+            OrderTransition.objects.bulk_create(batch)
+            batch = []
+    OrderTransition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0031_businesspartnerkyc_blob_storage'),
+        ('order', '0012_order_image_blob_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_no', models.CharField(blank=True, max_length=10, null=True)),
+                ('from_status', models.CharField(blank=True, default='', max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('craftsman', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='BusinessPartner.businesspartner')),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transitions', to='order.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'created_at'], name='order_transition_order_idx'), models.Index(fields=['to_status', 'created_at'], name='order_transition_status_idx'), models.Index(fields=['craftsman', 'to_status', 'created_at'], name='order_transition_craftsman_idx')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
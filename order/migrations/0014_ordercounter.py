@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_orders(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    OrderCounter = apps.get_model('order', 'OrderCounter')
+    rows = (
+        Order.objects.order_by()
+        .values('bp_code', 'status', key_category=Coalesce('category', models.Value('')),
+                key_segment=Coalesce('segment', models.Value('')))
+        .annotate(total=models.Count('id'))
+    )
+    OrderCounter.objects.bulk_create([
+        OrderCounter(
+            partner_id=row['bp_code'], status=row['status'], category=row['key_category'],
+            segment=row['key_segment'], count=row['total'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0031_businesspartnerkyc_blob_storage'),
+        ('order', '0013_ordertransition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('segment', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('partner', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='BusinessPartner.businesspartner')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('partner__isnull', False)), fields=('partner', 'status', 'category', 'segment'), name='order_counter_partner_uniq'), models.UniqueConstraint(condition=models.Q(('partner__isnull', True)), fields=('status', 'category', 'segment'), name='order_counter_no_partner_uniq')],
+            },
+        ),
+        migrations.RunPython(count_orders, migrations.RunPython.noop),
+    ]
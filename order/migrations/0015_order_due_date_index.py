@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0031_businesspartnerkyc_blob_storage'),
+        ('order', '0014_ordercounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['due_date', 'id'], name='order_due_date_idx'),
+        ),
+    ]
@@ -16,6 +16,8 @@ from datetime import date
 from django.utils import timezone
 import pytz
 from django.core.exceptions import ValidationError
+from taraerp import blobs, images
+from taraerp.sequences import BlockAllocator
 
 
 
@@ -26,12 +28,25 @@ class YourModel(models.Model):
     your_datetime_field = models.DateTimeField(default=now, blank=True, null=True)
 
 
+def _last_order_number():
+    """Highest number already used in `order_no`, read once to seed the counter."""
+    last_number = 0
+    for order_no in Order.objects.exclude(order_no__isnull=True).values_list('order_no', flat=True).iterator():
+        digits = order_no[2:] if order_no.startswith('WR') else order_no
+        if digits.isdigit():
+            last_number = max(last_number, int(digits))
+    return last_number
+
+
+order_no_allocator = BlockAllocator(
+    'order_no',
+    block_size=getattr(settings, 'ORDER_NO_BLOCK_SIZE', 20),
+    seed=_last_order_number,
+)
+
+
 def get_order_no():
-    last_order = Order.objects.order_by('-id').first()
-    if last_order and last_order.order_no.startswith('WR'):
-        order_number = int(last_order.order_no[2:]) + 1
-        return f"WR{order_number:03d}"
-    return "WR001"
+    return f"WR{order_no_allocator.next_value():03d}"
 
 def current_user(request):
     current_user = user.objects.get(id=request.user.id)
@@ -148,7 +163,7 @@ class Order(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     created_at = models.DateTimeField(auto_now_add=True)
-    order_image = models.ImageField(upload_to='order_images/', verbose_name="Add Images", blank=True, null=True)
+    order_image = models.ImageField(upload_to='order_images/', storage=blobs.blob_storage, verbose_name="Add Images", blank=True, null=True)
     # bp_code = models.CharField(max_length=20, unique=True, blank=True, null=True) 
     order_no = models.CharField(max_length=10, unique=True, blank=True, null=True)
     bp_code = models.ForeignKey(BusinessPartner, on_delete=models.CASCADE, related_name='orders', null=True, blank=True)
@@ -204,6 +219,30 @@ class Order(models.Model):
     assigned_to = models.ForeignKey(BusinessPartner, on_delete=models.SET_NULL, null=True, blank=True, related_name='reassigned_orders')
     rejection_reason = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Unfiltered list pages, keyset-paginated on (created_at, id).
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            # `?bp_code=` lists for a partner, newest first.
+            models.Index(fields=['bp_code', '-created_at', '-id'], name='order_bp_created_idx'),
+            # Completed / rejected lists: a single status, newest first.
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            # New / in-process / approve dashboards: status with craftsman IS [NOT] NULL.
+            models.Index(fields=['status', 'craftsman', '-created_at', '-id'], name='order_status_craftsman_idx'),
+            # Assigned orders list: any status, craftsman IS NOT NULL.
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(craftsman__isnull=False),
+                name='order_assigned_created_idx',
+            ),
+            # Rejected orders joined to the rejecting craftsman.
+            models.Index(
+                fields=['rejected_by'], condition=models.Q(status='rejected'),
+                name='order_rejected_by_idx',
+            ),
+            # Lists sorted by `?ordering=due_date`, and the scheduler's earliest-due-first scan.
+            models.Index(fields=['due_date', 'id'], name='order_due_date_idx'),
+        ]
+
     def clean(self):
         super().clean()
         if self.due_date and self.due_date <= timezone.now().date():
@@ -250,6 +289,72 @@ class Order(models.Model):
     
     def __str__(self):
         return f"Order {self.order_no}"
+
+
+images.register(Order, ['order_image'])
+blobs.track(Order, ['order_image'])
+
+
+class OrderTransition(models.Model):
+    """
+    Append-only history of the order workflow: one row per change of
+    status or craftsman, written by order.workflow in the same transaction
+    as the change. Rows are never updated, and they outlive the order (key
+    user rejection deletes it), so the foreign keys carry no database
+    constraint.
+    """
+    order = models.ForeignKey(Order, on_delete=models.DO_NOTHING, db_constraint=False, related_name='transitions')
+    order_no = models.CharField(max_length=10, blank=True, null=True)
+    # Empty for the row recorded when the order is created.
+    from_status = models.CharField(max_length=20, blank=True, default='')
+    to_status = models.CharField(max_length=20)
+    # The craftsman holding the order after the move.
+    craftsman = models.ForeignKey(BusinessPartner, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # An order's timeline; finds the move that ended each state.
+            models.Index(fields=['order', 'created_at'], name='order_transition_order_idx'),
+            # Time in state and funnels over a period.
+            models.Index(fields=['to_status', 'created_at'], name='order_transition_status_idx'),
+            # Per-craftsman turnaround.
+            models.Index(fields=['craftsman', 'to_status', 'created_at'], name='order_transition_craftsman_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_no}: {self.from_status or '-'} -> {self.to_status}"
+
+
+class OrderCounter(models.Model):
+    """
+    Number of orders per (partner, status, category, segment), kept up to
+    date by order.counters as orders are created, moved and deleted, so
+    dashboards read a handful of rows instead of counting orders. Missing
+    category and segment are stored as ''.
+    """
+    partner = models.ForeignKey(BusinessPartner, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    category = models.CharField(max_length=50, blank=True, default='')
+    segment = models.CharField(max_length=50, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for a partner's summary.
+            models.UniqueConstraint(
+                fields=['partner', 'status', 'category', 'segment'], condition=models.Q(partner__isnull=False),
+                name='order_counter_partner_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['status', 'category', 'segment'], condition=models.Q(partner__isnull=True),
+                name='order_counter_no_partner_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.partner_id or '-'}/{self.status}/{self.category or '-'}/{self.segment or '-'} = {self.count}"
     
     
 class Craftsman(models.Model):
@@ -0,0 +1,123 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Keyset pagination for order lists.
+
+    Pages are addressed by the `(ordering field, id)` pair of the last row seen
+    instead of an OFFSET, so fetching page 1000 costs the same as page 1.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        self.field = self.ordering.lstrip('-')
+        self.descending = self.ordering.startswith('-')
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor['reverse'] if cursor else False
+
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + self.field, prefix + 'id')
+        if cursor:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': cursor['value']}) |
+                Q(**{self.field: cursor['value'], f'id__{lookup}': cursor['id']})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field)
+        payload = {
+            'v': value.isoformat() if hasattr(value, 'isoformat') else value,
+            'id': instance.pk,
+            'r': int(reverse),
+        }
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            value = model._meta.get_field(self.field).to_python(payload['v'])
+            return {
+                'value': value,
+                'id': int(payload['id']),
+                'reverse': bool(payload.get('r')),
+            }
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,127 @@
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from BusinessPartner.models import BusinessPartner
+
+from .models import Order
+from .workflow import assign_orders
+
+# Statuses in which an order keeps its craftsman busy.
+OPEN_STATUSES = ('assigned', 'in-process')
+
+
+class CraftsmanLoad:
+    """Open workload and track record of one craftsman."""
+    __slots__ = ('partner', 'open_orders', 'due_soon', 'handled', 'rejected')
+
+    def __init__(self, partner):
+        self.partner = partner
+        self.open_orders = 0
+        self.due_soon = 0
+        self.handled = 0
+        self.rejected = 0
+
+    @property
+    def rejection_rate(self):
+        return self.rejected / (self.handled + self.rejected + 1)
+
+    def score(self):
+        """Lower is better: open orders (those due soon count twice), scaled up by the rejection rate."""
+        return (self.open_orders + self.due_soon + 1) * (1 + self.rejection_rate)
+
+
+class WorkloadIndex:
+    """
+    Workload of every craftsman, built with three queries however many
+    orders exist: the craftsmen, per-craftsman order counts, and per-craftsman
+    rejection counts.
+    """
+
+    def __init__(self, loads, capacity, due_by):
+        self.loads = loads
+        self.capacity = capacity
+        self.due_by = due_by
+
+    @classmethod
+    def build(cls, today=None):
+        today = today or timezone.now().date()
+        due_by = today + timedelta(days=getattr(settings, 'ASSIGNMENT_DUE_SOON_DAYS', 3))
+        loads = {
+            partner.pk: CraftsmanLoad(partner)
+            for partner in BusinessPartner.objects.filter(role='CRAFTSMAN')
+            .only('id', 'bp_code', 'business_name', 'full_name')
+        }
+        is_open = Q(status__in=OPEN_STATUSES)
+        for row in Order.objects.filter(craftsman__isnull=False).values('craftsman').annotate(
+            open_orders=Count('id', filter=is_open),
+            due_soon=Count('id', filter=is_open & Q(due_date__lte=due_by)),
+            handled=Count('id'),
+        ):
+            load = loads.get(row['craftsman'])
+            if load is not None:
+                load.open_orders, load.due_soon, load.handled = row['open_orders'], row['due_soon'], row['handled']
+        for row in Order.objects.filter(rejected_by__isnull=False).values('rejected_by').annotate(rejected=Count('id')):
+            load = loads.get(row['rejected_by'])
+            if load is not None:
+                load.rejected = row['rejected']
+        return cls(loads, getattr(settings, 'CRAFTSMAN_CAPACITY', 10), due_by)
+
+    def ranked(self):
+        """Loads from the best candidate to the worst."""
+        return sorted(self.loads.values(), key=lambda load: (load.score(), load.partner.pk))
+
+    def plan(self, orders):
+        """
+        Pick a craftsman for each order, earliest due date first, and
+        return `(assignments, unassigned)`.
+
+        Craftsmen with room sit in a heap keyed on their score: each order
+        pops the best one, whose load is updated and pushed back unless it
+        is now at CRAFTSMAN_CAPACITY. Orders left once every craftsman is
+        full are returned as unassigned.
+        """
+        heap = [
+            (load.score(), load.partner.pk, load)
+            for load in self.loads.values() if load.open_orders < self.capacity
+        ]
+        heapq.heapify(heap)
+        assignments, unassigned = [], []
+        for order in sorted(orders, key=lambda order: (order.due_date, order.pk)):
+            if not heap:
+                unassigned.append(order)
+                continue
+            _, _, load = heapq.heappop(heap)
+            assignments.append((order, load.partner))
+            load.open_orders += 1
+            if order.due_date <= self.due_by:
+                load.due_soon += 1
+            if load.open_orders < self.capacity:
+                heapq.heappush(heap, (load.score(), load.partner.pk, load))
+        return assignments, unassigned
+
+
+def auto_assign(limit=None, dry_run=False, actor=None):
+    """
+    Spread unassigned in-process orders over the craftsmen in one batch.
+
+    The orders are locked while the plan is made and applied with a
+    single UPDATE. Returns `(assignments, unassigned)`; with `dry_run`
+    nothing is written.
+    """
+    with transaction.atomic():
+        pending = (
+            Order.objects.select_for_update()
+            .filter(status='in-process', craftsman__isnull=True)
+            .only('id', 'order_no', 'due_date', 'status', 'craftsman', 'rejected_by', 'bp_code', 'category', 'segment')
+            .order_by('due_date', 'id')
+        )
+        orders = list(pending[:limit] if limit else pending)
+        assignments, unassigned = WorkloadIndex.build().plan(orders)
+        if assignments and not dry_run:
+            assign_orders(assignments, actor=actor)
+    return assignments, unassigned
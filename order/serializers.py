@@ -1,9 +1,13 @@
 from django.utils import timezone
 import pytz
+from django.conf import settings
 from rest_framework import serializers
 from SuperAdmin.models import SuperAdmin
-from .models import Order
+from .models import Order, get_order_no
+from .workflow import BULK_ACTIONS, actor_from, bulk_transition, transition
+from taraerp.images import ImageVariantsField
 from BusinessPartner.models import BusinessPartner
+from BusinessPartner.resolvers import PartnerResolver
 from user.models import ResUser, BusinessPartner  
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -11,10 +15,76 @@ from datetime import timedelta
 from datetime import date
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads, so list views can join or
+    prefetch them once instead of issuing a query per row.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+class SparseFieldsMixin:
+    """
+    Lets a list view narrow a ModelSerializer to the fields a client asks
+    for (`?fields=order_no,status`) and load only the columns they read.
+
+    `source_fields` maps serializer fields to the model fields behind them
+    where the names differ; a related path there is joined with
+    select_related.
+    """
+    source_fields = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        """The requested field names, in declaration order, or None for all of them."""
+        requested = [name.strip() for name in (value or '').split(',') if name.strip()]
+        if not requested:
+            return None
+        unknown = set(requested).difference(cls.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError({"fields": f"Unknown fields: {', '.join(sorted(unknown))}."})
+        return [name for name in cls.Meta.fields if name in requested]
+
+    @classmethod
+    def project(cls, queryset, fields, extra=()):
+        """`queryset` restricted with only() to the columns `fields` (and `extra`) need."""
+        columns, related = set(extra), set()
+        for name in fields:
+            for column in cls.source_fields.get(name, (name,)):
+                columns.add(column)
+                if '__' in column:
+                    related.add(column.split('__')[0])
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class OrderSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer class for the Order model.
     """
+    select_related_fields = ('bp_code',)
+    source_fields = {
+        'bp_code': ('bp_code__bp_code', 'bp_code__business_name'),
+        'thumbnails': ('order_image',),
+    }
+
     bp_code = serializers.SlugRelatedField(
         queryset=BusinessPartner.objects.all(),
         slug_field='bp_code',
@@ -22,6 +92,7 @@ class OrderSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     order_date = serializers.SerializerMethodField() 
+    thumbnails = ImageVariantsField(['order_image'])
        
     def get_order_date(self, obj):
         ist = pytz.timezone('Asia/Kolkata')
@@ -34,9 +105,9 @@ class OrderSerializer(serializers.ModelSerializer):
             'supplied', 'balance', 'assigned_by', 'narration', 'note', 'sub_brand', 'make', 'work_style', 'form',
             'finish', 'theme', 'collection', 'description', 'assign_remarks', 'screw', 'polish', 'metal_colour',
             'purity', 'stone', 'hallmark', 'rodium', 'enamel', 'hook', 'size', 'open_close', 'length', 'hbt_class',
-            'console_id', 'tolerance_from', 'tolerance_to'
+            'console_id', 'tolerance_from', 'tolerance_to', 'thumbnails', 'status',
         ]
-        read_only_fields = ['order_no', 'order_date'] 
+        read_only_fields = ['order_no', 'order_date', 'status']
 
     def create(self, validated_data):
         if 'bp_code' not in validated_data:
@@ -46,7 +117,7 @@ class OrderSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Modify the output representation to include business_name with bp_code."""
         data = super().to_representation(instance)
-        if instance.bp_code:
+        if 'bp_code' in data and instance.bp_code:
             data['bp_code'] = f"{instance.bp_code.bp_code}-{instance.bp_code.business_name}"
         return data
     
@@ -69,19 +140,7 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         if 'bp_code' not in validated_data:
             raise serializers.ValidationError({"bp_code": "This field is required."})
-        last_order = Order.objects.all().order_by('id').last()
-        
-        if not last_order:
-            new_order_no = '001'
-        else:
-            try:
-                last_number = int(last_order.order_no)
-                new_number = last_number + 1
-                new_order_no = f"{new_number:03d}"
-            except (ValueError, AttributeError):
-                new_order_no = f"{Order.objects.count() + 1:002d}"
-        
-        validated_data['order_no'] = new_order_no
+        validated_data['order_no'] = get_order_no()
         return super().create(validated_data)
     
 class KeyUserApprovalSerializer(serializers.ModelSerializer):
@@ -115,17 +174,13 @@ class KeyUserApprovalSerializer(serializers.ModelSerializer):
         if not (request and request.user.is_authenticated):
             raise serializers.ValidationError({"user": "Authentication required."})
 
-        order.key_user_approval_notes = approval_note
-        order.approved_by_key_user = request.user
-
         if approval_note == 'Approved by Key User':
-            order.status = 'in-process'
+            transition(order, 'in-process', actor=actor_from(self.context.get('request')))
             message = f"Order {order.order_no} approved by Key User."
         else:
-            order.status = 'reject'
+            transition(order, 'reject', actor=actor_from(self.context.get('request')))
             message = f"Order {order.order_no} rejected by Key User."
 
-        order.save()
         return {
             "order": order,
             "message": message,
@@ -161,17 +216,13 @@ class AdminApprovalSerializer(serializers.ModelSerializer):
         if not (request and request.user.is_authenticated):
             raise serializers.ValidationError({"user": "Authentication required."})
 
-        order.admin_approval_notes = approval_note
-        order.approved_by_admin = request.user
-
         if approval_note == 'Accepted by Admin':
-            order.status = 'in-process'
+            transition(order, 'in-process', actor=actor_from(self.context.get('request')))
             message = f"Order {order.order_no} accepted by Admin."
         else:
-            order.status = 'reject'
+            transition(order, 'reject', actor=actor_from(self.context.get('request')))
             message = f"Order {order.order_no} rejected by Admin."
 
-        order.save()
         return {
             "order": order,
             "message": message
@@ -308,8 +359,7 @@ class OrderActionSerializer(serializers.Serializer):
         action = self.validated_data['action']
 
         if action == 'Accepted by Craftsman':
-            order.status = 'in-process'
-            order.save()
+            transition(order, 'in-process', actor=actor_from(self.context.get('request')))
             return {
                 "status": "success",
                 "order": order,
@@ -322,12 +372,10 @@ class OrderActionSerializer(serializers.Serializer):
             rejection_reason = self.validated_data.get('rejection_reason')
             rejection_notes = self.validated_data.get('rejection_notes')
 
-            order.status = 'rejected'
-            order.rejected_by = previous_craftsman
-            order.craftsman = None
-            order.rejection_reason = rejection_reason
-            order.rejection_notes = rejection_notes if rejection_reason == 'other' else None
-            order.save()
+            transition(
+                order, 'rejected', actor=actor_from(self.context.get('request')),
+                rejected_by=previous_craftsman, craftsman=None, rejection_reason=rejection_reason,
+            )
 
             return {
                 "status": "rejected",
@@ -337,7 +385,8 @@ class OrderActionSerializer(serializers.Serializer):
                 "rejection_notes": rejection_notes if rejection_reason == 'other' else None
             }
 
-class OrderCraftsmanSerializer(serializers.ModelSerializer):
+class OrderCraftsmanSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('craftsman',)
     craftsman = CraftsmanSerializer(read_only=True)
 
     class Meta:
@@ -346,7 +395,8 @@ class OrderCraftsmanSerializer(serializers.ModelSerializer):
 
         
         
-class OrderCraftsman(serializers.ModelSerializer):
+class OrderCraftsman(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('craftsman',)
     craftsman_full_name = serializers.CharField(source='craftsman.full_name', read_only=True)
     craftsman_bp_code = serializers.CharField(source='craftsman.bp_code', read_only=True)
 
@@ -374,8 +424,7 @@ class ApprovalSerializer(serializers.Serializer):
 
     def save(self):
         order = self.validated_data['order']
-        order.status = "awaiting-approval"
-        order.save()
+        transition(order, "awaiting-approval", actor=actor_from(self.context.get('request')))
         
         return {
             "order": order,
@@ -384,68 +433,52 @@ class ApprovalSerializer(serializers.Serializer):
 
     
     
-class OrderAssignmentSerializer(serializers.Serializer):
+class CraftsmanAssignmentSerializer(serializers.Serializer):
+    """
+    Validation shared by assignment and reassignment: one partner query on
+    the bp_code index (memoized for the request) and one order query.
+    """
     order_no = serializers.IntegerField()
     bp_code = serializers.CharField()
     due_date = serializers.DateField(required=False)
+    # Status the order must be in.
+    from_status = None
 
-    def validate(self, data):
-        # Validate craftsman
-        try:
-            code_part, business_name_part = data['bp_code'].split("-", 1)
-        except ValueError:
-            raise serializers.ValidationError({"bp_code": "Invalid format. Expected format 'BP-CODE-NAME'."})
+    @property
+    def partner_resolver(self):
+        if not hasattr(self, '_partner_resolver'):
+            self._partner_resolver = PartnerResolver.for_request(self.context.get('request'))
+        return self._partner_resolver
 
-        try:
-            craftsman = BusinessPartner.objects.get(
-                bp_code=code_part.strip(),
-                business_name__iexact=business_name_part.strip(),
-                role="CRAFTSMAN"
-            )
-        except BusinessPartner.DoesNotExist:
-            raise serializers.ValidationError({"bp_code": "Craftsman not found."})
+    def validate_bp_code(self, value):
+        if self.partner_resolver.resolve(value, role="CRAFTSMAN") is None:
+            raise serializers.ValidationError("No CRAFTSMAN found with this BP Code and Business Name.")
+        return value
 
-        # Validate order
-        try:
-            order = Order.objects.get(id=data['order_no'], status='in-process')
-        except Order.DoesNotExist:
-            raise serializers.ValidationError({"order_no": "Order not found or not in 'in-process' status."})
+    def validate(self, data):
+        order = Order.objects.filter(id=data['order_no']).first()
+        if order is None:
+            raise serializers.ValidationError({"order_no": "Order does not exist."})
+        if order.status != self.from_status:
+            raise serializers.ValidationError({"order_no": f"Order is not in '{self.from_status}' status."})
 
         data['order'] = order
-        data['craftsman'] = craftsman
+        data['craftsman'] = self.partner_resolver.resolve(data['bp_code'], role="CRAFTSMAN")
         return data
-    
-    def validate_bp_code(self, value):
-        try:
-            code_part, business_name_part = value.split("-", 1)
-            if not BusinessPartner.objects.filter(
-                bp_code=code_part,
-                business_name__iexact=business_name_part.strip(),
-                role="CRAFTSMAN"
-            ).exists():
-                raise serializers.ValidationError("No CRAFTSMAN found with this BP Code and Business Name.")
-            
-            return value
-        
-        except ValueError:
-            raise serializers.ValidationError("BP Code must be in format 'CODE-Business Name'.")
 
-    def validate_order_no(self, value):
-        if not Order.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Order does not exist.")
-        return value
+
+class OrderAssignmentSerializer(CraftsmanAssignmentSerializer):
+    from_status = 'in-process'
 
     def save(self, **kwargs):
         order = self.validated_data['order']
         craftsman = self.validated_data['craftsman']
         due_date = self.validated_data.get('due_date')
 
-        order.craftsman = craftsman
-        order.status = 'assigned'
+        changes = {'craftsman': craftsman}
         if due_date:
-            order.due_date = due_date
-
-        order.save()
+            changes['due_date'] = due_date
+        transition(order, 'assigned', actor=actor_from(self.context.get('request')), **changes)
         return order
     
 class OrderCompletionSerializer(serializers.Serializer):
@@ -466,82 +499,69 @@ class OrderCompletionSerializer(serializers.Serializer):
 
     def save(self):
         order = self.validated_data['order']
-        order.status = "complete"
-        order.save()
+        transition(order, "complete", actor=actor_from(self.context.get('request')))
         
         return {
             "order": order,
             "message": f"Order {order.order_no} approved and marked as complete"
         }
     
-class OrderReassignSerializer(serializers.Serializer):
-    order_no = serializers.IntegerField()
-    bp_code = serializers.CharField()
-    due_date = serializers.DateField(required=False)
-
-    def validate(self, data):
-        # Validate craftsman
-        try:
-            code_part, business_name_part = data['bp_code'].split("-", 1)
-        except ValueError:
-            raise serializers.ValidationError({"bp_code": "Invalid format. Expected format 'BP-CODE-NAME'."})
-
-        try:
-            craftsman = BusinessPartner.objects.get(
-                bp_code=code_part.strip(),
-                business_name__iexact=business_name_part.strip(),
-                role="CRAFTSMAN"
-            )
-        except BusinessPartner.DoesNotExist:
-            raise serializers.ValidationError({"bp_code": "Craftsman not found."})
-
-        # Validate order
-        try:
-            order = Order.objects.get(id=data['order_no'], status='rejected')
-        except Order.DoesNotExist:
-            raise serializers.ValidationError({"order_no": "Order not found or not in 'in-process' status."})
-
-        data['order'] = order
-        data['craftsman'] = craftsman
-        return data
-    
-    def validate_bp_code(self, value):
-        try:
-            code_part, business_name_part = value.split("-", 1)
-            if not BusinessPartner.objects.filter(
-                bp_code=code_part,
-                business_name__iexact=business_name_part.strip(),
-                role="CRAFTSMAN"
-            ).exists():
-                raise serializers.ValidationError("No CRAFTSMAN found with this BP Code and Business Name.")
-            
-            return value
-        
-        except ValueError:
-            raise serializers.ValidationError("BP Code must be in format 'CODE-Business Name'.")
-
-    def validate_order_no(self, value):
-        if not Order.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Order does not exist.")
-        return value
+class OrderReassignSerializer(CraftsmanAssignmentSerializer):
+    from_status = 'rejected'
 
     def save(self, **kwargs):
         order = self.validated_data['order']
         craftsman = self.validated_data['craftsman']
         due_date = self.validated_data.get('due_date')
 
-        order.craftsman = craftsman
-        order.status = 'assigned'
+        changes = {'craftsman': craftsman}
         if due_date:
-            order.due_date = due_date
-
-        order.save()
+            changes['due_date'] = due_date
+        transition(order, 'assigned', actor=actor_from(self.context.get('request')), **changes)
         return {
             "order": order,
             "order_no": self.validated_data['order_no']
         }
 
 
+
+
+class OrderBulkActionSerializer(serializers.Serializer):
+    """One workflow action applied to many orders, e.g. at month-end."""
+    action = serializers.ChoiceField(choices=list(BULK_ACTIONS))
+    order_nos = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False,
+        max_length=getattr(settings, 'ORDER_BULK_ACTION_LIMIT', 1000),
+    )
+    bp_code = serializers.CharField(required=False)
+    due_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data['action'] != 'assign':
+            return data
+        if not data.get('bp_code'):
+            raise serializers.ValidationError({"bp_code": "This field is required for 'assign'."})
+        resolver = PartnerResolver.for_request(self.context.get('request'))
+        data['craftsman'] = resolver.resolve(data['bp_code'], role="CRAFTSMAN")
+        if data['craftsman'] is None:
+            raise serializers.ValidationError({"bp_code": "Craftsman not found."})
+        return data
+
+    def save(self):
+        from_status, to_status = BULK_ACTIONS[self.validated_data['action']]
+        changes = {}
+        if 'craftsman' in self.validated_data:
+            changes['craftsman'] = self.validated_data['craftsman']
+        if self.validated_data.get('due_date'):
+            changes['due_date'] = self.validated_data['due_date']
+        return bulk_transition(
+            self.validated_data['order_nos'], from_status, to_status, actor=actor_from(self.context.get('request')), **changes,
+        )
+
+class OrderAutoAssignSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, required=False)
+    dry_run = serializers.BooleanField(default=False)
+
     
 @receiver(post_save, sender=ResUser)
 def assign_bp_code_to_orders(sender, instance, created, **kwargs):
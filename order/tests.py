@@ -1,76 +1,599 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
-from .models import Order, PickOrder, PackOrder, Delivery
+import csv
+import io
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from BusinessPartner.models import BusinessPartner, BusinessPartnerKYC
+from taraerp.images import variant_name
+from taraerp.metrics import registry
 from user.models import ResUser
+from .benchmarks import WORKFLOW_STATUSES, benchmark_endpoints, clear_orders, generate_dataset, seed_orders
+from .counters import reconcile, summary, tally
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_COLUMNS
+from .models import Order, OrderCounter, OrderTransition, get_order_no, order_no_allocator
+from .serializers import ApprovalSerializer, OrderSerializer
+from .workflow import TransitionConflict, discard, transition
+
+
+def make_partner(bp_code, name='Works', role='CRAFTSMAN', **fields):
+    return BusinessPartner.objects.create(
+        bp_code=bp_code, term='T1', business_name=name, full_name=name, mobile='9876543211',
+        email=f'{bp_code.lower()}@example.com', pincode='600001', city='Chennai', state='Tamil Nadu',
+        role=role, **fields,
+    )
+
+
+def make_order(order_no, days=5, **fields):
+    fields.setdefault('name', 'Order')
+    return Order.objects.create(
+        order_no=order_no, reference_no=f'REF-{order_no}', branch_code=f'BR-{order_no}',
+        due_date=timezone.now().date() + timedelta(days=days), product='Ring', design='D1',
+        vendor_design='VD1', state='draft', **fields,
+    )
+
 
-class OrderProcessingTests(TestCase):
+def api_client(username):
+    """An APIClient logged in as a new admin, and that admin."""
+    user = ResUser.objects.create_user(username, password='testpass', role_name='Admin')
+    client = APIClient()
+    client.force_authenticate(user)
+    return client, user
+
+
+class OrderCursorPaginationTests(TestCase):
     def setUp(self):
-        self.user = User.objects.create_user(username='testuser', password='testpass')
-        self.res_user = ResUser.objects.create(user=self.user, role_name='staff')
-        self.order = Order.objects.create(
-            user_id=self.res_user,
-            order_no='WR001',
-            category='Rings',
-            quantity='1',
-            weight=10.5,
-            weight_unit='g',
-            state='accepted'
-        )
+        self.client, self.user = api_client('pager')
+        self.partner = make_partner('BA001', name='Acme', role='BUYER')
+        for i in range(25):
+            make_order(f'WR{i + 1:03d}', days=10, bp_code=self.partner)
 
-    def test_pick_order_workflow(self):
-        # Create pick order
-        pick_order = PickOrder.objects.create(
-            order=self.order,
-            user=self.user,
-            picked_status='pending'
-        )
-        
-        # Confirm pick
-        pick_order.confirm_pick()
-        pick_order.refresh_from_db()
-        
-        # Verify pick status and pack order creation
-        self.assertEqual(pick_order.picked_status, 'approved')
-        self.assertTrue(hasattr(self.order, 'pack_order'))
-        self.assertEqual(self.order.pack_order.packed_status, 'pending')
-
-    def test_pack_order_workflow(self):
-        # Create pick and confirm it
-        pick_order = PickOrder.objects.create(
-            order=self.order,
-            user=self.user,
-            picked_status='pending'
+    def test_pages_cover_every_order_once(self):
+        seen = []
+        url = '/order/orders/list?page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['order_no'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_previous_cursor_returns_prior_page(self):
+        first = self.client.get('/order/orders/list?page_size=10').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [row['order_no'] for row in back['results']],
+            [row['order_no'] for row in first['results']],
         )
-        pick_order.confirm_pick()
-        
-        # Confirm pack
-        pack_order = self.order.pack_order
-        pack_order.confirm_pack()
-        pack_order.refresh_from_db()
-        
-        # Verify pack status and delivery creation
-        self.assertEqual(pack_order.packed_status, 'approved')
-        self.assertTrue(hasattr(self.order, 'delivery'))
-        self.assertEqual(self.order.delivery.delivery_status, 'pending')
-
-    def test_delivery_workflow(self):
-        # Create pick, confirm it
-        pick_order = PickOrder.objects.create(
-            order=self.order,
-            user=self.user,
-            picked_status='pending'
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/order/orders/list?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderNumberAllocatorTests(TransactionTestCase):
+    def setUp(self):
+        order_no_allocator.reset()
+        self.allocator = order_no_allocator
+
+    def tearDown(self):
+        self.allocator.reset()
+
+    def test_numbers_are_unique_and_keep_wr_format(self):
+        numbers = [get_order_no() for _ in range(45)]
+        self.assertEqual(len(set(numbers)), 45)
+        self.assertEqual(numbers[0], 'WR001')
+        self.assertTrue(all(number.startswith('WR') for number in numbers))
+
+    def test_counter_is_seeded_from_existing_orders(self):
+        make_order('WR041', name='Legacy')
+        self.assertEqual(get_order_no(), 'WR042')
+
+    def test_blocks_are_reserved_once_per_block(self):
+        get_order_no()
+        with self.assertNumQueries(0):
+            get_order_no()
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('exporter')
+        self.buyer = make_partner('EB001', name='Export Buyer', role='BUYER')
+        make_order('WR501', bp_code=self.buyer, status='in-process', category='Rings')
+        make_order('WR502', bp_code=self.buyer, status='complete')
+        make_order('WR503', status='in-process')
+        Order.objects.filter(order_no='WR503').update(created_at=timezone.now() - timedelta(days=30))
+
+    def export(self, **params):
+        response = self.client.get('/order/orders/export', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_one_row_per_order(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="orders.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(list(rows[0]), EXPORT_COLUMNS)
+        self.assertEqual([row['order_no'] for row in rows], ['WR501', 'WR502', 'WR503'])
+        self.assertEqual((rows[0]['bp_code'], rows[0]['status'], rows[0]['category']), ('EB001', 'in-process', 'Rings'))
+
+    def test_ndjson_has_one_object_per_line(self):
+        response, body = self.export(export_format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['order_no'] for row in rows], ['WR501', 'WR502', 'WR503'])
+        self.assertEqual(set(rows[0]), set(EXPORT_COLUMNS))
+        self.assertIsNone(rows[2]['bp_code'])
+
+    def test_filters_apply_to_the_export(self):
+        _, body = self.export(export_format='ndjson', bp_code='EB001', status='in-process,complete')
+        self.assertEqual([json.loads(line)['order_no'] for line in body.splitlines()], ['WR501', 'WR502'])
+        _, body = self.export(export_format='ndjson', status='in-process')
+        self.assertEqual([json.loads(line)['order_no'] for line in body.splitlines()], ['WR501', 'WR503'])
+        week_ago = (timezone.now() - timedelta(days=7)).date().isoformat()
+        _, body = self.export(export_format='ndjson', date_to=week_ago)
+        self.assertEqual([json.loads(line)['order_no'] for line in body.splitlines()], ['WR503'])
+        _, body = self.export(export_format='ndjson', date_from=week_ago)
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/order/orders/export', {'date_from': '31-12-2024'}).status_code, 400)
+        self.assertEqual(self.client.get('/order/orders/export', {'export_format': 'xlsx'}).status_code, 400)
+
+    def test_rows_are_read_with_a_chunked_iterator(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            self.export()
+        iterator.assert_called_once()
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': EXPORT_CHUNK_SIZE})
+
+
+class OrderListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('counter')
+        for i in range(30):
+            buyer = make_partner(f'BA{i:03d}', name=f'Buyer {i}', role='BUYER')
+            craftsman = make_partner(f'AC{i:03d}', name=f'Craft {i}')
+            make_order(f'WR{i + 1:03d}', days=10, bp_code=buyer, craftsman=craftsman, status='in-process')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        for url in ('/order/orders/list', '/order/orders/assigned-orders/', '/order/orders/in-process/'):
+            with self.subTest(url=url):
+                small = self.count_queries(f'{url}?page_size=2')
+                large = self.count_queries(f'{url}?page_size=30')
+                self.assertEqual(small, large)
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.client, self.user = api_client('metrics')
+
+    def test_sampled_request_records_db_and_serializer_detail(self):
+        with override_settings(PERF_SAMPLE_RATE=1.0), self.assertLogs('taraerp.perf', 'INFO') as logs:
+            response = self.client.get('/order/orders/list')
+        self.assertEqual(response.status_code, 200)
+
+        stats = registry.snapshot()[('order-list', 'GET')]
+        self.assertEqual((stats.requests, stats.sampled), (1, 1))
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.serializer_seconds, 0)
+        self.assertEqual(stats.response_bytes, len(response.content))
+        self.assertIn('"endpoint": "order-list"', logs.output[0])
+
+    @override_settings(PERF_METRICS_TOKEN='scrape-me')
+    def test_unsampled_requests_are_counted_and_exposed(self):
+        with override_settings(PERF_SAMPLE_RATE=0):
+            self.client.get('/order/orders/list')
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('http_request_duration_seconds_count{endpoint="order-list",method="GET"} 1', body)
+        self.assertIn('http_requests_sampled_total{endpoint="order-list",method="GET"} 0', body)
+
+    @override_settings(PERF_METRICS_TOKEN='scrape-me')
+    def test_workers_are_added_up_through_the_metrics_directory(self):
+        from taraerp.metrics import MetricsRegistry
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(PERF_METRICS_DIR=directory):
+            other_worker = MetricsRegistry()
+            other_worker.record('order-list', 'GET', 0.02, 100, 200)
+            other_worker.record('order-list', 'GET', 3.0, 100, 500)
+            other_worker.flush(directory)
+            self.client.get('/order/orders/list')
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('http_request_duration_seconds_count{endpoint="order-list",method="GET"} 3', body)
+        self.assertIn('http_request_errors_total{endpoint="order-list",method="GET"} 1', body)
+
+    def test_metrics_are_closed_without_a_matching_token(self):
+        with override_settings(PERF_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(PERF_METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer guess').status_code, 403)
+
+
+class BenchmarkDatasetTests(TestCase):
+    def test_commands_refuse_databases_not_marked_for_benchmarks(self):
+        with override_settings(BENCHMARK_DATABASE=False):
+            with self.assertRaises(CommandError):
+                call_command('benchmark_order_indexes', rows=10)
+            with self.assertRaises(CommandError):
+                call_command('generate_bench_data', orders=10)
+        with override_settings(BENCHMARK_DATABASE=True), self.assertRaises(CommandError):
+            call_command('benchmark_order_indexes')
+        self.assertFalse(Order.objects.exists())
+
+    def test_generated_dataset_covers_every_status_and_is_benchmarkable(self):
+        counts = generate_dataset(200, seed=7)
+        self.assertEqual(Order.objects.count(), 200)
+        self.assertEqual(BusinessPartnerKYC.objects.count(), counts['kyc'])
+        self.assertEqual(ResUser.objects.count(), counts['users'])
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), set(WORKFLOW_STATUSES))
+
+        results = benchmark_endpoints(iterations=2, warmup=0, only={'order-list', 'order-detail', 'login'})
+        self.assertEqual(set(results), {'order-list', 'order-detail', 'login'})
+        for name, result in results.items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(results['order-list']['queries_per_request'], 1)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, BACKGROUND_TASKS_EAGER=True)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def test_upload_gets_bounded_webp_variants_after_commit(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'red').save(buffer, 'JPEG')
+        upload = SimpleUploadedFile('scan.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            order = make_order('WR900', name='Image', order_image=upload)
+        storage = order.order_image.storage
+        thumbnail = variant_name(order.order_image.name, 'thumbnail')
+        self.assertFalse(storage.exists(thumbnail))
+
+        for callback in callbacks:
+            callback()
+        with storage.open(thumbnail) as fh:
+            self.assertEqual(Image.open(fh).size, (256, 171))
+        with storage.open(variant_name(order.order_image.name, 'preview')) as fh:
+            self.assertEqual(Image.open(fh).format, 'WEBP')
+
+        urls = OrderSerializer(order).data['thumbnails']['order_image']
+        self.assertEqual(urls['thumbnail'], storage.url(thumbnail))
+
+
+class WorkflowTransitionTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('workflow')
+        self.craftsman = make_partner('WC001')
+        self.order = make_order('WR700', status='in-process')
+
+    def test_transition_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/order/orders/assign-orders/', {
+                'order_no': self.order.pk, 'bp_code': 'WC001-Works',
+            })
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "order_order"')]
+        self.assertEqual(len(updates), 1)
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len([sql for sql in selects if 'businesspartner' in sql.lower()]), 1)
+        self.assertEqual(len([sql for sql in selects if 'FROM "order_order"' in sql]), 1)
+        self.assertIn('"craftsman_id" IS NULL', updates[0])
+        self.assertNotIn('"name"', updates[0])
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.craftsman), ('assigned', self.craftsman))
+
+    def test_losing_a_race_returns_conflict(self):
+        Order.objects.filter(pk=self.order.pk).update(craftsman=self.craftsman)
+        first = ApprovalSerializer(data={'order_no': 'WR700'})
+        second = ApprovalSerializer(data={'order_no': 'WR700'})
+        self.assertTrue(first.is_valid() and second.is_valid())
+        first.save()
+        with self.assertRaises(TransitionConflict):
+            second.save()
+
+        # Same status again, but the craftsman changed since the read: still stale.
+        stale = Order.objects.get(pk=self.order.pk)
+        Order.objects.filter(pk=self.order.pk).update(craftsman=None)
+        with self.assertRaises(TransitionConflict):
+            transition(stale, 'complete')
+
+        response = self.client.post('/order/orders/completed/', {'order_no': 'WR700'})
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkWorkflowActionTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('bulk-admin')
+        self.craftsman = make_partner('BW001', name='Bulk Works')
+        for i, order_status in enumerate(['in-process'] * 5 + ['pending']):
+            make_order(f'WR8{i:02d}', name=f'Bulk {i}', status=order_status)
+
+    def test_assign_many_orders_in_constant_queries(self):
+        order_nos = [f'WR8{i:02d}' for i in range(6)] + ['WR899']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/order/orders/bulk-action/', {
+                'action': 'assign', 'order_nos': order_nos, 'bp_code': 'BW001-Bulk Works',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['failed']), (5, 2))
+        self.assertEqual(response.data['results'][0], {'order_no': 'WR800', 'status': 'assigned'})
+        self.assertEqual(response.data['results'][5], {'order_no': 'WR805', 'error': 'Order is pending, not in-process.'})
+        self.assertEqual(response.data['results'][6], {'order_no': 'WR899', 'error': 'Order not found.'})
+
+        statements = [q['sql'].split()[0] for q in ctx.captured_queries if '"order_order"' in q['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE'])
+        self.assertEqual(Order.objects.filter(status='assigned', craftsman=self.craftsman).count(), 5)
+
+    def test_invalid_requests_are_rejected(self):
+        response = self.client.post('/order/orders/bulk-action/', {'action': 'assign', 'order_nos': ['WR800']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bp_code', response.data)
+        response = self.client.post('/order/orders/bulk-action/', {'action': 'ship', 'order_nos': ['WR800']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/order/orders/bulk-action/', {'action': 'keyuser-approve', 'order_nos': ['WR805']}, format='json')
+        self.assertEqual(response.data['results'], [{'order_no': 'WR805', 'status': 'in-process'}])
+
+
+class AutoAssignTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('scheduler')
+        self.craftsmen = [make_partner(f'SC{i:03d}', name=f'Shop {i}') for i in range(3)]
+        self.count = 0
+        busy, steady, flaky = self.craftsmen
+        self.make_order('assigned', craftsman=busy)
+        self.make_order('in-process', craftsman=busy)
+        self.make_order('rejected', rejected_by=flaky)
+        self.make_order('rejected', rejected_by=flaky)
+
+    def make_order(self, order_status, days=10, **fields):
+        self.count += 1
+        return make_order(f'WR9{self.count:02d}', days=days, name='Sched', status=order_status, **fields)
+
+    def test_orders_go_to_the_least_loaded_reliable_craftsmen(self):
+        busy, steady, flaky = self.craftsmen
+        urgent = self.make_order('in-process', days=1)
+        later = [self.make_order('in-process', days=20) for _ in range(4)]
+
+        listing = self.client.get('/order/orders/assign-orders/').data['craftsmen']
+        self.assertEqual([row['bp_code'] for row in listing], ['SC001-Shop 1', 'SC002-Shop 2', 'SC000-Shop 0'])
+        self.assertEqual(listing[2]['open_orders'], 2)
+
+        with override_settings(CRAFTSMAN_CAPACITY=2):
+            response = self.client.post('/order/orders/auto-assign/', {'dry_run': True}, format='json')
+            self.assertEqual(response.data['assigned'], 4)
+            self.assertFalse(Order.objects.filter(status='assigned', craftsman=steady).exists())
+
+            response = self.client.post('/order/orders/auto-assign/', {}, format='json')
+        self.assertEqual(response.data['assignments'][0], {
+            'order_no': urgent.order_no, 'assigned_to': 'SC001-Shop 1', 'due_date': urgent.due_date.strftime('%Y-%m-%d'),
+        })
+        self.assertEqual(response.data['unassigned'], [later[-1].order_no])
+        self.assertEqual(Order.objects.filter(status='assigned', craftsman=steady).count(), 2)
+        self.assertEqual(Order.objects.filter(status='assigned', craftsman=flaky).count(), 2)
+        self.assertEqual(Order.objects.filter(status='assigned', craftsman=busy).count(), 1)
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('history')
+        self.craftsman = make_partner('HC001', name='History Works')
+        self.orders = [
+            make_order(f'WR95{i}', name='History', status=order_status)
+            for i, order_status in enumerate(['in-process', 'in-process', 'pending'])
+        ]
+
+    def moves(self, order):
+        return list(
+            OrderTransition.objects.filter(order_id=order.pk).order_by('created_at', 'id')
+            .values_list('from_status', 'to_status', 'craftsman_id', 'actor_id')
         )
-        pick_order.confirm_pick()
-        
-        # Create pack, confirm it
-        pack_order = self.order.pack_order
-        pack_order.confirm_pack()
-        
-        # Confirm delivery
-        delivery = self.order.delivery
-        delivery.confirm_delivery()
-        delivery.refresh_from_db()
-        
-        # Verify delivery status
-        self.assertEqual(delivery.delivery_status, 'delivered')
-        self.assertTrue(hasattr(self.order, 'invoice'))
+
+    def test_every_move_is_appended_with_its_actor(self):
+        first, second, pending = self.orders
+        self.client.post('/order/orders/assign-orders/', {'order_no': first.pk, 'bp_code': 'HC001'})
+        self.client.post('/order/orders/response-from-order/', {
+            'order_no': first.order_no, 'action': 'Rejected by Craftsman', 'rejection_reason': 'other',
+            'rejection_notes': 'Busy',
+        })
+        self.assertEqual(self.moves(first), [
+            ('', 'in-process', None, None),
+            ('in-process', 'assigned', self.craftsman.pk, self.user.pk),
+            ('assigned', 'rejected', None, self.user.pk),
+        ])
+
+        response = self.client.post('/order/orders/bulk-action/', {
+            'action': 'assign', 'order_nos': [second.order_no, pending.order_no], 'bp_code': 'HC001',
+        }, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.moves(second)[-1], ('in-process', 'assigned', self.craftsman.pk, self.user.pk))
+        self.assertEqual(len(self.moves(pending)), 1)
+
+        discard(pending, actor=self.user)
+        self.assertFalse(Order.objects.filter(pk=pending.pk).exists())
+        self.assertEqual(self.moves(pending)[-1], ('pending', 'deleted', None, self.user.pk))
+
+    def test_reports_aggregate_the_history(self):
+        first, second, pending = self.orders
+        OrderTransition.objects.all().delete()
+        start = timezone.now() - timedelta(days=3)
+
+        def move(order, from_status, to_status, hours, craftsman=None):
+            OrderTransition.objects.create(
+                order_id=order.pk, order_no=order.order_no, from_status=from_status, to_status=to_status,
+                craftsman=craftsman, created_at=start + timedelta(hours=hours),
+            )
+
+        move(first, 'in-process', 'assigned', 0, self.craftsman)
+        move(first, 'assigned', 'in-process', 2, self.craftsman)
+        move(first, 'in-process', 'awaiting-approval', 10, self.craftsman)
+        move(second, 'in-process', 'assigned', 0, self.craftsman)
+        move(second, 'assigned', 'rejected', 4)
+
+        response = self.client.get('/order/orders/analytics/')
+        by_status = {row['status']: row for row in response.data['results']}
+        self.assertEqual(by_status['assigned']['entered'], 2)
+        self.assertEqual(by_status['assigned']['avg_seconds'], 3 * 3600)
+        self.assertEqual(by_status['awaiting-approval']['current'], 1)
+
+        response = self.client.get('/order/orders/analytics/', {'report': 'turnaround'})
+        self.assertEqual(response.data['results'], [{
+            'bp_code': 'HC001', 'full_name': 'History Works', 'assignments': 2, 'accepted': 1, 'rejected': 1,
+            'avg_response_seconds': 3 * 3600, 'avg_turnaround_seconds': 10 * 3600,
+        }])
+
+        response = self.client.get('/order/orders/analytics/', {'report': 'funnel'})
+        self.assertEqual(response.data['results'][0], {'status': 'assigned', 'reached': 2, 'rejected': 1})
+
+        response = self.client.get('/order/orders/analytics/', {
+            'report': 'funnel', 'date_to': (start - timedelta(days=1)).date().isoformat(),
+        })
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(self.client.get('/order/orders/analytics/', {'report': 'x'}).status_code, 400)
+
+
+class OrderCounterTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('counters')
+        self.buyer = make_partner('CB001', name='Buyer', role='BUYER')
+        self.craftsman = make_partner('CC001', name='Counter Works')
+        self.orders = [
+            make_order(
+                f'WR96{i}', name='Counted', status='in-process', bp_code=self.buyer,
+                category='Rings' if i < 3 else None,
+            )
+            for i in range(4)
+        ]
+
+    def test_counts_follow_creates_moves_and_deletes(self):
+        self.client.post('/order/orders/assign-orders/', {'order_no': self.orders[0].pk, 'bp_code': 'CC001'})
+        self.client.post('/order/orders/bulk-action/', {
+            'action': 'admin-reject', 'order_nos': ['WR961', 'WR962'],
+        }, format='json')
+        discard(Order.objects.get(pk=self.orders[3].pk))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/order/orders/summary/', {'bp_code': 'CB001'})
+        self.assertFalse([q for q in ctx.captured_queries if '"order_order"' in q['sql']])
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_status'], {'assigned': 1, 'reject': 2})
+        self.assertEqual(response.data['by_category'], {'Rings': 3})
+        self.assertEqual(response.data['by_segment'], {'unspecified': 3})
+        self.assertNotIn('by_partner', response.data)
+
+        response = self.client.get('/order/orders/summary/')
+        self.assertEqual(response.data['by_partner'], {'CB001': 3})
+        self.assertEqual(self.client.get('/order/orders/summary/', {'bp_code': 'NONE'}).data['total'], 0)
+
+    def test_reconcile_repairs_drift(self):
+        self.assertEqual(reconcile(), 0)
+        # QuerySet.update() bypasses the counters.
+        Order.objects.filter(pk=self.orders[0].pk).update(status='complete')
+        OrderCounter.objects.filter(category='').update(count=5)
+        self.assertEqual(reconcile(), 3)
+        self.assertEqual(summary('CB001')['by_status'], {'complete': 1, 'in-process': 3})
+        self.assertEqual(summary('CB001')['by_category'], {'Rings': 3, 'unspecified': 1})
+
+    def test_bench_seed_and_clear_keep_the_counters_exact(self):
+        expected = summary()
+        seed_orders(30, batch_size=7, buyers=2, craftsmen=2)
+        self.assertEqual(summary()['total'], expected['total'] + 30)
+        self.assertEqual(reconcile(), 0)
+
+        keys = len(tally(Order.objects.filter(reference_no__startswith='BENCH-')))
+        with CaptureQueriesContext(connection) as ctx:
+            clear_orders()
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "order_ordercounter"')]
+        self.assertEqual(len(updates), keys)
+        self.assertEqual(summary(), expected)
+        self.assertFalse(OrderCounter.objects.filter(count__lte=0).exists())
+        self.assertEqual(reconcile(), 0)
+
+    def test_reconcile_tolerates_rows_created_after_the_lock(self):
+        expected = summary()
+        OrderCounter.objects.update(count=9)
+        # As if apply() created every row between the lock and the insert.
+        with mock.patch.object(OrderCounter.objects, 'select_for_update', return_value=OrderCounter.objects.none()):
+            self.assertEqual(reconcile(), OrderCounter.objects.count())
+        self.assertEqual(summary(), expected)
+
+
+class OrderListProjectionTests(TestCase):
+    def setUp(self):
+        self.client, self.user = api_client('lists')
+        self.today = timezone.now().date()
+        craftsman = make_partner('LC001', name='List Works')
+        for i, (category, segment, days, assigned) in enumerate([
+            ('Rings', 'luxury', 9, True), ('Rings', 'budget', 3, False),
+            ('Chains', 'luxury', 6, True), ('Rings', 'luxury', 12, False),
+        ]):
+            make_order(
+                f'WR97{i}', days=days, name='Listed', status='assigned' if assigned else 'in-process',
+                category=category, segment=segment, craftsman=craftsman if assigned else None,
+            )
+
+    def test_filters_sort_and_project(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/order/orders/list', {
+                'category': 'Rings', 'segment': 'luxury,budget', 'ordering': 'due_date',
+                'fields': 'status,order_no,due_date', 'due_to': (self.today + timedelta(days=10)).isoformat(),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'order_no': 'WR971', 'due_date': (self.today + timedelta(days=3)).isoformat(), 'status': 'in-process'},
+            {'order_no': 'WR970', 'due_date': (self.today + timedelta(days=9)).isoformat(), 'status': 'assigned'},
+        ])
+        select = next(q['sql'] for q in ctx.captured_queries if 'FROM "order_order"' in q['sql'])
+        self.assertNotIn('"narration"', select)
+        self.assertNotIn('businesspartner', select.split(' WHERE ')[0].lower())
+
+        response = self.client.get('/order/orders/list', {'craftsman': 'LC001', 'ordering': '-due_date', 'fields': 'order_no,bp_code'})
+        self.assertEqual([row['order_no'] for row in response.data['results']], ['WR970', 'WR972'])
+        response = self.client.get('/order/orders/list', {'craftsman': 'none', 'page_size': 1, 'ordering': 'due_date'})
+        self.assertEqual(response.data['results'][0]['order_no'], 'WR971')
+        self.assertIn('narration', response.data['results'][0])
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual([row['order_no'] for row in next_page.data['results']], ['WR973'])
+
+    def test_bp_code_accepts_the_partner_code_or_id(self):
+        buyer = make_partner('LB001', name='List Buyer', role='BUYER')
+        make_order('WR980', name='Bought', bp_code=buyer)
+        for bp_code in ('LB001', buyer.pk):
+            response = self.client.get('/order/orders/list', {'bp_code': bp_code, 'fields': 'order_no'})
+            self.assertEqual(response.data['results'], [{'order_no': 'WR980'}])
+        response = self.client.get('/order/orders/list', {'bp_code': 'LB999', 'fields': 'order_no'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_unknown_fields_and_orderings_are_rejected(self):
+        self.assertEqual(self.client.get('/order/orders/list', {'fields': 'order_no,password'}).status_code, 400)
+        self.assertEqual(self.client.get('/order/orders/list', {'ordering': 'name'}).status_code, 400)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import KeyUserApprovalView, AdminVerificationView, OrderCreateView, OrderList, OrderDetailView, NewOrdersListView, AssignOrdersToCraftsman, OrderInProcessAPI, ApproveOrderView, CompletedOrdersView, RejectedOrdersView, CraftsmanOrderResponse, AssignedOrdersList
+from .views import KeyUserApprovalView, AdminVerificationView, OrderCreateView, OrderList, OrderDetailView, NewOrdersListView, AssignOrdersToCraftsman, OrderInProcessAPI, ApproveOrderView, CompletedOrdersView, RejectedOrdersView, CraftsmanOrderResponse, AssignedOrdersList, OrderExportView, OrderBulkActionView, OrderAutoAssignView, OrderAnalyticsView, OrderSummaryView
 
 urlpatterns = [
     path('orders/create', OrderCreateView.as_view(), name='order-create'), # Handles POST (create)
@@ -7,9 +7,14 @@ urlpatterns = [
     path('orders/admin-verification/', AdminVerificationView.as_view(), name='admin-verification'),
     path('orders/new-orders/', NewOrdersListView.as_view(), name='new-orders'),
     path('orders/list', OrderList.as_view(), name='order-list'),  # Handles GET (list)
+    path('orders/export', OrderExportView.as_view(), name='order-export'),  # Streams CSV / NDJSON
+    path('orders/summary/', OrderSummaryView.as_view(), name='order-summary'),
+    path('orders/analytics/', OrderAnalyticsView.as_view(), name='order-analytics'),
     path('orders/detail/<str:order_no>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/delete/<int:id>/', OrderCreateView.as_view(), name='update-delete'),  # Handles GET, PUT, DELETE for a specific order
     path('orders/assign-orders/', AssignOrdersToCraftsman.as_view(), name='assign-orders'),
+    path('orders/bulk-action/', OrderBulkActionView.as_view(), name='order-bulk-action'),
+    path('orders/auto-assign/', OrderAutoAssignView.as_view(), name='order-auto-assign'),
     path('orders/assigned-orders/', AssignedOrdersList.as_view(), name='assigned-orders'),
     path('orders/response-from-order/', CraftsmanOrderResponse.as_view()),
     path('orders/in-process/', OrderInProcessAPI.as_view(), name='order-in-process'),
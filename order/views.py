@@ -3,11 +3,19 @@ from rest_framework import generics, status
 from rest_framework.generics import CreateAPIView, GenericAPIView
 from .models import Order
 from BusinessPartner.models import BusinessPartner
-from .serializers import OrderSerializer, KeyUserApprovalSerializer, AdminApprovalSerializer, OrderReassignSerializer, ApprovalSerializer, OrderCompletionSerializer, CraftsmanSerializer, OrderCraftsmanSerializer, OrderAssignmentSerializer, OrderActionSerializer
+from .serializers import OrderSerializer, KeyUserApprovalSerializer, AdminApprovalSerializer, OrderReassignSerializer, ApprovalSerializer, OrderCompletionSerializer, CraftsmanSerializer, OrderCraftsmanSerializer, OrderAssignmentSerializer, OrderActionSerializer, OrderBulkActionSerializer, OrderAutoAssignSerializer
+from .pagination import OrderCursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from .exports import EXPORT_FORMATS
+from .analytics import REPORTS
+from .counters import summary
+from .filters import date_bounds, filter_orders, order_ordering, partner_lookup
+from .scheduler import WorkloadIndex, auto_assign
+from .workflow import actor_from, discard, transition
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,28 +31,43 @@ def is_valid_user_role(user):
     """
     valid_roles = ['Super Admin', 'Admin', 'Key User', 'User']
     return user.role_name in valid_roles
+
+
+class EagerLoadingViewMixin:
+    """
+    Apply the select/prefetch needs declared by the view's serializer to its
+    queryset, so list responses cost a constant number of queries.
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
     
 
-class OrderCreateView(generics.CreateAPIView):
+class OrderCreateView(EagerLoadingViewMixin, generics.CreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get(self, request, *args, **kwargs):
         """
-        Get all Orders or filter by `bp_code`.
+        Get all Orders or filter by `bp_code` (partner code or id).
         Shows pending orders for regular users, shows all for staff/admin users.
         """
         bp_code = request.query_params.get("bp_code")
         queryset = self.get_queryset()
         
         if bp_code:
-            queryset = queryset.filter(bp_code=bp_code)
+            queryset = queryset.filter(**partner_lookup('bp_code', bp_code))
         if not request.user.is_staff:
             queryset = queryset.filter(created_by=request.user, status='pending')
             
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     def post(self, request, *args, **kwargs):
         """
@@ -87,7 +110,7 @@ class KeyUserApprovalView(CreateAPIView):
             )
         
         rejection_notes = request.data.get('rejection_notes', '')
-        order.delete()
+        discard(order, actor=actor_from(request))
 
         return Response({
             "message": "Order rejected by Key User and deleted.",
@@ -127,10 +150,7 @@ class AdminVerificationView(CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = 'admin-rejected'
-        order.admin_rejection_notes = request.data.get('rejection_notes', '')
-        order.rejected_by_admin = request.user
-        order.save()
+        transition(order, 'admin-rejected', actor=actor_from(request))
 
         return Response({
             "message": "Order rejected by admin.",
@@ -139,32 +159,97 @@ class AdminVerificationView(CreateAPIView):
             "rejected_by": request.user.username,
         }, status=status.HTTP_200_OK)
 
-class NewOrdersListView(APIView):
+class OrderBulkActionView(GenericAPIView):
+    """
+    Apply one workflow action (`keyuser-approve`, `keyuser-reject`,
+    `admin-accept`, `admin-reject`, `assign` with `bp_code` and optional
+    `due_date`, or `complete`) to a list of `order_nos`.
+
+    Orders not in the status the action starts from are reported and left
+    alone; the rest move together in one transaction.
+    """
     permission_classes = [IsAuthenticated]
+    serializer_class = OrderBulkActionSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        failed = sum(1 for result in results if 'error' in result)
+        return Response({
+            "updated": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+class NewOrdersListView(EagerLoadingViewMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    queryset = Order.objects.all()
+    serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
 
     def get(self, request):
-        new_orders = Order.objects.filter(status='in-process', craftsman__isnull=True)
-        serializer = OrderSerializer(new_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        new_orders = self.get_queryset().filter(status='in-process', craftsman__isnull=True)
+        page = self.paginate_queryset(new_orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
         
-class OrderList(generics.GenericAPIView):
+class OrderList(EagerLoadingViewMixin, generics.GenericAPIView):
     
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
     
     def get(self, request, *args, **kwargs):
         """
-        Get all Order or filter by `bp_code`.
+        Get orders, filtered by the `filter_orders` parameters (`bp_code`,
+        `status`, `category`, `segment`, `craftsman`, creation and due date
+        ranges) and sorted by `ordering` (`-created_at` by default, or
+        `created_at`, `due_date`, `-due_date`).
+
+        `fields=order_no,status,due_date` returns only those fields and
+        loads only the columns behind them.
         """
-        bp_code = request.query_params.get("bp_code")
-        queryset = self.get_queryset().filter(bp_code=bp_code) if bp_code else self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        params = request.query_params
+        self.cursor_ordering = order_ordering(params)
+        fields = self.serializer_class.parse_fields(params.get('fields'))
+        queryset = filter_orders(self.get_queryset(), params)
+        if fields is not None:
+            queryset = self.serializer_class.project(queryset, fields, extra=[self.cursor_ordering.lstrip('-')])
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True, fields=fields)
+        return self.get_paginated_response(serializer.data)
+
+
+class OrderExportView(generics.GenericAPIView):
+    """
+    Stream orders as CSV or NDJSON for bulk reporting.
+
+    Accepts the `bp_code`, `status`, `date_from` and `date_to` filters and an
+    `export_format` of `csv` (default) or `ndjson`.
+    """
+    queryset = Order.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"export_format": f"Must be one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = filter_orders(self.get_queryset(), request.query_params)
+        stream, content_type, filename = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(stream(queryset), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
         
         
-class OrderDetailView(generics.GenericAPIView):
+class OrderDetailView(EagerLoadingViewMixin, generics.GenericAPIView):
     """
     - GET: Retrieve a Order by bp_code.
     - PUT: Update a Order.
@@ -176,7 +261,7 @@ class OrderDetailView(generics.GenericAPIView):
 
     def get_object(self, order_no):
         """Helper method to get the object or return 404 using bp_code."""
-        return get_object_or_404(Order, order_no=order_no)
+        return get_object_or_404(self.get_queryset(), order_no=order_no)
 
     def get(self, request, order_no, *args, **kwargs):
         """Retrieve a Order by bp_code."""
@@ -194,20 +279,63 @@ class OrderDetailView(generics.GenericAPIView):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OrderSummaryView(APIView):
+    """
+    Dashboard order counts, in total and by status, category and segment,
+    read from the pre-aggregated counters. `bp_code` limits them to one
+    partner; without it the counts per partner are included too.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        bp_code = request.query_params.get('bp_code')
+        return Response({"bp_code": bp_code, **summary(bp_code)}, status=status.HTTP_200_OK)
+
+
+class OrderAnalyticsView(APIView):
+    """
+    Workflow reports computed from the order transition history:
+    `report=time-in-state` (default), `turnaround` (per craftsman) or
+    `funnel` (orders reaching and rejected from each status), over moves
+    made between the optional `date_from` and `date_to`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        report = request.query_params.get('report', 'time-in-state')
+        if report not in REPORTS:
+            return Response(
+                {"report": f"Must be one of: {', '.join(REPORTS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since, until = date_bounds(request.query_params)
+        return Response({
+            "report": report,
+            "results": REPORTS[report](since, until),
+        }, status=status.HTTP_200_OK)
+
+
 class AssignOrdersToCraftsman(CreateAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderAssignmentSerializer
     
     def get(self, request):
-         """Return all new orders (in-process) and available craftsmen."""
-         new_orders = Order.objects.filter(status="in-process")
-         craftsmen = BusinessPartner.objects.filter(role='CRAFTSMAN')
-
-         craftsman_serializer = CraftsmanSerializer(craftsmen, many=True)
+         """Return the craftsmen with their current load, least loaded first."""
+         index = WorkloadIndex.build()
+         craftsmen = []
+         for load in index.ranked():
+             data = CraftsmanSerializer(load.partner).data
+             data.update(
+                 open_orders=load.open_orders,
+                 due_soon=load.due_soon,
+                 rejection_rate=round(load.rejection_rate, 3),
+                 capacity_left=max(index.capacity - load.open_orders, 0),
+             )
+             craftsmen.append(data)
 
          return Response({
-             "craftsmen": craftsman_serializer.data
+             "craftsmen": craftsmen
          })
 
     def post(self, request, *args, **kwargs):
@@ -225,16 +353,50 @@ class AssignOrdersToCraftsman(CreateAPIView):
 
             
     
-class AssignedOrdersList(APIView):
+class OrderAutoAssignView(GenericAPIView):
+    """
+    Assign unassigned in-process orders to craftsmen by load, due date and
+    rejection history (see order.scheduler). `limit` caps the batch and
+    `dry_run` returns the plan without saving it.
+    """
     permission_classes = [IsAuthenticated]
+    serializer_class = OrderAutoAssignSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        assignments, unassigned = auto_assign(actor=actor_from(request), **serializer.validated_data)
+        return Response({
+            "assigned": len(assignments),
+            "dry_run": serializer.validated_data['dry_run'],
+            "assignments": [
+                {
+                    "order_no": order.order_no,
+                    "assigned_to": CraftsmanSerializer(craftsman).data['bp_code'],
+                    "due_date": order.due_date.strftime('%Y-%m-%d'),
+                }
+                for order, craftsman in assignments
+            ],
+            "unassigned": [order.order_no for order in unassigned],
+        }, status=status.HTTP_200_OK)
+
+
+class AssignedOrdersList(EagerLoadingViewMixin, GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    queryset = Order.objects.all()
+    serializer_class = OrderCraftsmanSerializer
+    pagination_class = OrderCursorPagination
 
     def get(self, request):
         """Return all orders assigned to a craftsman (regardless of status)."""
-        assigned_orders = Order.objects.filter(craftsman__isnull=False)
-        order_serializer = OrderCraftsmanSerializer(assigned_orders, many=True)
+        assigned_orders = self.get_queryset().filter(craftsman__isnull=False)
+        page = self.paginate_queryset(assigned_orders)
+        order_serializer = self.get_serializer(page, many=True)
 
         return Response({
-            "orders": order_serializer.data
+            "orders": order_serializer.data,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
         })
 
 class CraftsmanOrderResponse(CreateAPIView):
@@ -265,13 +427,17 @@ class CraftsmanOrderResponse(CreateAPIView):
                 "rejection_reason": result["rejection_reason"]
             }, status=status.HTTP_200_OK)
     
-class OrderInProcessAPI(APIView):
+class OrderInProcessAPI(EagerLoadingViewMixin, GenericAPIView):
     permission_classes = [IsAuthenticated]
+    queryset = Order.objects.all()
+    serializer_class = OrderCraftsmanSerializer
+    pagination_class = OrderCursorPagination
 
     def get(self, request):
-        orders = Order.objects.filter(status='in-process', craftsman__isnull=False)
-        serializer = OrderCraftsmanSerializer(orders, many=True)
-        return Response(serializer.data)
+        orders = self.get_queryset().filter(status='in-process', craftsman__isnull=False)
+        page = self.paginate_queryset(orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
 class ApproveOrderView(GenericAPIView):
     permission_classes = [IsAuthenticated]
@@ -304,15 +470,22 @@ class ApproveOrderView(GenericAPIView):
         }, status=status.HTTP_200_OK)
 
 
-class CompletedOrdersView(GenericAPIView):
+class CompletedOrdersView(EagerLoadingViewMixin, GenericAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderCompletionSerializer
+    pagination_class = OrderCursorPagination
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return OrderCraftsmanSerializer
+        return self.serializer_class
     
     def get(self, request):
-        completed_orders = Order.objects.filter(status="complete")
-        serializer = OrderCraftsmanSerializer(completed_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        completed_orders = self.get_queryset().filter(status="complete")
+        page = self.paginate_queryset(completed_orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(
@@ -341,8 +514,8 @@ class RejectedOrdersView(APIView):
             'rejected_by__business_name',
         )
         
-        total_rejected = rejected_orders_qs.count()
         rejected_orders = list(rejected_orders_qs)
+        total_rejected = len(rejected_orders)
 
         return Response({
             "rejected_orders": rejected_orders,
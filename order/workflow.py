@@ -0,0 +1,194 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import counters
+from .models import Order, OrderTransition
+
+# Together these identify where an order is in the workflow. Every transition
+# changes at least one of them, and the one status cycle
+# (in-process -> assigned -> in-process) also changes `craftsman`, so an
+# UPDATE conditioned on all three never applies on top of a stale read.
+WORKFLOW_FIELDS = ('status', 'craftsman_id', 'rejected_by_id')
+
+# Bulk action -> (status the order must be in, status it moves to); the same
+# moves the single-order endpoints make.
+BULK_ACTIONS = {
+    'keyuser-approve': ('pending', 'in-process'),
+    'keyuser-reject': ('pending', 'reject'),
+    'admin-accept': ('in-process', 'in-process'),
+    'admin-reject': ('in-process', 'reject'),
+    'assign': ('in-process', 'assigned'),
+    'complete': ('awaiting-approval', 'complete'),
+}
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The order was changed by someone else. Reload it and try again."
+    default_code = 'conflict'
+
+
+def _expected_state(order):
+    return {field: getattr(order, field) for field in WORKFLOW_FIELDS}
+
+
+def actor_from(request):
+    """The user to record as making a move while handling `request`, or None."""
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def _history(order, from_status, actor):
+    return OrderTransition(
+        order_id=order.pk, order_no=order.order_no, from_status=from_status, to_status=order.status,
+        craftsman_id=order.craftsman_id, actor_id=actor.pk if actor is not None else None,
+    )
+
+
+def transition(order, to_status, actor=None, **changes):
+    """
+    Move `order` to `to_status` with one conditional
+    `UPDATE ... WHERE id = ? AND status = ? AND craftsman_id = ? ...`,
+    writing only `status` and `changes`, and append the move to
+    OrderTransition and the order counters in the same transaction.
+
+    The condition is the workflow state the order was read in. If another
+    request moved it in the meantime nothing is written and
+    TransitionConflict (409) is raised. On success the instance is updated
+    in place and returned. Like `QuerySet.update()`, this sends no
+    pre_save/post_save signals.
+    """
+    from_status, from_key = order.status, counters.order_key(order)
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, **_expected_state(order)).update(status=to_status, **changes):
+            raise TransitionConflict()
+        order.status = to_status
+        for field, value in changes.items():
+            setattr(order, field, value)
+        _history(order, from_status, actor).save(force_insert=True)
+        counters.apply(counters.moves([(from_key, counters.order_key(order))]))
+    return order
+
+
+def discard(order, actor=None):
+    """
+    Delete `order` if it is still in the workflow state it was read in, else
+    raise TransitionConflict. The history keeps a final 'deleted' move.
+    """
+    with transaction.atomic():
+        deleted, _ = Order.objects.filter(pk=order.pk, **_expected_state(order)).delete()
+        if not deleted:
+            raise TransitionConflict()
+        OrderTransition.objects.create(
+            order_id=order.pk, order_no=order.order_no, from_status=order.status, to_status='deleted',
+            craftsman_id=order.craftsman_id, actor_id=actor.pk if actor is not None else None,
+        )
+
+
+def _craftsman_id(changes, current):
+    if 'craftsman' in changes:
+        return getattr(changes['craftsman'], 'pk', None)
+    return changes.get('craftsman_id', current)
+
+
+def bulk_transition(order_nos, from_status, to_status, actor=None, **changes):
+    """
+    Move every order in `order_nos` that is in `from_status` to `to_status`.
+
+    Inside one transaction the orders are read and locked with a single
+    SELECT ... FOR UPDATE, the eligible ones are moved with a single
+    UPDATE writing only `status` and `changes`, their history rows are
+    added with a single INSERT and the counters with one UPDATE per
+    distinct partner, category and segment. Returns one result dict per distinct order
+    number, in request order: `{"order_no", "status"}` for moved orders,
+    `{"order_no", "error"}` for the rest.
+    """
+    order_nos = list(dict.fromkeys(order_nos))
+    with transaction.atomic():
+        current = {
+            order_no: (pk, order_status, craftsman_id, partner_id, category, segment)
+            for pk, order_no, order_status, craftsman_id, partner_id, category, segment in Order.objects
+            .select_for_update().filter(order_no__in=order_nos)
+            .values_list('pk', 'order_no', 'status', 'craftsman_id', 'bp_code_id', 'category', 'segment')
+        }
+        eligible = [
+            order_no for order_no in order_nos
+            if order_no in current and current[order_no][1] == from_status
+        ]
+        if eligible:
+            updated = Order.objects.filter(
+                pk__in=[current[order_no][0] for order_no in eligible], status=from_status,
+            ).update(status=to_status, **changes)
+            if updated != len(eligible):
+                # Only possible where the database ignores FOR UPDATE; undo the batch.
+                raise TransitionConflict()
+            OrderTransition.objects.bulk_create([
+                OrderTransition(
+                    order_id=current[order_no][0], order_no=order_no, from_status=from_status, to_status=to_status,
+                    craftsman_id=_craftsman_id(changes, current[order_no][2]),
+                    actor_id=actor.pk if actor is not None else None,
+                )
+                for order_no in eligible
+            ])
+            counters.apply(counters.moves(
+                (counters.counter_key(partner_id, from_status, category, segment),
+                 counters.counter_key(partner_id, to_status, category, segment))
+                for partner_id, category, segment in (current[order_no][3:] for order_no in eligible)
+            ))
+
+    results = []
+    for order_no in order_nos:
+        if order_no not in current:
+            results.append({"order_no": order_no, "error": "Order not found."})
+        elif current[order_no][1] == from_status:
+            results.append({"order_no": order_no, "status": to_status})
+        else:
+            results.append({"order_no": order_no, "error": f"Order is {current[order_no][1]}, not {from_status}."})
+    return results
+
+
+def assign_orders(assignments, from_status='in-process', actor=None):
+    """
+    Assign each `(order, craftsman)` pair with one UPDATE, choosing the
+    craftsman per row with CASE on the order id and writing only `status`
+    and `craftsman`, then record the moves with one INSERT and update the
+    counters.
+
+    Every order must still be unassigned and in `from_status`; otherwise
+    nothing is written and TransitionConflict is raised.
+    """
+    by_craftsman = defaultdict(list)
+    for order, craftsman in assignments:
+        by_craftsman[craftsman.pk].append(order.pk)
+    order_ids = [order.pk for order, _ in assignments]
+    from_keys = [counters.order_key(order) for order, _ in assignments]
+    with transaction.atomic():
+        updated = Order.objects.filter(pk__in=order_ids, status=from_status, craftsman__isnull=True).update(
+            status='assigned',
+            craftsman=Case(*(When(pk__in=ids, then=Value(craftsman_id)) for craftsman_id, ids in by_craftsman.items())),
+        )
+        if updated != len(order_ids):
+            raise TransitionConflict()
+        for order, craftsman in assignments:
+            order.status = 'assigned'
+            order.craftsman = craftsman
+        OrderTransition.objects.bulk_create([_history(order, from_status, actor) for order, _ in assignments])
+        counters.apply(counters.moves(
+            (from_key, counters.order_key(order)) for from_key, (order, _) in zip(from_keys, assignments)
+        ))
+
+
+@receiver(post_save, sender=Order, dispatch_uid='order_transition:created')
+def record_creation(sender, instance, created, raw=False, **kwargs):
+    """Start the history of a new order with the status it was created in."""
+    if created and not raw:
+        OrderTransition.objects.create(
+            order_id=instance.pk, order_no=instance.order_no, to_status=instance.status,
+            craftsman_id=instance.craftsman_id, actor_id=instance.user_id,
+        )
@@ -0,0 +1,288 @@
+import hashlib
+import logging
+import os
+import tempfile
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from taraerp import images
+from taraerp.models import Blob
+
+logger = logging.getLogger(__name__)
+
+# model -> names of its file fields whose blobs are reference-counted; filled by track().
+tracked = {}
+
+# Tracked models whose references also count in `Blob.private_refcount`;
+# filled by taraerp.media.protect().
+private = set()
+
+# Largest `name__in` list sent in one UPDATE.
+_BATCH = 500
+
+
+def blob_storage():
+    """Storage for file fields whose uploads are deduplicated (STORAGES['blobs'])."""
+    return storages['blobs']
+
+
+def _chunks(content):
+    for chunk in content.chunks():
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def content_digest(content):
+    """(SHA-256 hex digest, size in bytes) of a File, read chunk by chunk."""
+    sha, size = hashlib.sha256(), 0
+    for chunk in _chunks(content):
+        sha.update(chunk)
+        size += len(chunk)
+    return sha.hexdigest(), size
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps one copy of each distinct upload.
+
+    Saving hashes the content and stores it once as
+    ``<prefix>/<aa>/<sha256><ext>``. If a blob with that digest already
+    exists nothing is written and the existing name is returned, so a
+    re-uploaded scan costs one read and no disk write. The name the field
+    asks for (``attachments/gst.png``) only contributes the extension.
+
+    Names already under the prefix are saved as given; that is how derived
+    files such as the taraerp.images variants end up next to their blob.
+    Deleting a blob through the storage is a no-op because other records
+    may share it; unreferenced blobs are removed by `collect()`.
+    """
+
+    def __init__(self, prefix='blobs', **kwargs):
+        self.prefix = prefix.strip('/')
+        super().__init__(**kwargs)
+
+    def is_blob_name(self, name):
+        return bool(name) and name.replace('\\', '/').startswith(f'{self.prefix}/')
+
+    def get_available_name(self, name, max_length=None):
+        # Uploads are renamed to their digest in _save(), so don't stat the requested name.
+        if self.is_blob_name(name):
+            return super().get_available_name(name, max_length)
+        return name
+
+    def _save(self, name, content):
+        if self.is_blob_name(name):
+            return super()._save(name, content)
+
+        digest, size = content_digest(content)
+        # Touching the row first keeps collect() from removing the blob while
+        # this upload is on its way to being referenced.
+        existing = Blob.objects.filter(digest=digest)
+        if existing.update(last_uploaded_at=timezone.now()):
+            blob_name = existing.values_list('name', flat=True).get()
+        else:
+            extension = os.path.splitext(name)[1].lower()
+            blob, _ = Blob.objects.get_or_create(
+                digest=digest, defaults={'name': f'{self.prefix}/{digest[:2]}/{digest}{extension}', 'size': size},
+            )
+            # A concurrent upload of the same bytes may have created the row
+            # first, under its own extension; store the file where that row says.
+            blob_name = blob.name
+
+        # The file can be missing if it was removed by hand, or present without
+        # a row if the transaction that created the row rolled back.
+        if not self.exists(blob_name):
+            self._write(blob_name, content)
+        return blob_name
+
+    def _write(self, name, content):
+        """Place `content` at `name` atomically; the same bytes may already be there."""
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            # Large uploads are already on disk; move them instead of copying.
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    for chunk in _chunks(content):
+                        fh.write(chunk)
+                os.replace(temp_path, full_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        self._ensure_location_group_id(full_path)
+
+    def delete(self, name):
+        if self.is_blob_name(name) and Blob.objects.filter(name=name).exists():
+            return
+        super().delete(name)
+
+    def purge(self, name):
+        """Remove the file even if it is a blob."""
+        super().delete(name)
+
+
+def _blob_names(instance, field_names):
+    names = Counter()
+    for field_name in field_names:
+        fieldfile = getattr(instance, field_name)
+        storage = fieldfile.storage
+        if fieldfile and isinstance(storage, ContentAddressedStorage) and storage.is_blob_name(fieldfile.name):
+            names[fieldfile.name] += 1
+    return names
+
+
+def adjust_refcounts(changes, private=False):
+    """
+    Apply `{blob name: refcount change}`, one UPDATE per distinct change.
+    With `private` the changes count in `private_refcount` as well.
+    """
+    by_change = defaultdict(list)
+    for name, change in changes.items():
+        if change:
+            by_change[change].append(name)
+    for change, names in by_change.items():
+        counts = {'refcount': F('refcount') + change}
+        if private:
+            counts['private_refcount'] = F('private_refcount') + change
+        for start in range(0, len(names), _BATCH):
+            Blob.objects.filter(name__in=names[start:start + _BATCH]).update(**counts)
+
+
+def _remember_previous(sender, instance, update_fields=None, raw=False, **kwargs):
+    field_names = tracked.get(sender, ())
+    if update_fields is not None:
+        field_names = tuple(name for name in field_names if name in update_fields)
+    previous = Counter()
+    if field_names and not raw and not instance._state.adding and instance.pk is not None:
+        row = sender._base_manager.filter(pk=instance.pk).values_list(*field_names).first()
+        previous = Counter(
+            name for name in row or ()
+            if name and blob_storage().is_blob_name(name)
+        )
+    instance._blob_previous = (field_names, previous)
+
+
+def _count_references(sender, instance, raw=False, **kwargs):
+    field_names, previous = instance.__dict__.pop('_blob_previous', ((), Counter()))
+    if raw or not field_names:
+        return
+    changes = _blob_names(instance, field_names)
+    changes.subtract(previous)
+    adjust_refcounts(changes, private=sender in private)
+
+
+def _release_references(sender, instance, **kwargs):
+    adjust_refcounts(
+        {name: -count for name, count in _blob_names(instance, tracked.get(sender, ())).items()},
+        private=sender in private,
+    )
+
+
+def track(model, field_names):
+    """
+    Keep `Blob.refcount` in step with `model`'s file fields.
+
+    Saves that may change those fields read the previous names with one
+    query by primary key; deletes release every name the row held. Changes
+    made with `QuerySet.update()` bypass this, so run `recount()` after them.
+    """
+    tracked[model] = tuple(field_names)
+    label = model._meta.label
+    pre_save.connect(_remember_previous, sender=model, dispatch_uid=f'blobs:pre_save:{label}')
+    post_save.connect(_count_references, sender=model, dispatch_uid=f'blobs:post_save:{label}')
+    post_delete.connect(_release_references, sender=model, dispatch_uid=f'blobs:post_delete:{label}')
+
+
+@transaction.atomic
+def recount():
+    """Rebuild every refcount from the tracked file fields. Returns the number of references."""
+    storage = blob_storage()
+    counts = {False: Counter(), True: Counter()}
+    for model, field_names in tracked.items():
+        for row in model._base_manager.values_list(*field_names).iterator():
+            counts[model in private].update(name for name in row if storage.is_blob_name(name))
+    Blob.objects.update(refcount=0, private_refcount=0)
+    for is_private, model_counts in counts.items():
+        adjust_refcounts(model_counts, private=is_private)
+    return sum(sum(model_counts.values()) for model_counts in counts.values())
+
+
+def collect(grace=None):
+    """
+    Delete unreferenced blobs and their image variants; returns their names.
+
+    Blobs uploaded within `grace` (BLOB_GC_GRACE_HOURS, default 24) are
+    kept, since the record that will reference them may not be saved yet.
+    Each blob is removed under a row lock, so an upload of the same bytes
+    either keeps it alive or writes it again afterwards.
+    """
+    if grace is None:
+        grace = timedelta(hours=getattr(settings, 'BLOB_GC_GRACE_HOURS', 24))
+    cutoff = timezone.now() - grace
+    storage = blob_storage()
+    candidates = Blob.objects.filter(refcount__lte=0, last_uploaded_at__lt=cutoff)
+    removed = []
+    for pk in list(candidates.values_list('pk', flat=True)):
+        with transaction.atomic():
+            blob = candidates.select_for_update().filter(pk=pk).first()
+            if blob is None:
+                continue
+            for name in [blob.name, *(images.variant_name(blob.name, variant) for variant in images.variant_sizes())]:
+                storage.purge(name)
+            blob.delete()
+        removed.append(blob.name)
+    logger.info(f"Collected {len(removed)} unreferenced blobs")
+    return removed
+
+
+def adopt_existing(delete_originals=False):
+    """
+    Move files that tracked fields stored before deduplication into blobs,
+    point the rows at them and rebuild the refcounts.
+
+    Returns `(files adopted, rows updated)`. With `delete_originals` the old
+    files and their image variants are removed once the rows are committed.
+    """
+    storage = blob_storage()
+    adopted, originals, rows_updated = {}, [], 0
+    for model, field_names in tracked.items():
+        for row in model._base_manager.values_list('pk', *field_names).iterator():
+            changes = {}
+            for field_name, name in zip(field_names, row[1:]):
+                if not name or storage.is_blob_name(name):
+                    continue
+                if name not in adopted:
+                    try:
+                        with storage.open(name, 'rb') as fh:
+                            adopted[name] = storage.save(name, File(fh))
+                    except FileNotFoundError:
+                        logger.warning(f"{model._meta.label} {row[0]}: {field_name} file {name} is missing")
+                        continue
+                    originals.append(name)
+                changes[field_name] = adopted[name]
+            if changes:
+                rows_updated += model._base_manager.filter(pk=row[0]).update(**changes)
+    recount()
+
+    if delete_originals and originals:
+        def remove():
+            for name in originals:
+                for target in [name, *(images.variant_name(name, variant) for variant in images.variant_sizes())]:
+                    storage.purge(target)
+        transaction.on_commit(remove)
+    return len(adopted), rows_updated
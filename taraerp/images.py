@@ -0,0 +1,146 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+from taraerp import tasks
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+# model -> names of its file fields that get variants; filled by register().
+registry = {}
+
+
+def variant_sizes():
+    """Variant name -> (max width, max height), largest first."""
+    sizes = getattr(settings, 'IMAGE_VARIANTS', {'preview': (1280, 1280), 'thumbnail': (256, 256)})
+    return dict(sorted(sizes.items(), key=lambda item: -item[1][0] * item[1][1]))
+
+
+def variant_name(name, variant):
+    """'attachments/gst.png' -> 'attachments/gst.thumbnail.webp'."""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.webp'
+
+
+def is_image_name(name):
+    return bool(name) and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _open(storage, name, largest):
+    with storage.open(name, 'rb') as fh:
+        image = Image.open(io.BytesIO(fh.read()))
+    # For JPEGs let the decoder downscale by a power of two while reading,
+    # which is far cheaper than decoding a full-resolution scan.
+    image.draft('RGB', largest)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def generate_variants(storage, name, force=False):
+    """
+    Write every size variant of `name` next to it as WebP.
+
+    Variants that already exist are kept unless `force`. Each variant is
+    resized from the previous, larger one rather than from the original.
+    Returns the names written.
+    """
+    if not is_image_name(name):
+        return []
+    sizes = variant_sizes()
+    targets = {variant: variant_name(name, variant) for variant in sizes}
+    if not force and all(storage.exists(target) for target in targets.values()):
+        return []
+
+    try:
+        image = _open(storage, name, next(iter(sizes.values())))
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as exc:
+        logger.warning(f"Could not create image variants for {name}: {exc}")
+        return []
+
+    quality = getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+    written = []
+    for variant, size in sizes.items():
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS, reducing_gap=3.0)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+        target = targets[variant]
+        if storage.exists(target):
+            storage.delete(target)
+        written.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def process_instance(instance, field_names=None, force=False):
+    """Synchronously generate variants for the image fields of one instance."""
+    written = []
+    for field_name in field_names or registry.get(type(instance), ()):
+        fieldfile = getattr(instance, field_name)
+        if fieldfile:
+            written += generate_variants(fieldfile.storage, fieldfile.name, force=force)
+    return written
+
+
+def _schedule(sender, instance, update_fields=None, **kwargs):
+    field_names = registry.get(sender, ())
+    if update_fields is not None:
+        field_names = [name for name in field_names if name in update_fields]
+    jobs = [
+        (getattr(instance, name).storage, getattr(instance, name).name)
+        for name in field_names
+        if is_image_name(getattr(instance, name).name)
+    ]
+    for storage, name in jobs:
+        # Runs after commit on the background pool; the upload request does not wait.
+        tasks.submit_on_commit(generate_variants, storage, name)
+
+
+def register(model, field_names=None):
+    """
+    Generate variants for `model`'s file fields (all of them by default)
+    in the background after every save that may have changed them.
+    """
+    if field_names is None:
+        field_names = [field.name for field in model._meta.fields if isinstance(field, models.FileField)]
+    registry[model] = tuple(field_names)
+    post_save.connect(_schedule, sender=model, dispatch_uid=f'image_variants:{model._meta.label}')
+
+
+def variant_urls(fieldfile, request=None):
+    """{'preview': url, 'thumbnail': url} for an image file, None otherwise."""
+    if not fieldfile or not is_image_name(fieldfile.name):
+        return None
+    urls = {}
+    for variant in variant_sizes():
+        url = fieldfile.storage.url(variant_name(fieldfile.name, variant))
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only `{field: {'preview': url, 'thumbnail': url}}` for the given
+    file fields. URLs are derived from the file name, so no storage or
+    database access happens while serializing; a variant may 404 for a few
+    seconds after upload while it is being generated.
+    """
+
+    def __init__(self, field_names, **kwargs):
+        self.field_names = tuple(field_names)
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        return {name: variant_urls(getattr(instance, name), request) for name in self.field_names}
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from taraerp import blobs
+
+
+class Command(BaseCommand):
+    help = "Delete deduplicated upload blobs that no record references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, help="Keep blobs uploaded this recently (default BLOB_GC_GRACE_HOURS).")
+        parser.add_argument('--recount', action='store_true', help="Rebuild every refcount from the file fields first.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f"Counted {blobs.recount()} references")
+        grace = options['grace_hours']
+        removed = blobs.collect(None if grace is None else timedelta(hours=grace))
+        self.stdout.write(f"Removed {len(removed)} unreferenced blobs")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from taraerp import blobs
+
+
+class Command(BaseCommand):
+    help = "Move attachments uploaded before deduplication into the shared blob storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help="Remove the old copies and their image variants once the rows point at blobs.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            files, rows = blobs.adopt_existing(delete_originals=options['delete_originals'])
+        self.stdout.write(f"Adopted {files} files into blobs; updated {rows} rows")
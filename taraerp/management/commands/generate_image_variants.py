@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from taraerp import images
+
+
+class Command(BaseCommand):
+    help = "Create missing thumbnail/preview variants for images uploaded before the pipeline existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist.")
+
+    def handle(self, *args, **options):
+        for model, field_names in images.registry.items():
+            has_file = Q()
+            for name in field_names:
+                has_file |= ~Q(**{name: ''}) & Q(**{f'{name}__isnull': False})
+            queryset = model._base_manager.filter(has_file).only('pk', *field_names)
+
+            written = 0
+            for instance in queryset.iterator(chunk_size=500):
+                written += len(images.process_instance(instance, field_names, force=options['force']))
+            self.stdout.write(f"{model._meta.label}: wrote {written} variants")
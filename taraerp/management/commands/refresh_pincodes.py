@@ -0,0 +1,58 @@
+import csv
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from BusinessPartner.models import BusinessPartner
+from taraerp import pincodes
+from taraerp.models import PincodeLocation
+from user.models import ResUser
+
+
+class Command(BaseCommand):
+    help = "Resolve pincodes that are missing from the local cache, or load a pincode directory CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-csv',
+            help="Load a pincode,city,state[,country] CSV into the shared pincode table instead of calling the service.",
+        )
+
+    def handle(self, *args, **options):
+        if options['from_csv']:
+            self.load_csv(options['from_csv'])
+            return
+
+        unresolved = Q(city__isnull=True) | Q(city__in=pincodes.UNRESOLVED_VALUES[1:])
+        targets = {}
+        for model in (ResUser, BusinessPartner):
+            for pincode in model._base_manager.filter(unresolved).values_list('pincode', flat=True).distinct():
+                if pincodes.is_valid_pincode(pincode):
+                    targets.setdefault(pincode, []).append(model._meta.label)
+
+        resolved = 0
+        for pincode, labels in targets.items():
+            location = pincodes.lookup(pincode)
+            if location:
+                for label in labels:
+                    pincodes.backfill(label, pincode, location)
+                resolved += 1
+            elif pincodes.refresh(pincode, labels):
+                resolved += 1
+        self.stdout.write(self.style.SUCCESS(f"Resolved {resolved} of {len(targets)} pincodes."))
+
+    def load_csv(self, path):
+        with open(path, newline='', encoding='utf-8') as handle:
+            rows = [
+                PincodeLocation(
+                    pincode=row['pincode'].strip(), city=row['city'].strip(), state=row['state'].strip(),
+                    country=(row.get('country') or 'India').strip(),
+                )
+                for row in csv.DictReader(handle)
+            ]
+        PincodeLocation.objects.bulk_create(
+            rows, batch_size=5000, update_conflicts=True,
+            unique_fields=['pincode'], update_fields=['city', 'state', 'country'],
+        )
+        pincodes.clear_cache()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(rows)} pincodes."))
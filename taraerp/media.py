@@ -0,0 +1,226 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from taraerp import blobs
+from taraerp.models import Blob
+
+# model -> (upload_to directories, permission classes) whose files need those
+# permissions to be downloaded; filled by protect().
+protected = {}
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# One year: a blob name changes whenever its bytes do.
+_IMMUTABLE = 'max-age=31536000, immutable'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def protect(model, field_names, permission_classes=(IsAuthenticated,)):
+    """
+    Serve files referenced by `model`'s `field_names` (and their image
+    variants) only to requests that pass `permission_classes`.
+
+    Blobs are marked private through `Blob.private_refcount`; other files
+    are protected by the fields' `upload_to` directory, so a callable
+    `upload_to` is not covered.
+    """
+    prefixes = {
+        model._meta.get_field(field_name).upload_to for field_name in field_names
+    }
+    protected[model] = (
+        tuple(prefix for prefix in prefixes if prefix and isinstance(prefix, str)),
+        tuple(permission_classes),
+    )
+    blobs.private.add(model)
+
+
+def _blob_prefix():
+    return settings.STORAGES.get('blobs', {}).get('OPTIONS', {}).get('prefix', 'blobs').strip('/')
+
+
+def required_permissions(name):
+    """
+    Permission classes a request needs to download `name`.
+
+    Blobs and their variants are looked up by digest, one indexed query:
+    a blob no record references is not served (Http404), and one that a
+    protected record references needs the protected models' permissions.
+    Other files under a protected field's `upload_to` directory need its
+    model's permissions without a query, whether or not a record still
+    points at them, so originals kept by dedupe_uploads and replaced
+    documents stay private.
+    """
+    match = re.match(rf'{re.escape(_blob_prefix())}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.|$)', name)
+    if match:
+        counts = Blob.objects.filter(digest=match.group(1)).values_list('refcount', 'private_refcount').first()
+        if not counts or counts[0] <= 0:
+            raise Http404
+        if counts[1] <= 0:
+            return []
+        return list(dict.fromkeys(
+            permission for _, permission_classes in protected.values() for permission in permission_classes
+        ))
+    required = []
+    for prefixes, permission_classes in protected.values():
+        if name.startswith(prefixes):
+            required.extend(permission_classes)
+    return required
+
+
+def blob_digest(name):
+    """The content digest for names of the form `<prefix>/<aa>/<sha256>[.ext]`."""
+    match = re.fullmatch(rf'{re.escape(_blob_prefix())}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[^./]+)?', name)
+    return match.group(1) if match else None
+
+
+def parse_range(header, size):
+    """
+    `(start, end)` (inclusive) for a single `bytes=` range, or None to send
+    the whole file (no header, several ranges, or a unit we don't know).
+    Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    match = _RANGE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _if_range_passes(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        # If-Range uses strong comparison, so a weak validator never matches.
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _read(path, start, length, chunk_size=64 * 1024):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class MediaView(APIView):
+    """
+    Serve files under MEDIA_ROOT.
+
+    Responses carry a strong ETag (the SHA-256 for deduplicated blobs, which
+    are also marked immutable; mtime and size otherwise) and Last-Modified,
+    and honour If-None-Match / If-Modified-Since and single byte ranges with
+    If-Range. With MEDIA_OFFLOAD set to 'x-sendfile' or 'x-accel-redirect'
+    the body is left to the front-end server once the checks have passed.
+
+    Files referenced by a model registered with protect() (KYC documents)
+    and other files under their `upload_to` directories go through the
+    normal DRF authentication and permission checks. Blobs no record
+    references are not served; other media is public, as it was when served
+    straight from MEDIA_ROOT.
+    """
+    permission_classes = []
+
+    def perform_content_negotiation(self, request, force=False):
+        # The body is a file; Accept only picks the renderer for error responses.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, path):
+        name = path.replace('\\', '/')
+        if any(part.startswith('.') for part in name.split('/')):
+            raise Http404
+        required = required_permissions(name)
+        for permission_class in required:
+            permission = permission_class()
+            if not permission.has_permission(request, self):
+                self.permission_denied(request, message=getattr(permission, 'message', None))
+
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, name)
+            stat = os.stat(full_path)
+        except (SuspiciousFileOperation, OSError):
+            raise Http404
+        if not os.path.isfile(full_path):
+            raise Http404
+
+        digest = blob_digest(name)
+        etag = f'"{digest}"' if digest else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified = int(stat.st_mtime)
+        cache_control = _IMMUTABLE if digest else 'no-cache'
+        if required:
+            cache_control = f'private, {cache_control}'
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(last_modified),
+            'Cache-Control': cache_control,
+            'Accept-Ranges': 'bytes',
+        }
+        conditional = get_conditional_response(request, etag, last_modified, HttpResponse(headers=headers))
+        if conditional.status_code != 200:
+            return conditional
+
+        content_type, encoding = mimetypes.guess_type(full_path)
+        if content_type is None or encoding:
+            # Compressed files are sent as stored; don't let clients unpack them.
+            content_type = 'application/octet-stream'
+        offload = getattr(settings, 'MEDIA_OFFLOAD', None)
+        if offload:
+            response = HttpResponse(content_type=content_type, headers=headers)
+            if offload == 'x-accel-redirect':
+                prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+                response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+            else:
+                response['X-Sendfile'] = full_path
+            return response
+
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is not None and not _if_range_passes(request, etag, last_modified):
+            byte_range = None
+
+        if byte_range is None:
+            # Whole files go through wsgi.file_wrapper, i.e. sendfile() where available.
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read(full_path, start, end - start + 1), status=206, content_type=content_type, headers=headers,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
@@ -0,0 +1,201 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+# Upper bounds (seconds) of the request duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats:
+    __slots__ = (
+        'requests', 'seconds', 'buckets', 'response_bytes', 'errors',
+        'sampled', 'queries', 'db_seconds', 'serializer_seconds',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.response_bytes = 0
+        self.errors = 0
+        self.sampled = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics keyed by (URL name, method).
+
+    Every request updates the request count, duration histogram and response
+    size; only sampled requests contribute query count, DB time and
+    serializer time, so divide those by ``sampled`` rather than ``requests``.
+
+    Each worker process keeps its own registry. With PERF_METRICS_DIR set,
+    every worker writes its snapshot there at most every
+    PERF_METRICS_FLUSH_SECONDS and `collect()` adds up all the files, so a
+    scrape sees the whole server whichever worker answers it. Without it
+    /metrics only reports the worker that served the scrape, which is only
+    right for a single-process server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(EndpointStats)
+        self._pid = None
+        self._file_id = None
+        self._flushed_at = 0.0
+
+    def record(self, endpoint, method, seconds, response_bytes, status_code, sample=None):
+        with self._lock:
+            stats = self._stats[(endpoint, method)]
+            stats.requests += 1
+            stats.seconds += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+            stats.response_bytes += response_bytes
+            if status_code >= 500:
+                stats.errors += 1
+            if sample is not None:
+                stats.sampled += 1
+                stats.queries += sample.queries
+                stats.db_seconds += sample.db_seconds
+                stats.serializer_seconds += sample.serializer_seconds
+        directory = getattr(settings, 'PERF_METRICS_DIR', None)
+        if directory and time.monotonic() - self._flushed_at >= getattr(settings, 'PERF_METRICS_FLUSH_SECONDS', 5):
+            self.flush(directory)
+
+    def _path(self, directory):
+        # Workers forked from one master share this object; each names its own
+        # file, and a restarted worker never overwrites its predecessor's.
+        if self._pid != os.getpid():
+            self._pid, self._file_id = os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex}'
+        return os.path.join(directory, f'{self._file_id}.json')
+
+    def flush(self, directory):
+        """Write this process's snapshot to `directory`, replacing its previous one atomically."""
+        self._flushed_at = time.monotonic()
+        rows = [
+            [endpoint, method, {name: getattr(stats, name) for name in EndpointStats.__slots__}]
+            for (endpoint, method), stats in self.snapshot().items()
+        ]
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(rows, fh)
+        os.replace(temp_path, self._path(directory))
+
+    def collect(self):
+        """Stats of every worker that wrote to PERF_METRICS_DIR, or of this process alone."""
+        directory = getattr(settings, 'PERF_METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.flush(directory)
+        merged = defaultdict(EndpointStats)
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as fh:
+                    rows = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for endpoint, method, values in rows:
+                stats = merged[(endpoint, method)]
+                for name in EndpointStats.__slots__:
+                    if name == 'buckets':
+                        stats.buckets = [a + b for a, b in zip(stats.buckets, values[name])]
+                    else:
+                        setattr(stats, name, getattr(stats, name) + values[name])
+        return dict(merged)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: _copy(stats) for key, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _copy(stats):
+    clone = EndpointStats()
+    for name in EndpointStats.__slots__:
+        value = getattr(stats, name)
+        setattr(clone, name, list(value) if isinstance(value, list) else value)
+    return clone
+
+
+registry = MetricsRegistry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshot=None):
+    """Render the registry in the Prometheus text exposition format."""
+    snapshot = registry.collect() if snapshot is None else snapshot
+    lines = []
+
+    def family(name, kind, help_text, rows):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(rows)
+
+    def labels(endpoint, method, **extra):
+        pairs = [('endpoint', endpoint), ('method', method), *extra.items()]
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    items = sorted(snapshot.items())
+
+    histogram = []
+    for (endpoint, method), stats in items:
+        for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+            histogram.append(f'http_request_duration_seconds_bucket{labels(endpoint, method, le=bound)} {count}')
+        histogram.append(f'http_request_duration_seconds_bucket{labels(endpoint, method, le="+Inf")} {stats.requests}')
+        histogram.append(f'http_request_duration_seconds_sum{labels(endpoint, method)} {stats.seconds:.6f}')
+        histogram.append(f'http_request_duration_seconds_count{labels(endpoint, method)} {stats.requests}')
+    family('http_request_duration_seconds', 'histogram', 'Wall time per request.', histogram)
+
+    counters = (
+        ('http_response_bytes_total', 'Response body bytes sent.', 'response_bytes', 'd'),
+        ('http_request_errors_total', 'Requests that ended with a 5xx status.', 'errors', 'd'),
+        ('http_requests_sampled_total', 'Requests with DB and serializer detail.', 'sampled', 'd'),
+        ('http_request_db_queries_total', 'DB queries run by sampled requests.', 'queries', 'd'),
+        ('http_request_db_seconds_total', 'DB time spent by sampled requests.', 'db_seconds', '.6f'),
+        ('http_request_serializer_seconds_total', 'Serializer time spent by sampled requests.',
+         'serializer_seconds', '.6f'),
+    )
+    for name, help_text, attr, fmt in counters:
+        rows = [
+            f'{name}{labels(endpoint, method)} {format(getattr(stats, attr), fmt)}'
+            for (endpoint, method), stats in items
+        ]
+        family(name, 'counter', help_text, rows)
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+
+    The scraper must send PERF_METRICS_TOKEN as a bearer token; while no
+    token is configured the endpoint answers 404.
+    """
+    token = getattr(settings, 'PERF_METRICS_TOKEN', None)
+    if not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,138 @@
+import contextvars
+import json
+import logging
+import random
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from taraerp.metrics import registry
+
+logger = logging.getLogger('taraerp.perf')
+
+_current_sample = contextvars.ContextVar('taraerp_request_sample', default=None)
+
+
+class RequestSample:
+    """DB and serializer detail collected for one sampled request."""
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'in_serializer')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.in_serializer = False
+
+
+def _timed_serializer_call(func):
+    def wrapper(self, *args, **kwargs):
+        sample = _current_sample.get()
+        # Nested serializers run inside their parent's call; only time the outermost one.
+        if sample is None or sample.in_serializer:
+            return func(self, *args, **kwargs)
+        sample.in_serializer = True
+        start = perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            sample.serializer_seconds += perf_counter() - start
+            sample.in_serializer = False
+    wrapper._perf_instrumented = True
+    return wrapper
+
+
+def instrument_serializers():
+    """
+    Time ``BaseSerializer.data`` and ``is_valid``.
+
+    ``Serializer.data`` and ``ListSerializer.data`` both go through
+    ``BaseSerializer.data`` via ``super()``, so this covers every serializer
+    without touching the views. Safe to call more than once.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    if getattr(BaseSerializer.data.fget, '_perf_instrumented', False):
+        return
+    BaseSerializer.data = property(_timed_serializer_call(BaseSerializer.data.fget))
+    BaseSerializer.is_valid = _timed_serializer_call(BaseSerializer.is_valid)
+
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route or 'unnamed'
+
+
+def _response_size(response):
+    if response.streaming:
+        # The body has not been produced yet; trust Content-Length if set.
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, response size and status for every request, keyed by
+    the resolved URL name.
+
+    A PERF_SAMPLE_RATE fraction of requests additionally records DB query
+    count, DB time and serializer time, and writes a JSON line to the
+    ``taraerp.perf`` logger. Queries made while a streaming response is
+    consumed happen after the middleware returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.1)
+        sample = RequestSample() if rate > 0 and random.random() < rate else None
+
+        start = perf_counter()
+        if sample is None:
+            response = self.get_response(request)
+        else:
+            token = _current_sample.set(sample)
+            try:
+                with ExitStack() as stack:
+                    timer = self._db_timer(sample)
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(timer))
+                    response = self.get_response(request)
+            finally:
+                _current_sample.reset(token)
+        seconds = perf_counter() - start
+
+        endpoint = _endpoint_name(request)
+        size = _response_size(response)
+        registry.record(endpoint, request.method, seconds, size, response.status_code, sample)
+        if sample is not None:
+            logger.info(json.dumps({
+                'endpoint': endpoint,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': round(seconds * 1000, 3),
+                'db_queries': sample.queries,
+                'db_ms': round(sample.db_seconds * 1000, 3),
+                'serializer_ms': round(sample.serializer_seconds * 1000, 3),
+                'response_bytes': size,
+            }))
+        return response
+
+    @staticmethod
+    def _db_timer(sample):
+        def wrapper(execute, sql, params, many, context):
+            start = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                sample.queries += 1
+                sample.db_seconds += perf_counter() - start
+        return wrapper
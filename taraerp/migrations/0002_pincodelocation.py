@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taraerp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PincodeLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pincode', models.CharField(max_length=10, unique=True)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('country', models.CharField(default='India', max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:20
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+# Frozen copy of BusinessPartner.models.KYC_FILE_FIELDS, the protected file fields.
+KYC_FILE_FIELDS = (
+    'bis_attachment', 'gst_attachment', 'msme_attachment', 'pan_attachment',
+    'tan_attachment', 'image', 'aadhar_attach',
+)
+
+
+def count_private_references(apps, schema_editor):
+    Blob = apps.get_model('taraerp', 'Blob')
+    BusinessPartnerKYC = apps.get_model('BusinessPartner', 'BusinessPartnerKYC')
+    prefix = settings.STORAGES.get('blobs', {}).get('OPTIONS', {}).get('prefix', 'blobs').strip('/')
+    counts = Counter()
+    for row in BusinessPartnerKYC.objects.values_list(*KYC_FILE_FIELDS).iterator():
+        counts.update(name for name in row if name and name.startswith(f'{prefix}/'))
+    by_count = {}
+    for name, count in counts.items():
+        by_count.setdefault(count, []).append(name)
+    for count, names in by_count.items():
+        for start in range(0, len(names), 500):
+            Blob.objects.filter(name__in=names[start:start + 500]).update(private_refcount=F('private_refcount') + count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusinessPartner', '0031_businesspartnerkyc_blob_storage'),
+        ('taraerp', '0003_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='private_refcount',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_private_references, migrations.RunPython.noop),
+    ]
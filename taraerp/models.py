@@ -0,0 +1,50 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Sequence(models.Model):
+    """
+    Named counter row used to hand out gap-tolerant or gap-free numbers
+    (order numbers, partner codes, user codes) without scanning the target table.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.last_value}"
+
+
+class PincodeLocation(models.Model):
+    """
+    Pincode to (city, state, country) entries resolved by the background
+    refresher, shared by every worker process on top of the bundled dataset.
+    """
+    pincode = models.CharField(max_length=10, unique=True)
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    country = models.CharField(max_length=100, default='India')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.pincode} - {self.city}, {self.state}"
+
+
+class Blob(models.Model):
+    """
+    One file in the content-addressed upload storage (taraerp.blobs), shared
+    by every record that uploaded the same bytes. `refcount` counts the file
+    fields that currently point at it, `private_refcount` those of them on
+    models registered with taraerp.media.protect().
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    private_refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the same bytes are uploaded again, so garbage collection
+    # never removes a blob that a request is about to reference.
+    last_uploaded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
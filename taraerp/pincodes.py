@@ -0,0 +1,202 @@
+"""
+Pincode to (city, state, country) lookup.
+
+Lookups on the request path never touch the network: they are answered from an
+in-process memo, the bundled dataset (`PINCODE_DATASET`) and the shared
+`PincodeLocation` table, in that order. Pincodes missing from all three are
+resolved afterwards by `refresh()`, on the background pool or through the
+`refresh_pincodes` management command, using the service named in
+`PINCODE_SERVICE`.
+"""
+import csv
+import logging
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import requests
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from taraerp import tasks
+from taraerp.models import PincodeLocation
+
+logger = logging.getLogger(__name__)
+
+Location = namedtuple('Location', ['city', 'state', 'country'])
+
+DEFAULT_DATASET = Path(__file__).resolve().parent / 'data' / 'pincodes.csv'
+LOCATION_FIELDS = ('city', 'state', 'country')
+UNRESOLVED_VALUES = (None, '', 'Unknown')
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def is_valid_pincode(pincode):
+    return bool(pincode) and pincode.isdigit() and len(pincode) == 6
+
+
+@lru_cache(maxsize=1)
+def _bundled():
+    path = getattr(settings, 'PINCODE_DATASET', None) or DEFAULT_DATASET
+    locations = {}
+    try:
+        with open(path, newline='', encoding='utf-8') as handle:
+            for row in csv.DictReader(handle):
+                locations[row['pincode'].strip()] = Location(
+                    row['city'].strip(), row['state'].strip(), (row.get('country') or 'India').strip(),
+                )
+    except OSError as e:
+        logger.error(f"Could not load pincode dataset {path}: {e}")
+    return locations
+
+
+def lookup(pincode):
+    """Return the cached `Location` for `pincode`, or None. Never blocks on the network."""
+    if not is_valid_pincode(pincode):
+        return None
+    location = _memo.get(pincode) or _bundled().get(pincode)
+    if location:
+        return location
+
+    row = PincodeLocation.objects.filter(pincode=pincode).values_list(*LOCATION_FIELDS).first()
+    if row:
+        location = Location(*row)
+        with _memo_lock:
+            _memo[pincode] = location
+    return location
+
+
+def clear_cache():
+    with _memo_lock:
+        _memo.clear()
+    _bundled.cache_clear()
+
+
+class PostalPincodeService:
+    """Remote lookup against api.postalpincode.in, falling back to zippopotam.us."""
+    primary_url = "https://api.postalpincode.in/pincode/{pincode}"
+    backup_url = "https://api.zippopotam.us/in/{pincode}"
+    retries = 3
+    timeout_seconds = 10
+
+    def fetch(self, pincode):
+        for attempt in range(self.retries):
+            try:
+                response = requests.get(self.primary_url.format(pincode=pincode), timeout=self.timeout_seconds)
+                response.raise_for_status()
+                data = response.json()
+                if data and data[0]['Status'] == "Success" and data[0]['PostOffice']:
+                    post_office = data[0]['PostOffice'][0]
+                    return Location(
+                        post_office.get('District', '').strip(),
+                        post_office.get('State', '').strip(),
+                        post_office.get('Country', '').strip() or 'India',
+                    )
+                break
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Attempt {attempt + 1}: Error fetching location for {pincode}: {str(e)}")
+                time.sleep(2 ** attempt)
+
+        try:
+            response = requests.get(self.backup_url.format(pincode=pincode), timeout=self.timeout_seconds)
+            response.raise_for_status()
+            data = response.json()
+            if data.get('places'):
+                place = data['places'][0]
+                return Location(
+                    place.get('place name', '').strip(),
+                    place.get('state', '').strip(),
+                    data.get('country', '').strip() or 'India',
+                )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Backup API failed: {str(e)}")
+        return None
+
+
+class StaticPincodeService:
+    """
+    Local stand-in for the remote service, answering from
+    `PINCODE_STATIC_LOCATIONS` ({pincode: (city, state, country)}).
+    """
+
+    def __init__(self, locations=None):
+        if locations is None:
+            locations = getattr(settings, 'PINCODE_STATIC_LOCATIONS', {})
+        self.locations = locations
+
+    def fetch(self, pincode):
+        location = self.locations.get(pincode)
+        return Location(*location) if location else None
+
+
+def get_service():
+    return import_string(getattr(settings, 'PINCODE_SERVICE', 'taraerp.pincodes.PostalPincodeService'))()
+
+
+def refresh(pincode, model_labels=()):
+    """
+    Resolve `pincode` through the configured service, store it for every
+    process, and backfill rows of `model_labels` still missing a location.
+    """
+    location = get_service().fetch(pincode)
+    if not location:
+        logger.error(f"Failed to fetch location for pincode {pincode}")
+        return None
+
+    PincodeLocation.objects.update_or_create(pincode=pincode, defaults=location._asdict())
+    with _memo_lock:
+        _memo[pincode] = location
+
+    for label in model_labels:
+        backfill(label, pincode, location)
+    return location
+
+
+def backfill(model_label, pincode, location):
+    """Set the location on rows of `model_label` with this pincode that are still unresolved."""
+    model = apps.get_model(model_label)
+    field_names = {field.name for field in model._meta.get_fields()}
+    values = {name: value for name, value in location._asdict().items() if name in field_names}
+    return model._base_manager.filter(pincode=pincode).filter(
+        Q(city__isnull=True) | Q(city__in=UNRESOLVED_VALUES[1:])
+    ).update(**values)
+
+
+def fill_location(instance, overwrite=False):
+    """
+    pre_save helper: copy the cached location for `instance.pincode` onto the
+    instance. On a cache miss the instance is flagged so `schedule_refresh`
+    resolves it in the background once the row is committed; with
+    `overwrite` the old location is cleared meanwhile, so the backfill,
+    which only touches unresolved rows, picks the row up.
+    """
+    instance._pincode_refresh = False
+    if not is_valid_pincode(instance.pincode):
+        return
+    if not overwrite and instance.city not in UNRESOLVED_VALUES and instance.state not in UNRESOLVED_VALUES:
+        return
+
+    location = lookup(instance.pincode)
+    if location is None:
+        instance._pincode_refresh = True
+        if overwrite:
+            for name in Location._fields:
+                if hasattr(instance, name):
+                    setattr(instance, name, None)
+        return
+    for name, value in location._asdict().items():
+        if hasattr(instance, name):
+            setattr(instance, name, value or None)
+
+
+def schedule_refresh(sender, instance, **kwargs):
+    """post_save receiver that queues the background refresh flagged by fill_location()."""
+    if getattr(instance, '_pincode_refresh', False):
+        instance._pincode_refresh = False
+        tasks.submit_on_commit(refresh, instance.pincode, [sender._meta.label])
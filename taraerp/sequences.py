@@ -0,0 +1,72 @@
+import threading
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from taraerp.models import Sequence
+
+
+def reserve(name, count=1, seed=None):
+    """
+    Atomically advance the `name` counter by `count` and return the reserved
+    inclusive range `(first, last)`.
+
+    `seed` is called once, when the counter row does not exist yet, and must
+    return the last value already in use (e.g. the highest existing order number).
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    with transaction.atomic():
+        updated = Sequence.objects.filter(name=name).update(last_value=F('last_value') + count)
+        if not updated:
+            start = seed() if seed else 0
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(name=name, last_value=start + count)
+            except IntegrityError:
+                # Another worker created the row first; take the next block from it.
+                Sequence.objects.filter(name=name).update(last_value=F('last_value') + count)
+        last = Sequence.objects.filter(name=name).values_list('last_value', flat=True).get()
+    return last - count + 1, last
+
+
+class BlockAllocator:
+    """
+    Per-process allocator that reserves `block_size` numbers at a time from a
+    `Sequence` row and hands them out from memory.
+
+    With `block_size=1` every number is reserved individually and the sequence
+    is gap-free; larger blocks trade gaps (unused numbers when a worker exits)
+    for one database round-trip per block instead of per number.
+    """
+
+    def __init__(self, name, block_size=1, seed=None):
+        self.name = name
+        self.block_size = block_size
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._next = 0
+        self._last = -1
+
+    def next_value(self):
+        if connection.in_atomic_block:
+            # A block cached here would outlive a rollback of the caller's
+            # transaction while the counter row reverts, so reserve one number.
+            return reserve(self.name, 1, self.seed)[0]
+        with self._lock:
+            if self._next > self._last:
+                self._next, self._last = reserve(self.name, self.block_size, self.seed)
+            value = self._next
+            self._next += 1
+            return value
+
+    def reserve(self, count):
+        """Reserve `count` consecutive numbers in one round-trip, bypassing the block cache."""
+        first, last = reserve(self.name, count, self.seed)
+        return range(first, last + 1)
+
+    def reset(self):
+        """Drop the in-memory block (used by tests and after a counter is reseeded)."""
+        with self._lock:
+            self._next, self._last = 0, -1
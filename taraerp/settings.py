@@ -260,6 +260,7 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    'taraerp.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -332,6 +333,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'taraerp.perf': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -446,6 +452,77 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'user.ResUser'
 
+# Order numbers are reserved from the `order_no` sequence in blocks of this
+# size per worker process, so concurrent creates never contend on a row scan.
+ORDER_NO_BLOCK_SIZE = 20
+
+# Pincode lookups are answered locally (bundled dataset + PincodeLocation table);
+# misses are resolved off the request path by this service on the background pool.
+# Tests can use 'taraerp.pincodes.StaticPincodeService' with PINCODE_STATIC_LOCATIONS.
+PINCODE_SERVICE = 'taraerp.pincodes.PostalPincodeService'
+PINCODE_DATASET = os.path.join(BASE_DIR, 'taraerp', 'data', 'pincodes.csv')
+BACKGROUND_TASK_WORKERS = 2
+
+# Login fast path: role -> dashboard and per-user permission codenames are
+# cached in LOGIN_CACHE_ALIAS (point it at a shared backend in production)
+# behind a short-lived per-process copy.
+LOGIN_CACHE_ALIAS = 'default'
+LOGIN_CACHE_TIMEOUT = 3600
+LOGIN_CACHE_LOCAL_TIMEOUT = 30
+
+# Request metrics (taraerp.middleware): every request is counted and timed,
+# PERF_SAMPLE_RATE of them also record DB/serializer detail and a log line.
+# /metrics serves Prometheus text to scrapers sending PERF_METRICS_TOKEN as a
+# bearer token, and is disabled (404) while no token is set. Under a
+# multi-worker server set PERF_METRICS_DIR to a directory the workers share
+# (emptied on each deploy) so scrapes add up every worker's counters.
+PERF_METRICS_ENABLED = True
+PERF_SAMPLE_RATE = 0.1
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN')
+PERF_METRICS_DIR = os.environ.get('PERF_METRICS_DIR')
+PERF_METRICS_FLUSH_SECONDS = 5
+
+# The benchmark commands (generate_bench_data, benchmark_order_indexes) seed
+# and delete synthetic rows; they only run against a database marked as a
+# disposable benchmark copy with BENCHMARK_DATABASE=1.
+BENCHMARK_DATABASE = os.environ.get('BENCHMARK_DATABASE') == '1'
+
+# Bulk user import hashes passwords on this many processes (1 = inline);
+# batches smaller than the threshold are always hashed inline.
+USER_IMPORT_HASH_WORKERS = 4
+USER_IMPORT_POOL_THRESHOLD = 50
+
+# Background WebP variants of uploaded images (taraerp.images), bounded to
+# these (width, height) boxes and written next to the original file.
+IMAGE_VARIANTS = {'preview': (1280, 1280), 'thumbnail': (256, 256)}
+IMAGE_WEBP_QUALITY = 80
+
+# KYC attachments and order images use the 'blobs' storage: each distinct
+# file is stored once under its SHA-256 and shared by reference count
+# (taraerp.blobs). Blobs nothing references are deleted by collect_blobs
+# once they are older than the grace period.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'blobs': {'BACKEND': 'taraerp.blobs.ContentAddressedStorage', 'OPTIONS': {'prefix': 'blobs'}},
+}
+BLOB_GC_GRACE_HOURS = 24
+
+# MEDIA_URL is served by taraerp.media.MediaView, which enforces KYC document
+# permissions. Set MEDIA_OFFLOAD to 'x-accel-redirect' (nginx, with an
+# `internal` location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+# or 'x-sendfile' (Apache mod_xsendfile) to let the web server send the bytes.
+MEDIA_OFFLOAD = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Most order numbers accepted by one orders/bulk-action/ request.
+ORDER_BULK_ACTION_LIMIT = 1000
+
+# Auto-assignment (order.scheduler): most open orders per craftsman, and how
+# many days ahead an order counts as due soon (weighing double in the load).
+CRAFTSMAN_CAPACITY = 10
+ASSIGNMENT_DUE_SOON_DAYS = 3
+
 
 # Ensure timezone settings are correct
 TIME_ZONE = 'Asia/Kolkata'  # Indian Standard Time (IST)
@@ -0,0 +1,48 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='taraerp-background',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run `func(*args, **kwargs)` on the process-wide background pool, off the
+    request path. With `BACKGROUND_TASKS_EAGER = True` (tests) it runs inline.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        _run(func, args, kwargs)
+        return
+    _get_executor().submit(_run, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Like submit(), but only once the current transaction commits."""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
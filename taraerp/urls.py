@@ -1,6 +1,11 @@
+import re
+
+from django.conf import settings
 from django.http import HttpResponse
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from taraerp.media import MediaView
+from taraerp.metrics import metrics_view
 
 def home_view(request):
     return HttpResponse("Welcome to Tara ERP!")
@@ -8,7 +13,9 @@ def home_view(request):
 urlpatterns = [
     path('', home_view),  # Root URL handler
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('order/', include('order.urls')),
     path('user/', include('user.urls')),
     path('BusinessPartner/', include('BusinessPartner.urls')),
+    re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", MediaView.as_view(), name='media'),
 ]
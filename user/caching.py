@@ -0,0 +1,116 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from user.models import ResUser, RoleDashboardMapping
+
+_MISSING = object()
+
+
+class TwoLevelCache:
+    """
+    A per-process dict (L1) in front of a shared Django cache (L2).
+
+    L1 entries live for a few seconds so a burst of logins on one worker
+    never leaves the process; L2 is shared by every worker and is the one
+    invalidated by the signal receivers below. Values of ``None`` are cached
+    too, so a role without a dashboard mapping does not query on every login.
+    """
+
+    def __init__(self, prefix, local_timeout=None, timeout=None):
+        self.prefix = prefix
+        self.local_timeout = local_timeout
+        self.timeout = timeout
+        self._local = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[getattr(settings, 'LOGIN_CACHE_ALIAS', 'default')]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def _local_timeout(self):
+        if self.local_timeout is not None:
+            return self.local_timeout
+        return getattr(settings, 'LOGIN_CACHE_LOCAL_TIMEOUT', 30)
+
+    def _timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'LOGIN_CACHE_TIMEOUT', 3600)
+
+    def get_or_set(self, key, default):
+        key = self._key(key)
+        now = time.monotonic()
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = self.shared.get(key, _MISSING)
+        if value is _MISSING:
+            value = default()
+            self.shared.set(key, value, self._timeout())
+        with self._lock:
+            self._local[key] = (now + self._local_timeout(), value)
+        return value
+
+    def delete(self, *keys):
+        keys = [self._key(key) for key in keys]
+        self.shared.delete_many(keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+dashboard_cache = TwoLevelCache('login:dashboard')
+permission_cache = TwoLevelCache('login:permissions')
+
+
+def get_dashboard_url(role):
+    def load():
+        return (
+            RoleDashboardMapping.objects.filter(role=role)
+            .values_list('dashboard_url', flat=True)
+            .first()
+        )
+    return dashboard_cache.get_or_set(role, load)
+
+
+def get_permission_codenames(user):
+    def load():
+        return sorted(user.user_permissions.values_list('codename', flat=True))
+    return permission_cache.get_or_set(user.pk, load)
+
+
+def invalidate_user_permissions(*user_ids):
+    if user_ids:
+        permission_cache.delete(*user_ids)
+
+
+@receiver([post_save, post_delete], sender=RoleDashboardMapping)
+def invalidate_dashboard(sender, instance, **kwargs):
+    dashboard_cache.delete(instance.role)
+
+
+@receiver(m2m_changed, sender=ResUser.user_permissions.through)
+def invalidate_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user_permissions(instance.pk)
+    elif pk_set:
+        invalidate_user_permissions(*pk_set)
+    elif action == 'post_clear':
+        # permission.user_set.clear() does not report which users lost it.
+        user_ids = kwargs.get('model')._default_manager.values_list('pk', flat=True)
+        invalidate_user_permissions(*user_ids)
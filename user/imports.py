@@ -0,0 +1,180 @@
+import csv
+import io
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework import serializers
+
+from BusinessPartner.models import BusinessPartner
+from taraerp import pincodes, tasks
+from user.models import ResUser, reserve_user_codes, validate_mobile_no
+from user.permissions import PERMISSION_FLAGS, sync_role_permissions
+
+# Uniqueness checked across the file and against the database, one query per field.
+UNIQUE_FIELDS = ('username', 'email_id', 'mobile_no')
+
+
+class UserImportRowSerializer(serializers.Serializer):
+    """
+    Field-level validation for one import row.
+
+    Runs no queries: uniqueness and bp_code existence are checked for the
+    whole batch at once in `validate_rows()`.
+    """
+    username = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    full_name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    email_id = serializers.EmailField(required=False, allow_blank=True)
+    mobile_no = serializers.CharField(max_length=15, required=False, allow_blank=True, validators=[validate_mobile_no])
+    password = serializers.CharField(max_length=128)
+    role_name = serializers.ChoiceField(choices=ResUser.ROLE_CHOICES)
+    user_state = serializers.ChoiceField(choices=ResUser.USER_TYPE_CHOICES, required=False)
+    status = serializers.ChoiceField(choices=ResUser.STATUS_CHOICES, required=False)
+    gender = serializers.ChoiceField(choices=ResUser.GENDER_CHOICES, required=False, allow_blank=True)
+    dob = serializers.DateField(required=False, allow_null=True)
+    company_name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    bp_code = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    state = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    country = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    pincode = serializers.CharField(max_length=10, required=False, allow_blank=True)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for flag in PERMISSION_FLAGS:
+            fields[flag] = serializers.BooleanField(required=False, default=False)
+        return fields
+
+    def validate(self, data):
+        if not data.get('email_id') and not data.get('mobile_no'):
+            raise serializers.ValidationError("Either email_id or mobile_no is required.")
+        return data
+
+
+def parse_upload(request):
+    """
+    Rows from a multipart CSV upload (`file`), a raw text/csv body, or a JSON
+    body that is either a list of rows or `{"users": [...]}`.
+    """
+    upload = request.FILES.get('file')
+    if upload is not None:
+        return list(csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig')))
+    if request.content_type == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.body.decode('utf-8-sig'))))
+    data = request.data
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        raise serializers.ValidationError("Send a CSV file or a JSON list of users.")
+    return data
+
+
+def _drop_blanks(row):
+    # Empty CSV cells mean "not given", so model defaults apply.
+    return {key: value for key, value in row.items() if value not in ('', None)}
+
+
+def validate_rows(rows):
+    """
+    Validate every row and return `(valid, errors)`.
+
+    `valid` is a list of `(row_number, data)`; `errors` maps row numbers
+    (1-based, as a spreadsheet shows them) to error dicts. Database checks
+    run once per field for the whole batch.
+    """
+    valid, errors = [], {}
+    for number, row in enumerate(rows, start=1):
+        serializer = UserImportRowSerializer(data=_drop_blanks(row) if isinstance(row, dict) else row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors[number] = serializer.errors
+
+    for field in UNIQUE_FIELDS:
+        seen = defaultdict(list)
+        for number, data in valid:
+            if data.get(field):
+                seen[data[field]].append(number)
+        taken = set(
+            ResUser.objects.filter(**{f'{field}__in': list(seen)}).values_list(field, flat=True)
+        ) if seen else set()
+        for value, numbers in seen.items():
+            if value in taken:
+                for number in numbers:
+                    errors.setdefault(number, {})[field] = [f"{value} is already taken."]
+            elif len(numbers) > 1:
+                for number in numbers[1:]:
+                    errors.setdefault(number, {})[field] = [f"{value} is repeated in row {numbers[0]}."]
+
+    codes = {data['bp_code'] for _, data in valid if data.get('bp_code')}
+    partners = dict(
+        BusinessPartner.objects.filter(bp_code__in=codes).values_list('bp_code', 'id')
+    ) if codes else {}
+    for number, data in valid:
+        code = data.get('bp_code')
+        if code and code not in partners:
+            errors.setdefault(number, {})['bp_code'] = [f"Business partner {code} does not exist."]
+        data['bp_code_id'] = partners.get(code)
+
+    valid = [(number, data) for number, data in valid if number not in errors]
+    return valid, errors
+
+
+def hash_passwords(passwords):
+    """
+    Hash `passwords` on a process pool (USER_IMPORT_HASH_WORKERS processes).
+
+    PBKDF2 is CPU-bound and holds the GIL, so threads would not help; small
+    batches are hashed inline because starting the pool costs more.
+    """
+    workers = getattr(settings, 'USER_IMPORT_HASH_WORKERS', 4)
+    if workers <= 1 or len(passwords) < getattr(settings, 'USER_IMPORT_POOL_THRESHOLD', 50):
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def import_users(valid_rows, batch_size=1000):
+    """
+    Create users for validated rows and return them.
+
+    Passwords are hashed before the transaction opens, so the user code
+    counters are only locked for the inserts. Codes are reserved per role in
+    one round-trip each, users are inserted with bulk_create, and role groups
+    and flag permissions are attached for the whole batch by
+    `sync_role_permissions`.
+    """
+    rows = [data for _, data in valid_rows]
+    if not rows:
+        return []
+
+    hashes = hash_passwords([data['password'] for data in rows])
+
+    users, refresh = [], set()
+    by_role = defaultdict(list)
+    for data, password in zip(rows, hashes):
+        fields = {key: value for key, value in data.items() if key not in ('password', 'bp_code')}
+        user = ResUser(password=password, **fields)
+        # bulk_create skips pre_save, so fill the location the same way the signal does.
+        pincodes.fill_location(user, overwrite=True)
+        if user._pincode_refresh:
+            refresh.add(user.pincode)
+        users.append(user)
+        by_role[user.role_name].append(user)
+
+    with transaction.atomic():
+        for role_name, role_users in by_role.items():
+            for user, code in zip(role_users, reserve_user_codes(role_name, len(role_users))):
+                user.user_code = code
+                user.username = user.username or code
+        ResUser.objects.bulk_create(users, batch_size=batch_size)
+
+        sync_role_permissions(users, batch_size=batch_size)
+
+        for pincode in refresh:
+            tasks.submit_on_commit(pincodes.refresh, pincode, [ResUser._meta.label])
+    return users
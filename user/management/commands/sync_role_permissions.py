@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from user.models import ResUser
+from user.permissions import sync_role_permissions
+
+
+class Command(BaseCommand):
+    help = "Sync role group membership and flag permissions for every user, a batch at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--role', help="Only sync users with this role_name.")
+
+    def handle(self, *args, **options):
+        queryset = ResUser._base_manager.order_by('pk')
+        if options['role']:
+            queryset = queryset.filter(role_name=options['role'])
+
+        last_pk, synced, changed = 0, 0, 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            changed += len(sync_role_permissions(batch, batch_size=options['batch_size']))
+            synced += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Synced {synced} users, {changed} had permission changes."))
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:10
+
+from django.db import migrations
+
+# Frozen copies of ResUser.ROLE_CHOICES and user.permissions.PERMISSION_FLAGS.
+ROLE_NAMES = ('Project Owner', 'Super Admin', 'Admin', 'Key User', 'User', 'Craftsman', 'Walking Customer')
+PERMISSION_FLAGS = {
+    'view_only': 'view', 'copy': 'copy', 'screenshot': 'screenshot', 'print_perm': 'print',
+    'download': 'download', 'share': 'share', 'edit': 'edit', 'delete': 'delete',
+    'manage_roles': 'manage_roles', 'approve': 'approve', 'reject': 'reject', 'archive': 'archive',
+    'restore': 'restore', 'transfer': 'transfer', 'custom_access': 'custom_access',
+    'full_control': 'full_control',
+}
+
+
+def move_flag_permissions_to_users(apps, schema_editor):
+    """
+    Flag permissions used to be written onto the role group, so every member
+    held the flags of whoever was saved last. Grant each user the
+    permissions for their own flags, then take the flags off the role groups.
+    """
+    Group = apps.get_model('auth', 'Group')
+    Permission = apps.get_model('auth', 'Permission')
+    ResUser = apps.get_model('user', 'ResUser')
+
+    ids = {}
+    # Default ordering matches user.permissions.codename_ids().
+    for codename, pk in Permission.objects.filter(
+        codename__in=PERMISSION_FLAGS.values()
+    ).values_list('codename', 'id'):
+        ids.setdefault(codename, pk)
+    flags = [flag for flag, codename in PERMISSION_FLAGS.items() if codename in ids]
+
+    Link = ResUser.user_permissions.through
+    links = []
+    for user_id, *values in ResUser._base_manager.values_list('id', *flags).iterator():
+        links.extend(
+            Link(resuser_id=user_id, permission_id=ids[PERMISSION_FLAGS[flag]])
+            for flag, value in zip(flags, values) if value
+        )
+        if len(links) >= 1000:
+            Link.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    Link.objects.bulk_create(links, ignore_conflicts=True)
+
+    Group.permissions.through.objects.filter(
+        group__name__in=ROLE_NAMES, permission__codename__in=PERMISSION_FLAGS.values(),
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user', '0017_alter_resuser_role_name_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_flag_permissions_to_users, migrations.RunPython.noop),
+    ]
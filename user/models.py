@@ -7,9 +7,9 @@ from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import Group, Permission
 from BusinessPartner.models import BusinessPartner
+from taraerp.pincodes import fill_location, schedule_refresh
+from taraerp.sequences import reserve
 import logging
-import requests
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -102,98 +102,71 @@ class ResUser(AbstractUser):
 
     def assign_role_permissions(self):
         """
-        Dynamically assigns permissions based on user's role and permission fields,
-        and creates a specific permission group for each user.
+        Add the user to their role group and sync their direct permissions
+        with the permission flags. See user.permissions for the batch version.
         """
         if not self.pk:
             return
 
-        role_group, created = Group.objects.get_or_create(name=self.role_name)
-
-        if created or not self.groups.filter(name=self.role_name).exists():
-            self.groups.add(role_group)
-
-        permission_mapping = {
-            'view_only': 'view',
-            'copy': 'copy',
-            'screenshot': 'screenshot',
-            'print_perm': 'print',
-            'download': 'download',
-            'share': 'share',
-            'edit': 'edit',
-            'delete': 'delete',
-            'manage_roles': 'manage_roles',
-            'approve': 'approve',
-            'reject': 'reject',
-            'archive': 'archive',
-            'restore': 'restore',
-            'transfer': 'transfer',
-            'custom_access': 'custom_access',
-            'full_control': 'full_control',
-        }
-        role_group.permissions.clear()
-        for field, codename in permission_mapping.items():
-            if getattr(self, field, False):
-                permission = Permission.objects.filter(codename=codename).first()
-                if permission:
-                    role_group.permissions.add(permission)
-
-        self.groups.add(role_group)
-
-        logger.info(f"Permissions assigned to group '{role_group.name}' for user '{self.username}'")
+        from user.permissions import sync_role_permissions
+        sync_role_permissions([self])
+
+        logger.info(f"Permissions synced for user '{self.username}' with role '{self.role_name}'")
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
 
-        if is_new:
+        from user.permissions import PERMISSION_FLAGS
+        update_fields = kwargs.get('update_fields')
+        if is_new or update_fields is None or {'role_name', *PERMISSION_FLAGS}.intersection(update_fields):
             self.assign_role_permissions()
-    
-    
+
+
+USER_CODE_PREFIXES = {
+    "Project Owner": "PO",
+    "Super Admin": "SA",
+    "Admin": "AD",
+    "Key User": "KU",
+    "User": "UR",
+    "Craftsman": "CF",
+    "Walking Customer": "WC",
+}
+
+
+def _last_user_number(prefix):
+    """Highest number already used for `prefix` (e.g. 'SA'); seeds the counter once."""
+    numbers = [
+        int(code.split('-', 1)[1])
+        for code in ResUser.objects.filter(user_code__startswith=f"{prefix}-").values_list('user_code', flat=True)
+        if code.split('-', 1)[1].isdigit()
+    ]
+    return max(numbers, default=0)
+
+
+def reserve_user_codes(role_name, count=1):
+    """
+    Reserve `count` consecutive user codes for a role, e.g. ['SA-0001', 'SA-0002'].
+
+    The whole range is claimed with one atomic UPDATE on the role prefix's
+    counter, so a bulk import of thousands of users costs one round-trip and
+    concurrent registrations never receive the same code.
+    """
+    prefix = USER_CODE_PREFIXES.get(role_name, "UR")
+    first, last = reserve(f"user_code:{prefix}", count, seed=lambda: _last_user_number(prefix))
+    return [f"{prefix}-{number:04d}" for number in range(first, last + 1)]
+
+
+def next_user_code(role_name):
+    return reserve_user_codes(role_name, 1)[0]
+
+
 def fetch_location_pre_save(sender, instance, **kwargs):
-    if instance.pincode:
-        url_primary = f"https://api.postalpincode.in/pincode/{instance.pincode}"
-        url_backup = f"https://api.zippopotam.us/in/{instance.pincode}"
-        retries = 3  
-        timeout_seconds = 10
-
-        for attempt in range(retries):
-            try:
-                response = requests.get(url_primary, timeout=timeout_seconds)
-                response.raise_for_status()
-                data = response.json()
-
-                if data and data[0]['Status'] == "Success" and data[0]['PostOffice']:
-                    post_office = data[0]['PostOffice'][0]
-                    instance.city = post_office.get('District', '').strip() or None
-                    instance.state = post_office.get('State', '').strip() or None
-                    instance.country = post_office.get('Country', '').strip() or None
-                    return
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Attempt {attempt + 1}: Error fetching location for {instance.pincode}: {str(e)}")
-                time.sleep(2)
-        try:
-            response = requests.get(url_backup, timeout=timeout_seconds)
-            response.raise_for_status()
-            data = response.json()
-
-            if 'places' in data:
-                place = data['places'][0]
-                instance.city = place.get('place name', '').strip() or None
-                instance.state = place.get('state', '').strip() or None
-                instance.country = data.get('country', '').strip() or None
-                return
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Backup API failed: {str(e)}")
-
-        logger.error(f"Failed to fetch location for pincode {instance.pincode} after {retries} attempts")
-        instance.city = "Unknown"
-        instance.state = "Unknown"
-        instance.country = "Unknown"
+    """Fill city/state/country from the local pincode cache; misses are resolved in the background."""
+    fill_location(instance, overwrite=True)
 
 models.signals.pre_save.connect(fetch_location_pre_save, sender=ResUser)
+models.signals.post_save.connect(schedule_refresh, sender=ResUser)
 
 class RoleDashboardMapping(models.Model):
     role = models.CharField(max_length=50, choices=ResUser.ROLE_CHOICES)
@@ -203,6 +176,4 @@ class RoleDashboardMapping(models.Model):
         return f'{self.role} - {self.dashboard_url}'
     
     def save(self, *args, **kwargs):
-        if ResUser.objects.filter(user_code=self.user_code).exists():
-            raise ValidationError("User code already exists.")
         super().save(*args, **kwargs)
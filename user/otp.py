@@ -0,0 +1,120 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, get_random_string
+
+OTP_LENGTH = 6
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _user_otp_key(user_id):
+    return f"password_reset_user:{user_id}"
+
+
+def _request_key(token):
+    return f"password_reset_request:{token}"
+
+
+def _reset_key(token):
+    return f"password_reset_token:{token}"
+
+
+def _attempts_key(user_id):
+    return f"otp_attempts_{user_id}"
+
+
+def _failures_key(user_id):
+    return f"otp_failures_{user_id}"
+
+
+def _bump(key, timeout):
+    """
+    Increment a counter and return its new value.
+
+    The counter is created with ``add`` and bumped with ``incr`` so concurrent
+    requests cannot both read the same value and slip under a limit.
+    """
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The window expired between add() and incr().
+        cache.add(key, 1, timeout=timeout)
+        return 1
+
+
+def rate_limited(user_id):
+    """Count an OTP request for the user and report whether they are over the limit."""
+    return _bump(_attempts_key(user_id), _setting("OTP_RATE_WINDOW", 600)) > _setting("OTP_MAX_REQUESTS", 5)
+
+
+def issue_otp(user_id, channel):
+    """
+    Store a fresh OTP for the user and return it with a resend token.
+
+    ``channel`` ("email" or "sms") is remembered with the resend token so a
+    resend goes out the same way. The OTP replaces any issued earlier to the
+    user, and its failed verification count starts from zero.
+    """
+    otp = get_random_string(length=OTP_LENGTH, allowed_chars="1234567890")
+    cache.set(_user_otp_key(user_id), otp, timeout=_setting("OTP_TIMEOUT", 300))
+    cache.delete(_failures_key(user_id))
+
+    request_token = secrets.token_urlsafe(24)
+    cache.set(_request_key(request_token), (user_id, channel), timeout=_setting("OTP_RATE_WINDOW", 600))
+    return otp, request_token
+
+
+def resend_target(request_token):
+    """Return the ``(user_id, channel)`` of a previous OTP request, or None."""
+    if not request_token:
+        return None
+    return cache.get(_request_key(request_token))
+
+
+def verify_otp(request_token, otp):
+    """
+    Exchange the OTP sent for `request_token` for a single-use reset token.
+
+    The OTP is only compared with the one issued to that request's user, so
+    a guess cannot match anyone else's. After OTP_MAX_VERIFY_ATTEMPTS wrong
+    guesses the OTP is revoked and a new one must be requested. Returns None
+    when the OTP is wrong, expired or already used.
+    """
+    target = resend_target(request_token)
+    if not target or not otp:
+        return None
+    user_id = target[0]
+    key = _user_otp_key(user_id)
+    expected = cache.get(key)
+    if not expected:
+        return None
+    if not constant_time_compare(expected, otp):
+        failures = _bump(_failures_key(user_id), _setting("OTP_TIMEOUT", 300))
+        if failures >= _setting("OTP_MAX_VERIFY_ATTEMPTS", 5):
+            cache.delete(key)
+        return None
+    # Only the request whose delete removed the OTP may use it.
+    if not cache.delete(key):
+        return None
+    cache.delete(_failures_key(user_id))
+
+    token = secrets.token_urlsafe(32)
+    cache.set(_reset_key(token), user_id, timeout=_setting("PASSWORD_RESET_TOKEN_TIMEOUT", 600))
+    return token
+
+
+def consume_reset_token(token):
+    """Return the user id for a reset token and invalidate it, or None."""
+    if not token:
+        return None
+    key = _reset_key(token)
+    user_id = cache.get(key)
+    # Of two concurrent resets with the same token only one deletes the key.
+    if user_id and cache.delete(key):
+        return user_id
+    return None
@@ -0,0 +1,163 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.caching import invalidate_user_permissions
+from user.models import ResUser
+
+logger = logging.getLogger(__name__)
+
+# ResUser boolean flag -> Permission codename granted when the flag is set.
+PERMISSION_FLAGS = {
+    'view_only': 'view',
+    'copy': 'copy',
+    'screenshot': 'screenshot',
+    'print_perm': 'print',
+    'download': 'download',
+    'share': 'share',
+    'edit': 'edit',
+    'delete': 'delete',
+    'manage_roles': 'manage_roles',
+    'approve': 'approve',
+    'reject': 'reject',
+    'archive': 'archive',
+    'restore': 'restore',
+    'transfer': 'transfer',
+    'custom_access': 'custom_access',
+    'full_control': 'full_control',
+}
+
+# Groups named after a role; a user belongs to exactly the one for their role_name.
+ROLE_NAMES = [name for name, _ in ResUser.ROLE_CHOICES]
+
+_lock = threading.Lock()
+_codename_ids = None
+
+
+def codename_ids():
+    """
+    codename -> Permission id for the flag codenames, loaded in one query
+    and kept in memory until a Permission is saved or deleted.
+    """
+    global _codename_ids
+    if _codename_ids is None:
+        ids = {}
+        # Default ordering matches Permission.objects.filter(codename=...).first().
+        for codename, pk in Permission.objects.filter(
+            codename__in=PERMISSION_FLAGS.values()
+        ).values_list('codename', 'id'):
+            ids.setdefault(codename, pk)
+        with _lock:
+            _codename_ids = ids
+    return _codename_ids
+
+
+@receiver([post_save, post_delete], sender=Permission)
+def clear_codename_ids(**kwargs):
+    global _codename_ids
+    with _lock:
+        _codename_ids = None
+
+
+def desired_permission_ids(user):
+    ids = codename_ids()
+    return {
+        ids[codename]
+        for flag, codename in PERMISSION_FLAGS.items()
+        if getattr(user, flag, False) and codename in ids
+    }
+
+
+def sync_role_groups(users, batch_size=1000):
+    """
+    Put each user in the group named after their role, creating missing
+    groups, and take them out of the other role groups.
+
+    Groups that are not named after a role are left alone.
+    """
+    users = [user for user in users if user.pk]
+    if not users:
+        return
+    role_names = {user.role_name for user in users if user.role_name}
+    groups = dict(Group.objects.filter(name__in=role_names.union(ROLE_NAMES)).values_list('name', 'id'))
+    missing = role_names.difference(groups)
+    if missing:
+        Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+        groups = dict(Group.objects.filter(name__in=role_names.union(ROLE_NAMES)).values_list('name', 'id'))
+
+    Link = ResUser.groups.through
+    existing = {
+        (user_id, group_id): link_id
+        for link_id, user_id, group_id in Link.objects.filter(
+            resuser_id__in=[user.pk for user in users], group_id__in=groups.values(),
+        ).values_list('id', 'resuser_id', 'group_id')
+    }
+    wanted = {(user.pk, groups[user.role_name]) for user in users if user.role_name}
+    stale = [link_id for key, link_id in existing.items() if key not in wanted]
+    if stale:
+        Link.objects.filter(id__in=stale).delete()
+    Link.objects.bulk_create(
+        [Link(resuser_id=user_id, group_id=group_id) for user_id, group_id in wanted.difference(existing)],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+
+def sync_user_permissions(users, batch_size=1000):
+    """
+    Make each user's direct flag permissions match their flags.
+
+    Reads the current through rows for all users in one query, then applies
+    the difference with one bulk_create and one delete. Permissions that are
+    not managed by a flag are left alone. Returns the ids of users whose
+    permissions changed.
+    """
+    users = [user for user in users if user.pk]
+    managed = set(codename_ids().values())
+    if not users or not managed:
+        return set()
+
+    Link = ResUser.user_permissions.through
+    current = defaultdict(dict)
+    for link_id, user_id, permission_id in Link.objects.filter(
+        resuser_id__in=[user.pk for user in users], permission_id__in=managed,
+    ).values_list('id', 'resuser_id', 'permission_id'):
+        current[user_id][permission_id] = link_id
+
+    to_add, to_remove, changed = [], [], set()
+    for user in users:
+        have = current.get(user.pk, {})
+        want = desired_permission_ids(user)
+        for permission_id in want.difference(have):
+            to_add.append(Link(resuser_id=user.pk, permission_id=permission_id))
+            changed.add(user.pk)
+        for permission_id in set(have).difference(want):
+            to_remove.append(have[permission_id])
+            changed.add(user.pk)
+
+    if to_add or to_remove:
+        with transaction.atomic():
+            if to_remove:
+                Link.objects.filter(id__in=to_remove).delete()
+            if to_add:
+                Link.objects.bulk_create(to_add, batch_size=batch_size, ignore_conflicts=True)
+        transaction.on_commit(lambda: invalidate_user_permissions(*changed))
+    return changed
+
+
+def sync_role_permissions(users, batch_size=1000):
+    """
+    Role group membership and flag permissions for many users at once.
+
+    Costs a fixed number of queries per call regardless of how many users
+    are passed, so callers should hand over whole batches.
+    """
+    users = list(users)
+    sync_role_groups(users, batch_size=batch_size)
+    changed = sync_user_permissions(users, batch_size=batch_size)
+    logger.info(f"Synced role permissions for {len(users)} users ({len(changed)} changed)")
+    return changed
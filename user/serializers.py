@@ -5,13 +5,15 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import Group, Permission
-from user.models import ResUser
+from user.models import ResUser, next_user_code
+from user import otp as otp_store
 import random
 from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from django.utils.crypto import get_random_string
 from django.core.cache import cache
+from django.db import transaction
 from django.contrib.auth.hashers import make_password, check_password
 from twilio.rest import Client
 from rest_framework.exceptions import PermissionDenied
@@ -119,47 +121,30 @@ class ResUserSerializer(serializers.ModelSerializer):
 
     def generate_user_code(self, role_name):
         """
-        Generate user_code based on role_name.
+        Generate user_code based on role_name (SA-0001, AD-0001, etc.).
         """
-        role_prefix_mapping = {
-            "Project Owner": "PO",
-            "Super Admin": "SA",
-            "Admin": "AD",
-            "Key User": "KU",
-            "User": "UR",
-            "Craftsman": "CF",
-            "Walking Customer": "WC"
-        }
-
-        prefix = role_prefix_mapping.get(role_name, "UR")  # Default to UR if role not found
-        last_user = ResUser.objects.filter(user_code__startswith=prefix + "-").order_by('-user_code').first()
-        
-        if last_user:
-            last_number = int(last_user.user_code.split('-')[1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}-{new_number:04d}"  # Formats as SA-0001, AD-0001, etc.
+        return next_user_code(role_name)
 
     def create(self, validated_data):
         """
         Create user with auto-generated user_code based on role_name.
+
+        The code is reserved in the transaction that inserts the user, so a
+        failed insert hands it back instead of leaving a gap. The password is
+        hashed first so the code counter isn't locked while it runs.
         """
         role_name = validated_data.get('role_name')
-        validated_data['user_code'] = self.generate_user_code(role_name)
-
         password = validated_data.get('password')
+        if password:
+            validated_data['password'] = make_password(password)
         groups = validated_data.pop('groups', [])
-        
-        user = super().create(validated_data)
 
-        if password:
-            user.set_password(password)
-            user.save(update_fields=['password'])
+        with transaction.atomic():
+            validated_data['user_code'] = self.generate_user_code(role_name)
+            user = super().create(validated_data)
 
-        if groups:
-            user.groups.set(groups)
+            if groups:
+                user.groups.set(groups)
 
         return user
 
@@ -237,6 +222,7 @@ class LoginSerializer(serializers.Serializer):
         if user.status != 'active':
             raise serializers.ValidationError("This account is inactive. Please contact support.")
 
+        data['user'] = user
         return data
     
 def send_otp_via_sms(mobile_no, otp):
@@ -252,7 +238,9 @@ def send_otp_via_sms(mobile_no, otp):
 
 class ForgotPasswordSerializer(serializers.Serializer):
     email_or_mobile = serializers.CharField(max_length=255, required=False)
+    request_token = serializers.CharField(max_length=64, required=False)
     otp = serializers.CharField(max_length=6, required=False)
+    reset_token = serializers.CharField(max_length=64, required=False)
     new_password = serializers.CharField(write_only=True, required=False, style={"input_type": "password"})
     confirm_new_password = serializers.CharField(write_only=True, required=False, style={"input_type": "password"})
 
@@ -262,55 +250,43 @@ class ForgotPasswordSerializer(serializers.Serializer):
         new_password = data.get("new_password")
         confirm_new_password = data.get("confirm_new_password")
 
-        # ✅ Resend OTP
+        # ✅ Resend OTP using the request token returned when it was first sent
         if not email_or_mobile and not otp and not new_password:
-            return self.resend_otp()
+            return self.resend_otp(data.get("request_token"))
 
         # ✅ Send OTP if email/mobile provided
         if email_or_mobile and not otp and not new_password:
             user = self.get_user(email_or_mobile)
             if not user:
                 return {"success": False, "message": "User with this email or mobile number does not exist."}
-            return self.send_otp(email_or_mobile)
+            return self.send_otp(user, "email" if "@" in email_or_mobile else "sms")
 
-        # ✅ Verify OTP
+        # ✅ Verify OTP and hand out a single-use reset token
         elif otp and not new_password:
-            cache_key = f"password_reset_{otp}"
-            user_id = cache.get(cache_key)
-
-            if not user_id:
+            reset_token = otp_store.verify_otp(data.get("request_token"), otp)
+            if not reset_token:
                 return {"success": False, "message": "Invalid or expired OTP."}
 
-            # OTP verified, store user_id in cache for password reset (without OTP)
-            verified_key = f"otp_verified_{user_id}"
-            cache.set(verified_key, user_id, timeout=600)  # 10 min validity
-
-            return {"success": True, "message": "OTP verified successfully. You can now reset your password."}
+            return {
+                "success": True,
+                "message": "OTP verified successfully. You can now reset your password.",
+                "reset_token": reset_token,
+            }
 
         # ✅ Reset password with confirm password check
         elif new_password and confirm_new_password:
             if new_password != confirm_new_password:
                 return {"success": False, "message": "New password and confirm password do not match."}
 
-            verified_user_id = None
-
-            # 🔥 Fetch verified user ID safely
-            for user in ResUser.objects.all():
-                verified_key = f"otp_verified_{user.id}"
-                if cache.get(verified_key):
-                    verified_user_id = user.id
-                    break
-
+            verified_user_id = otp_store.consume_reset_token(data.get("reset_token"))
             if not verified_user_id:
                 return {"success": False, "message": "OTP not verified. Please verify OTP first."}
 
-            # Reset password logic
-            user = ResUser.objects.get(id=verified_user_id)
+            user = ResUser.objects.filter(id=verified_user_id).first()
+            if not user:
+                return {"success": False, "message": "User not found."}
             user.set_password(new_password)  # ✅ Correct hashing method
-            user.save()
-
-            # Cleanup cache after password reset
-            cache.delete(f"otp_verified_{verified_user_id}")
+            user.save(update_fields=["password"])
 
             return {"success": True, "message": "Password reset successfully."}
 
@@ -325,35 +301,28 @@ class ForgotPasswordSerializer(serializers.Serializer):
         except ResUser.DoesNotExist:
             return None
 
-    def send_otp(self, email_or_mobile):
-        user = self.get_user(email_or_mobile)
-        if not user:
-            return {"success": False, "message": "User not found."}
-
-        otp_attempts_key = f"otp_attempts_{user.id}"
-        attempts = cache.get(otp_attempts_key, 0)
-
-        if attempts >= 5:
+    def send_otp(self, user, channel):
+        if otp_store.rate_limited(user.id):
             return {"success": False, "message": "Too many OTP requests. Try again later."}
 
-        otp = get_random_string(length=6, allowed_chars="1234567890")
-        cache.set(f"password_reset_{otp}", user.id, timeout=300)
-        cache.set(otp_attempts_key, attempts + 1, timeout=600)
+        otp, request_token = otp_store.issue_otp(user.id, channel)
 
-        if "@" in email_or_mobile:
+        if channel == "email":
             send_mail("Your OTP", f"Your new OTP is {otp}.", settings.DEFAULT_FROM_EMAIL, [user.email_id])
         else:
             send_otp_via_sms(user.mobile_no, otp)
 
-        cache.set("last_otp_request", email_or_mobile, timeout=600)
-
-        return {"success": True, "message": "OTP sent successfully."}
+        return {"success": True, "message": "OTP sent successfully.", "request_token": request_token}
 
-    def resend_otp(self):
-        email_or_mobile = cache.get("last_otp_request")
-        if not email_or_mobile:
+    def resend_otp(self, request_token):
+        target = otp_store.resend_target(request_token)
+        if not target:
             return {"success": False, "message": "No previous OTP request found. Please enter email or mobile."}
-        return self.send_otp(email_or_mobile)
+        user_id, channel = target
+        user = ResUser.objects.filter(id=user_id).first()
+        if not user:
+            return {"success": False, "message": "User not found."}
+        return self.send_otp(user, channel)
 
 class ResetPasswordSerializer(serializers.Serializer):
     email_or_mobile = serializers.CharField(max_length=255)
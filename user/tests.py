@@ -1,3 +1,331 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from taraerp import pincodes
+from taraerp.models import PincodeLocation
+from user import caching, imports
+from user.models import ResUser, RoleDashboardMapping, next_user_code, reserve_user_codes
+from user.serializers import ResUserSerializer
+
+
+class FailingPincodeService:
+    def fetch(self, pincode):
+        raise AssertionError("The pincode service must not be called on the request path.")
+
+
+@override_settings(
+    PINCODE_SERVICE='taraerp.pincodes.StaticPincodeService',
+    PINCODE_STATIC_LOCATIONS={'999001': ('Testpur', 'Test State', 'India')},
+    BACKGROUND_TASKS_EAGER=True,
+)
+class PincodeLookupTests(TestCase):
+    def setUp(self):
+        pincodes.clear_cache()
+
+    @override_settings(PINCODE_SERVICE='user.tests.FailingPincodeService')
+    def test_bundled_pincode_is_resolved_without_the_service(self):
+        user = ResUser.objects.create_user(username='chennai', password='pass', role_name='User', pincode='600001')
+        self.assertEqual((user.city, user.state, user.country), ('Chennai', 'Tamil Nadu', 'India'))
+
+    def test_unknown_pincode_is_backfilled_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = ResUser.objects.create_user(username='testpur', password='pass', role_name='User', pincode='999001')
+            self.assertIsNone(user.city)
+
+        user.refresh_from_db()
+        self.assertEqual((user.city, user.state), ('Testpur', 'Test State'))
+        self.assertTrue(PincodeLocation.objects.filter(pincode='999001').exists())
+        self.assertEqual(pincodes.lookup('999001').city, 'Testpur')
+
+    def test_moving_to_an_unknown_pincode_replaces_the_old_location(self):
+        user = ResUser.objects.create_user(username='mover', password='pass', role_name='User', pincode='600001')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.pincode = '999001'
+            user.save()
+            self.assertEqual((user.city, user.state), (None, None))
+
+        user.refresh_from_db()
+        self.assertEqual((user.city, user.state), ('Testpur', 'Test State'))
+
+
+class LoginCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caching.dashboard_cache.clear_local()
+        caching.permission_cache.clear_local()
+        self.client = APIClient()
+        self.user = ResUser.objects.create_user(
+            'cached', password='secret123', role_name='Admin',
+            email_id='cached@example.com', status='active',
+        )
+        RoleDashboardMapping.objects.create(role='Admin', dashboard_url='https://erp.example.com/admin/')
+
+    def login(self):
+        return self.client.post(
+            reverse('login'),
+            {'email_or_mobile': 'cached@example.com', 'password': 'secret123'},
+            format='json',
+        )
+
+    def test_warm_login_runs_a_single_query(self):
+        self.assertEqual(self.login().status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dashboard'], 'https://erp.example.com/admin/')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_mapping_and_permission_changes_invalidate(self):
+        self.login()
+        mapping = RoleDashboardMapping.objects.get(role='Admin')
+        mapping.dashboard_url = 'https://erp.example.com/admin/v2/'
+        mapping.save()
+        self.user.user_permissions.add(Permission.objects.get(codename='view_resuser'))
+
+        response = self.login()
+        self.assertEqual(response.data['dashboard'], 'https://erp.example.com/admin/v2/')
+        self.assertIn('view_resuser', response.data['permissions'])
+
+
+@override_settings(OTP_MAX_REQUESTS=2)
+class ForgotPasswordTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('Forgot Password')
+        for i in range(5):
+            ResUser.objects.create_user(f'bystander{i}', password='x', role_name='User')
+        self.user = ResUser.objects.create_user(
+            'forgetful', password='old-secret', role_name='User', email_id='forgetful@example.com',
+        )
+
+    def post(self, **data):
+        return self.client.post(self.url, data, format='json').data
+
+    def test_reset_flow_uses_an_opaque_token(self):
+        sent = self.post(email_or_mobile='forgetful@example.com')
+        self.assertTrue(sent['success'])
+        otp = mail.outbox[-1].body.rsplit(' ', 1)[-1].rstrip('.')
+
+        verified = self.post(otp=otp, request_token=sent['request_token'])
+        self.assertTrue(verified['success'])
+        self.assertFalse(self.post(otp=otp, request_token=sent['request_token'])['success'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            reset = self.post(
+                reset_token=verified['reset_token'],
+                new_password='new-secret', confirm_new_password='new-secret',
+            )
+        self.assertTrue(reset['success'])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-secret'))
+
+        replay = self.post(
+            reset_token=verified['reset_token'],
+            new_password='again', confirm_new_password='again',
+        )
+        self.assertFalse(replay['success'])
+
+    def test_otp_only_verifies_for_its_own_request(self):
+        sent = self.post(email_or_mobile='forgetful@example.com')
+        otp = mail.outbox[-1].body.rsplit(' ', 1)[-1].rstrip('.')
+        other = ResUser.objects.create_user('other', password='x', role_name='User', email_id='other@example.com')
+        other_sent = self.post(email_or_mobile=other.email_id)
+
+        self.assertFalse(self.post(otp=otp)['success'])
+        self.assertFalse(self.post(otp=otp, request_token=other_sent['request_token'])['success'])
+        self.assertTrue(self.post(otp=otp, request_token=sent['request_token'])['success'])
+
+    @override_settings(OTP_MAX_VERIFY_ATTEMPTS=3)
+    def test_wrong_guesses_revoke_the_otp(self):
+        sent = self.post(email_or_mobile='forgetful@example.com')
+        otp = mail.outbox[-1].body.rsplit(' ', 1)[-1].rstrip('.')
+        wrong = '000000' if otp != '000000' else '111111'
+
+        for _ in range(3):
+            self.assertFalse(self.post(otp=wrong, request_token=sent['request_token'])['success'])
+        self.assertFalse(self.post(otp=otp, request_token=sent['request_token'])['success'])
+
+    def test_resend_is_keyed_by_request_token_and_rate_limited(self):
+        sent = self.post(email_or_mobile='forgetful@example.com')
+        self.assertFalse(self.post()['success'])
+
+        resent = self.post(request_token=sent['request_token'])
+        self.assertTrue(resent['success'])
+        self.assertEqual(mail.outbox[-1].to, ['forgetful@example.com'])
+
+        limited = self.post(request_token=sent['request_token'])
+        self.assertFalse(limited['success'])
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class UserCodeAllocatorTests(TestCase):
+    def test_ranges_are_reserved_in_one_round_trip(self):
+        self.assertEqual(next_user_code('Super Admin'), 'SA-0001')
+        with CaptureQueriesContext(connection) as ctx:
+            codes = reserve_user_codes('Super Admin', 1000)
+        self.assertEqual(codes[0], 'SA-0002')
+        self.assertEqual(codes[-1], 'SA-1001')
+        self.assertEqual(len(set(codes)), 1000)
+        self.assertFalse([q for q in ctx.captured_queries if 'resuser' in q['sql'].lower()])
+        self.assertEqual(next_user_code('Super Admin'), 'SA-1002')
+
+    def test_counter_is_seeded_numerically_past_9999(self):
+        ResUser.objects.create_user('legacy1', password='x', role_name='Admin', user_code='AD-9999')
+        ResUser.objects.create_user('legacy2', password='x', role_name='Admin', user_code='AD-10000')
+        self.assertEqual(next_user_code('Admin'), 'AD-10001')
+        self.assertEqual(next_user_code('Unknown role'), 'UR-0001')
+
+    def test_failed_insert_hands_the_code_back(self):
+        ResUser.objects.create_user('taken', password='x', role_name='Admin', user_code='AD-0001')
+        with self.assertRaises(IntegrityError):
+            ResUserSerializer().create({'username': 'taken', 'password': 'x', 'role_name': 'Admin'})
+        user = ResUserSerializer().create({'username': 'fresh', 'password': 'x', 'role_name': 'Admin'})
+        self.assertEqual(user.user_code, 'AD-0002')
+        self.assertTrue(user.check_password('x'))
+
+
+@override_settings(USER_IMPORT_HASH_WORKERS=1)
+class BulkUserImportTests(TestCase):
+    def setUp(self):
+        from django.contrib.contenttypes.models import ContentType
+
+        self.admin = ResUser.objects.create_user('importer', password='x', role_name='Admin', email_id='importer@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('user_bulk_import_api')
+        self.approve = Permission.objects.create(
+            codename='approve', name='Can approve', content_type=ContentType.objects.get_for_model(ResUser),
+        )
+
+    def rows(self, count, role='Key User', start=0):
+        return [
+            {'full_name': f'Staff {i}', 'email_id': f'staff{i}@example.com', 'password': 'pw-12345',
+             'role_name': role, 'approve': i % 2 == 0}
+            for i in range(start, start + count)
+        ]
+
+    def test_json_import_creates_users_groups_and_permissions(self):
+        # The first import creates the KU counter and the role group.
+        self.client.post(self.url, self.rows(1, start=100), format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.rows(2, start=200), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, self.rows(40), format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 40)
+        # 20x the rows may only add an INSERT where the backend splits a batch.
+        self.assertLessEqual(len(large), len(small) + 2)
+        users = ResUser.objects.filter(email_id__startswith='staff')
+        self.assertEqual(users.filter(groups__name='Key User').count(), 43)
+        self.assertEqual(users.filter(user_permissions=self.approve).count(), 22)
+        user = users.get(email_id='staff3@example.com')
+        self.assertTrue(user.check_password('pw-12345'))
+        self.assertTrue(user.user_code.startswith('KU-'))
+
+    def test_passwords_are_hashed_before_the_transaction_opens(self):
+        valid, _ = imports.validate_rows(self.rows(2))
+        depth, seen = len(connection.atomic_blocks), []
+
+        def hash_passwords(passwords):
+            seen.append(len(connection.atomic_blocks))
+            return [f'hashed-{password}' for password in passwords]
+
+        with mock.patch.object(imports, 'hash_passwords', side_effect=hash_passwords):
+            users = imports.import_users(valid)
+        self.assertEqual(seen, [depth])
+        self.assertEqual([user.password for user in users], ['hashed-pw-12345'] * 2)
+
+    def test_invalid_rows_are_reported_with_row_numbers(self):
+        rows = self.rows(3)
+        rows[1]['email_id'] = 'importer@example.com'
+        rows[2]['role_name'] = 'Wizard'
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertFalse(ResUser.objects.filter(email_id='staff0@example.com').exists())
+
+        response = self.client.post(f'{self.url}?skip_invalid=true', rows, format='json')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_csv_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        content = 'full_name,mobile_no,password,role_name,pincode\nCSV One,9876500001,pw-1,User,\nCSV Two,9876500002,pw-2,Craftsman,\n'
+        upload = SimpleUploadedFile('users.csv', content.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            sorted(ResUser.objects.filter(mobile_no__startswith='98765').values_list('role_name', flat=True)),
+            ['Craftsman', 'User'],
+        )
+
+
+class PermissionSyncTests(TestCase):
+    def setUp(self):
+        from django.contrib.contenttypes.models import ContentType
+
+        content_type = ContentType.objects.get_for_model(ResUser)
+        self.approve, self.edit, self.other = [
+            Permission.objects.create(codename=codename, name=codename, content_type=content_type)
+            for codename in ('approve', 'edit', 'unmanaged_extra')
+        ]
+
+    def codenames(self, user):
+        return set(user.user_permissions.values_list('codename', flat=True))
+
+    def test_flags_are_synced_as_a_diff_without_touching_the_role_group(self):
+        user = ResUser.objects.create_user('flags', password='x', role_name='Key User', approve=True)
+        user.user_permissions.add(self.other)
+        self.assertEqual(self.codenames(user), {'approve', 'unmanaged_extra'})
+        self.assertTrue(user.groups.filter(name='Key User').exists())
+
+        user.approve, user.edit = False, True
+        user.save()
+        self.assertEqual(self.codenames(user), {'edit', 'unmanaged_extra'})
+        self.assertFalse(user.groups.get(name='Key User').permissions.exists())
+
+    def test_role_change_leaves_the_old_role_group(self):
+        from django.contrib.auth.models import Group
+
+        custom = Group.objects.create(name='Night shift')
+        user = ResUser.objects.create_user('mover', password='x', role_name='User')
+        user.groups.add(custom)
+        user.role_name = 'Key User'
+        user.save(update_fields=['role_name'])
+        self.assertEqual(set(user.groups.values_list('name', flat=True)), {'Key User', 'Night shift'})
+
+    def test_batch_sync_costs_the_same_for_any_number_of_users(self):
+        from user.permissions import sync_role_permissions
+
+        def make(prefix, count):
+            users = [
+                ResUser(username=f'{prefix}{i}', role_name='User', approve=True, edit=i % 2 == 0)
+                for i in range(count)
+            ]
+            ResUser.objects.bulk_create(users)
+            return users
+
+        sync_role_permissions(make('warm', 1))
+        small, large = make('small', 3), make('large', 30)
+        with CaptureQueriesContext(connection) as few:
+            sync_role_permissions(small)
+        with CaptureQueriesContext(connection) as many:
+            changed = sync_role_permissions(large)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(changed), 30)
+        self.assertEqual(ResUser.user_permissions.through.objects.filter(resuser__username__startswith='large').count(), 45)
+
+        with CaptureQueriesContext(connection) as noop:
+            self.assertEqual(sync_role_permissions(large), set())
+        self.assertFalse([q for q in noop.captured_queries if q['sql'].startswith(('INSERT', 'DELETE'))])
@@ -1,5 +1,5 @@
 from django.urls import path
-from user.views import ResUserRegistrationAPI, ResUserDetailView, ResUserDeleteView, ResAdminAPI, LoginAPIView, ForgotAPIView, ResetAPIView
+from user.views import ResUserRegistrationAPI, ResUserBulkImportAPI, ResUserDetailView, ResUserDeleteView, ResAdminAPI, LoginAPIView, ForgotAPIView, ResetAPIView
 
 urlpatterns = [
     # User API Endpoints
@@ -7,6 +7,7 @@ urlpatterns = [
     path('user/update/<int:id>/', ResUserRegistrationAPI.as_view(), name='user_update_api'),  # PUT for updating a user
     path('user/delete/<str:identifier>/', ResUserDeleteView.as_view(), name='user_delete_api'),  # DELETE for deleting a user
     path('user/list/', ResUserRegistrationAPI.as_view(), name='user_list_api'),  # GET for all users
+    path('user/bulk-import/', ResUserBulkImportAPI.as_view(), name='user_bulk_import_api'),  # POST CSV / JSON list of users
     path('user/detail/<str:identifier>/', ResUserDetailView.as_view(), name='user_detail_api'),  # GET for single user
     
     # Admin API Endpoints
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.hashers import check_password
 from user.models import ResUser, RoleDashboardMapping
+from user.caching import get_dashboard_url, get_permission_codenames
 from user.serializers import ResUserSerializer, ResAdminUserSerializer, LoginSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -16,6 +17,8 @@ from django.db.models import Q
 from django.conf import settings
 import random
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from user.imports import import_users, parse_upload, validate_rows
 
 
 class ResUserRegistrationAPI(generics.GenericAPIView):
@@ -66,6 +69,36 @@ class ResUserRegistrationAPI(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ResUserBulkImportAPI(generics.GenericAPIView):
+    """
+    Bulk user import from a CSV upload (`file`) or a JSON list of users.
+
+    By default nothing is created if any row is invalid; pass
+    `?skip_invalid=true` to import the valid rows and report the rest.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    allowed_roles = ["Project Owner", "Super Admin", "Admin"]
+
+    def post(self, request):
+        if request.user.role_name not in self.allowed_roles:
+            return Response({"error": "You do not have permission to import users."}, status=status.HTTP_403_FORBIDDEN)
+
+        rows = parse_upload(request)
+        valid, errors = validate_rows(rows)
+        error_list = [{"row": number, "errors": errors[number]} for number in sorted(errors)]
+        skip_invalid = request.query_params.get('skip_invalid', '').lower() in ('1', 'true', 'yes')
+        if errors and not skip_invalid:
+            return Response({"created": 0, "errors": error_list}, status=status.HTTP_400_BAD_REQUEST)
+
+        users = import_users(valid)
+        return Response({
+            "created": len(users),
+            "user_codes": [user.user_code for user in users],
+            "errors": error_list,
+        }, status=status.HTTP_201_CREATED)
+
+
 class ResUserDetailView(generics.GenericAPIView):
     """
     API for a single Business Partner:
@@ -198,12 +231,6 @@ class ResAdminAPI(generics.GenericAPIView):
         admin.delete()
         return Response({"message": "Admin deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
-def get_dashboard_url(role):
-    try:
-        mapping = RoleDashboardMapping.objects.get(role=role)
-        return mapping.dashboard_url
-    except RoleDashboardMapping.DoesNotExist:
-        return None  # Default behavior if no mapping exists
 
 # @method_decorator(csrf_exempt, name='dispatch')
 # class LoginAPIView(generics.GenericAPIView):
@@ -267,35 +294,13 @@ class LoginAPIView(generics.GenericAPIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        email_or_mobile = serializer.validated_data.get('email_or_mobile')
-        password = serializer.validated_data.get('password')
-
-        try:
-            # Email ya Mobile check
-            if '@' in email_or_mobile:
-                current_user = ResUser.objects.get(email_id=email_or_mobile)
-            else:
-                current_user = ResUser.objects.get(mobile_no=email_or_mobile)
-        except ResUser.DoesNotExist:
-            return Response({"error": "This email or mobile number is not registered."}, status=status.HTTP_404_NOT_FOUND)
-
-        if not current_user.check_password(password):
-            return Response({"error": "Invalid email or password."}, status=status.HTTP_401_UNAUTHORIZED)
-
-        if current_user.status != 'active':
-            return Response({"error": "This account is inactive."}, status=status.HTTP_403_FORBIDDEN)
+        # The serializer has already looked the user up and checked the
+        # password and status; reuse it instead of hashing twice.
+        current_user = serializer.validated_data['user']
 
-        # Dashboard URL
+        # Dashboard URL and permission codenames come from the login cache
         dashboard_url = get_dashboard_url(current_user.role_name) or "/default-dashboard/"
-
-        # Safe Permission Fetching
-        try:
-            user_permissions = current_user.user_permissions.all()
-            # permission_keys = current_user.permission_fields.all()
-            permission_names = [perm.codename for perm in user_permissions]
-        except Exception as e:
-            permission_names = []
-            print(f"Warning: Could not fetch permissions - {e}")
+        permission_names = get_permission_codenames(current_user)
 
         # 🔥 Define permission keys
         permission_keys = [